@@ -235,7 +235,23 @@ router.get("/:id/notifications", async (req, res) => {
         const id = Number(req.params.id);
         if (!id) return res.status(400).json({ error: "id inválido" });
 
-        const [rs] = await pool.query("CALL sp_get_notifications(?)", [id]);
+        const hasSince = req.query.since_id !== undefined;
+        const hasLimit = req.query.limit !== undefined;
+        let rs;
+        if (!hasSince && !hasLimit) {
+            [rs] = await pool.query("CALL sp_get_notifications(?)", [id]);
+        } else {
+            const sinceId = hasSince ? Number(req.query.since_id) : null;
+            const limit = hasLimit ? Number(req.query.limit) : 50;
+            if ((hasSince && !(sinceId >= 0)) || !(limit >= 1 && limit <= 200))
+                return res.status(400).json({ error: "parámetros inválidos" });
+
+            [rs] = await pool.query("CALL sp_get_notifications_since(?, ?, ?)", [
+                id,
+                sinceId,
+                limit,
+            ]);
+        }
         const rows = rs?.[0] ?? rs;
         return res.json(rows || []);
     } catch (e) {
@@ -246,6 +262,23 @@ router.get("/:id/notifications", async (req, res) => {
     }
 });
 
+// GET /users/:id/notifications/unread-count
+router.get("/:id/notifications/unread-count", async (req, res) => {
+    try {
+        const id = Number(req.params.id);
+        if (!id) return res.status(400).json({ error: "id inválido" });
+
+        const [rs] = await pool.query("CALL sp_notifications_unread_count(?)", [id]);
+        const rows = rs?.[0] ?? rs;
+        return res.json({ unread: Number(rows?.[0]?.unread ?? 0) });
+    } catch (e) {
+        console.error("GET /users/:id/notifications/unread-count error:", e);
+        return res
+            .status(500)
+            .json({ error: "No se pudieron obtener las notificaciones" });
+    }
+});
+
 // PUT /users/:id/notifications/:notifId/read
 router.put("/:id/notifications/:notifId/read", async (req, res) => {
     try {
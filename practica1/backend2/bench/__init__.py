@@ -0,0 +1 @@
+# Benchmarks y utilidades de medición del backend
@@ -0,0 +1,383 @@
+"""
+Prueba de carga de la API con mezclas de tráfico: navegación de la
+galería (páginas profundas por cursor y por offset), búsquedas, uploads,
+recargas de saldo, polling de notificaciones y compras concurrentes de una
+misma obra.
+
+Reporta throughput, percentiles de latencia por tipo de petición y round
+trips a MySQL por petición, y guarda el resultado en bench/results/ para
+comparar entre commits. Uso (ver README, sección Benchmarks):
+
+    docker compose -f bench/docker-compose.yml up -d --wait
+    python -m bench.seed --reset
+    python -m bench.load --mix mixed --duration 30 --concurrency 32 --save
+    python -m bench.load --mix mixed --compare bench/results/<baseline>.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+from PIL import Image
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Pesos de cada operación por mezcla
+MIXES = {
+    "mixed": {"browse": 45, "poll": 25, "topup": 10, "upload": 5, "purchase": 15},
+    "browse": {"browse": 1},
+    "poll": {"poll": 1},
+    "writes": {"topup": 3, "upload": 1},
+    "flash-sale": {"purchase": 1},
+    "search": {"search": 1},
+}
+SEARCH_SORTS = ("newest", "oldest", "price_asc", "price_desc")
+# Palabras de los títulos que genera bench.seed
+TITLE_WORDS = ("paisaje", "retrato", "flores", "marina", "abstracto", "nocturno",
+               "ciudad", "montaña", "bodegón", "jardín", "tormenta", "azul",
+               "dorado", "silencio", "mercado", "volcán", "lago", "otoño")
+
+
+def parse_mix(value):
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def tiny_png():
+    out = io.BytesIO()
+    Image.frombytes("RGB", (16, 16), os.urandom(16 * 16 * 3)).save(out, "PNG")
+    return out.getvalue()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.conflicts = {}
+        self.recording = False
+
+    def add(self, label, seconds, status):
+        if not self.recording:
+            return
+        self.latencies.setdefault(label, []).append(seconds * 1000)
+        if status is None or status >= 500:
+            self.errors[label] = self.errors.get(label, 0) + 1
+        elif status == 409:
+            self.conflicts[label] = self.conflicts.get(label, 0) + 1
+
+    def summary(self, elapsed):
+        ops = {}
+        for label, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            ops[label] = {
+                "requests": len(ordered),
+                "rps": len(ordered) / elapsed,
+                "p50_ms": percentile(ordered, 50),
+                "p95_ms": percentile(ordered, 95),
+                "p99_ms": percentile(ordered, 99),
+                "max_ms": ordered[-1],
+                "errors": self.errors.get(label, 0),
+                "conflicts": self.conflicts.get(label, 0),
+            }
+        return ops
+
+
+class Workload:
+    """Operaciones de un usuario virtual; cada una hace una o más peticiones"""
+
+    def __init__(self, client, recorder, users, hot_artworks, args):
+        self.client = client
+        self.recorder = recorder
+        self.users = users
+        self.hot_artworks = hot_artworks
+        self.hot_index = 0
+        self.args = args
+        self.last_seen = {}
+
+    async def request(self, label, method, url, **kwargs):
+        start = time.perf_counter()
+        status = None
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = response.status_code
+            return response
+        except httpx.HTTPError:
+            return None
+        finally:
+            self.recorder.add(label, time.perf_counter() - start, status)
+
+    async def browse(self):
+        if random.random() < 0.3:
+            offset = random.randint(0, self.args.max_offset)
+            await self.request("GET /artworks (offset)", "GET",
+                               f"/artworks/?limit=50&offset={offset}")
+            return
+        cursor = ""
+        for _ in range(random.randint(1, self.args.depth)):
+            response = await self.request("GET /artworks (cursor)", "GET",
+                                          f"/artworks/?limit=50&cursor={cursor}")
+            if response is None or response.status_code != 200:
+                return
+            cursor = response.json().get("next_cursor")
+            if not cursor:
+                return
+
+    async def search(self):
+        # Palabra completa o prefijo de los títulos de bench.seed, a veces con filtros
+        word = random.choice(TITLE_WORDS)
+        params = {"q": word[:random.randint(3, len(word))], "limit": 50,
+                  "sort": random.choice(SEARCH_SORTS)}
+        if random.random() < 0.5:
+            params["min_price"] = random.randint(1, 250)
+            params["max_price"] = params["min_price"] + random.randint(10, 250)
+        if random.random() < 0.2:
+            params["seller_id"] = random.choice(self.users)
+        for _ in range(random.randint(1, self.args.depth)):
+            response = await self.request("GET /artworks/search", "GET",
+                                          "/artworks/search", params=params)
+            if response is None or response.status_code != 200:
+                return
+            params["cursor"] = response.json().get("next_cursor")
+            if not params["cursor"]:
+                return
+
+    async def poll(self):
+        user_id = random.choice(self.users)
+        since = self.last_seen.get(user_id)
+        query = f"since_id={since}&limit=50" if since else "limit=50"
+        response = await self.request("GET /notifications", "GET",
+                                      f"/users/{user_id}/notifications?{query}")
+        if response is not None and response.status_code == 200 and response.json():
+            self.last_seen[user_id] = max(row["id"] for row in response.json())
+        await self.request("GET /notifications/unread-count", "GET",
+                           f"/users/{user_id}/notifications/unread-count")
+
+    async def topup(self):
+        await self.request("POST /balance", "POST",
+                           f"/users/{random.choice(self.users)}/balance", json={"amount": 1})
+
+    async def upload(self):
+        await self.request("POST /artworks/upload", "POST", "/artworks/upload",
+                           data={"userId": str(random.choice(self.users)), "name": "Bench", "price": "1"},
+                           files={"image": ("bench.png", tiny_png(), "image/png")})
+
+    async def purchase(self):
+        # Todos compiten por la misma obra hasta que alguien la compra; el
+        # calentamiento no gasta obras
+        if not self.recorder.recording or self.hot_index >= len(self.hot_artworks):
+            await self.browse()
+            return
+        index = self.hot_index
+        artwork_id, owner = self.hot_artworks[index]
+        buyer = random.choice(self.users)
+        if buyer == owner:
+            return
+        response = await self.request("POST /purchase (contended)", "POST", "/purchase/",
+                                      json={"buyerId": buyer, "artworkId": artwork_id})
+        if response is not None and response.status_code in (200, 409) and self.hot_index == index:
+            if response.status_code == 200 or "disponible" in response.text:
+                self.hot_index += 1
+
+
+async def load_fixtures(args):
+    """Usuarios de bench.seed y obras nuevas para la compra concurrente"""
+    from src.db import db
+
+    rows = await db.execute_query("SELECT id FROM users WHERE username LIKE %s ORDER BY id", ("bench\\_%",))
+    users = [row["id"] for row in rows]
+    if len(users) < 2:
+        raise SystemExit("No hay usuarios de prueba: ejecuta primero python -m bench.seed")
+
+    owner = users[0]
+    run_id = time.time_ns()
+    await db.execute_many(
+        "INSERT INTO artworks (image_name, url, price, original_owner_id, current_owner_id) "
+        "VALUES (%s, %s, 1, %s, %s)",
+        [(f"Hot {i}", f"Fotos_Publicadas/hot_{run_id}_{i}.png", owner, owner)
+         for i in range(args.hot_artworks)]
+    )
+    rows = await db.execute_query(
+        "SELECT id FROM artworks WHERE url LIKE %s ORDER BY id", (f"Fotos_Publicadas/hot\\_{run_id}\\_%",)
+    )
+    return users[1:], [(row["id"], owner) for row in rows]
+
+
+async def run_load(client, recorder, workload, mix, args):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    for name in names:
+        if not hasattr(workload, name):
+            raise SystemExit(f"Operación desconocida: {name} (usa {', '.join(MIXES['mixed'])})")
+
+    async def virtual_user(deadline):
+        while time.perf_counter() < deadline:
+            await getattr(workload, random.choices(names, weights)[0])()
+
+    if args.warmup:
+        await asyncio.gather(*(virtual_user(time.perf_counter() + args.warmup)
+                               for _ in range(args.concurrency)))
+    recorder.recording = True
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(start + args.duration) for _ in range(args.concurrency)))
+    recorder.recording = False
+    return time.perf_counter() - start
+
+
+async def run(args):
+    # Almacenamiento local desechable; se fija antes de importar la app
+    os.environ["STORAGE_DRIVER"] = "local"
+    os.environ.setdefault("LOCAL_UPLOAD_DIR", tempfile.mkdtemp(prefix="bench-uploads-"))
+
+    from src.app import app
+    from src.db import db
+    from src.notifications import notifier
+    from bench.roundtrips import RoundTripCounter
+
+    random.seed(args.seed)
+    counter = RoundTripCounter()
+    await db.connect()
+    users, hot_artworks = await load_fixtures(args)
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=30)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                   base_url="http://bench", timeout=30)
+
+    recorder = Recorder()
+    async with client:
+        workload = Workload(client, recorder, users, hot_artworks, args)
+        counter.reset()
+        trips_before = counter.total
+        elapsed = await run_load(client, recorder, workload, parse_mix(args.mix), args)
+        round_trips = counter.total - trips_before
+
+    await notifier.close()
+    await db.disconnect()
+
+    ops = recorder.summary(elapsed)
+    requests = sum(op["requests"] for op in ops.values())
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "target": args.base_url or "in-process",
+            "python": platform.python_version(),
+            # Solo se comparan resultados de la misma máquina
+            "machine": f"{platform.node()} {platform.platform()} {os.cpu_count()} cpus",
+        },
+        "totals": {
+            "requests": requests,
+            "rps": requests / elapsed,
+            "errors": sum(op["errors"] for op in ops.values()),
+            "hot_artworks_sold": workload.hot_index,
+            # Con --base-url las consultas ocurren en otro proceso
+            "db_round_trips_per_request": None if args.base_url else round_trips / max(requests, 1),
+        },
+        "ops": ops,
+        "hot_artworks": len(hot_artworks),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result):
+    meta, totals = result["meta"], result["totals"]
+    print(f"commit {meta['commit']}  mezcla {meta['mix']}  concurrencia {meta['concurrency']}  "
+          f"{meta['duration']} s  ({meta['target']})")
+    print(f"{'petición':34} {'n':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5} {'409':>5}")
+    for label, op in result["ops"].items():
+        print(f"{label:34} {op['requests']:7} {op['rps']:8.1f} {op['p50_ms']:8.2f} "
+              f"{op['p95_ms']:8.2f} {op['p99_ms']:8.2f} {op['errors']:5} {op['conflicts']:5}")
+    if totals["hot_artworks_sold"] >= result["hot_artworks"]:
+        print("aviso: se vendieron todas las obras en disputa; sube --hot-artworks")
+    trips = totals["db_round_trips_per_request"]
+    print(f"total: {totals['requests']} peticiones, {totals['rps']:.1f} req/s, "
+          f"{totals['errors']} errores, round trips/petición: "
+          f"{'n/d' if trips is None else f'{trips:.2f}'}")
+
+
+def print_comparison(baseline, current):
+    def delta(old, new):
+        return f"{(new - old) / old * 100:+6.1f}%" if old else "    n/d"
+
+    print(f"\ncomparación contra {baseline['meta']['commit']} ({baseline['meta']['date']})")
+    for field in ("mix", "concurrency", "target", "machine"):
+        if baseline["meta"].get(field) != current["meta"].get(field):
+            print(f"aviso: {field} distinto ({baseline['meta'].get(field)} vs {current['meta'].get(field)})")
+    print(f"{'petición':34} {'req/s':>16} {'p50 ms':>16} {'p99 ms':>16}")
+    for label, op in current["ops"].items():
+        old = baseline["ops"].get(label)
+        if old is None:
+            continue
+        print(f"{label:34} {op['rps']:8.1f} {delta(old['rps'], op['rps'])} "
+              f"{op['p50_ms']:8.2f} {delta(old['p50_ms'], op['p50_ms'])} "
+              f"{op['p99_ms']:8.2f} {delta(old['p99_ms'], op['p99_ms'])}")
+    old, new = baseline["totals"], current["totals"]
+    print(f"{'total':34} {new['rps']:8.1f} {delta(old['rps'], new['rps'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mix", default="mixed",
+                        help=f"{', '.join(MIXES)} o pesos propios: browse=3,poll=1")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--depth", type=int, default=10, help="páginas máximas por navegación")
+    parser.add_argument("--max-offset", type=int, default=4000)
+    parser.add_argument("--hot-artworks", type=int, default=500,
+                        help="obras creadas para la compra concurrente")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="servidor ya levantado en vez de la app en proceso")
+    parser.add_argument("--save", nargs="?", const="", metavar="ARCHIVO",
+                        help="guarda el resultado (por defecto en bench/results/)")
+    parser.add_argument("--compare", metavar="ARCHIVO", help="resultado anterior a comparar")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), result)
+
+    if args.save is not None:
+        path = args.save or os.path.join(
+            RESULTS_DIR, f"{result['meta']['commit']}-{args.mix.replace(',', '_')}.json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\nresultado guardado en {path}")
+
+
+if __name__ == "__main__":
+    main()
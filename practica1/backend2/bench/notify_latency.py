@@ -0,0 +1,113 @@
+"""
+Latencia p50/p99 de las rutas que generan notificaciones, con sp_notify
+síncrono (NOTIFY_WRITE_BEHIND=false, comportamiento anterior) y con la
+cola write-behind.
+
+Escribe datos reales: recarga saldo, cambia el perfil y la foto del
+usuario indicado, publica obras y (con --register) crea usuarios nuevos.
+Requiere una base de datos con los scripts de database/ cargados y las
+variables DB_* del .env. Uso:
+
+    python -m bench.notify_latency --user-id 1 --password bench --requests 200
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+import uuid
+
+import httpx
+from PIL import Image
+
+from src.app import app
+from src.db import db
+from src.notifications import notifier
+
+
+def tiny_png():
+    """PNG distinto en cada llamada (evita duplicados con STORAGE_NAMING=content)"""
+    out = io.BytesIO()
+    Image.frombytes("RGB", (8, 8), os.urandom(8 * 8 * 3)).save(out, "PNG")
+    return out.getvalue()
+
+
+def build_cases(args):
+    uid = args.user_id
+    cases = [
+        ("POST /users/{id}/balance", lambda: ("post", f"/users/{uid}/balance",
+                                              {"json": {"amount": 1}})),
+        ("PUT /users/{id}", lambda: ("put", f"/users/{uid}",
+                                     {"json": {"current_password": args.password,
+                                              "full_name": f"Bench {uuid.uuid4().hex[:8]}"}})),
+        ("POST /users/{id}/photo", lambda: ("post", f"/users/{uid}/photo",
+                                            {"files": {"image": ("p.png", tiny_png(), "image/png")}})),
+        ("POST /artworks/upload", lambda: ("post", "/artworks/upload",
+                                           {"data": {"userId": str(uid), "name": "bench", "price": "1"},
+                                            "files": {"image": ("a.png", tiny_png(), "image/png")}})),
+    ]
+    if args.register:
+        cases.append(("POST /auth/register", lambda: ("post", "/auth/register", {
+            "data": {"username": f"bench_{uuid.uuid4().hex[:12]}",
+                     "full_name": "Bench", "password": "bench"}})))
+    return cases
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def measure(client, make_request, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        method, url, kwargs = make_request()
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method.upper(), url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            raise SystemExit(f"{method.upper()} {url} devolvió {response.status_code}: {response.text}")
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return statistics.median(latencies), percentile(latencies, 99)
+
+
+async def run(args):
+    await db.connect()
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for mode, enabled in (("síncrono", False), ("write-behind", True)):
+            notifier.enabled = enabled
+            for label, make_request in build_cases(args):
+                results[(label, mode)] = await measure(
+                    client, make_request, args.requests, args.concurrency
+                )
+    await notifier.close()
+    await db.disconnect()
+
+    print(f"{args.requests} peticiones por ruta, concurrencia {args.concurrency}")
+    print(f"{'ruta':28} {'p50 sínc':>9} {'p99 sínc':>9} {'p50 wb':>8} {'p99 wb':>8}")
+    for label, _ in build_cases(args):
+        p50_old, p99_old = results[(label, "síncrono")]
+        p50_new, p99_new = results[(label, "write-behind")]
+        print(f"{label:28} {p50_old:9.2f} {p99_old:9.2f} {p50_new:8.2f} {p99_new:8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--password", default="bench")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--register", action="store_true",
+                        help="incluye POST /auth/register (crea un usuario por petición)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Cuenta los round trips a MySQL y la latencia por ruta en cada modo de
+invocación de stored procedures (DB_PROC_MODE=call | callproc).
+
+Requiere una base de datos con base.sql + stored_procedures.sql cargados
+y las variables DB_* del .env. Uso:
+
+    python -m bench.roundtrips --user-id 1 --artwork-owner 1 --writes
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import pymysql
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.db import db
+
+
+class RoundTripCounter:
+    """Suma los comandos ejecutados en los hilos del pool"""
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+        original = pymysql.connections.Connection._execute_command
+        counter = self
+
+        def counted(conn, command, sql):
+            with counter._lock:
+                counter.total += 1
+            return original(conn, command, sql)
+
+        pymysql.connections.Connection._execute_command = counted
+
+    def reset(self):
+        with self._lock:
+            self.total = 0
+
+
+def build_cases(args):
+    uid = args.user_id
+    cases = [
+        ("GET /artworks/", "get", "/artworks/?limit=50", None),
+        ("GET /artworks/created", "get", f"/artworks/created?userId={args.artwork_owner}", None),
+        ("GET /artworks/mine", "get", f"/artworks/mine?userId={uid}", None),
+        ("GET /users/{id}", "get", f"/users/{uid}", None),
+        ("GET /users/{id}/notifications", "get", f"/users/{uid}/notifications", None),
+        ("POST /auth/login", "post", "/auth/login",
+         {"json": {"username": args.username, "password": args.password}}),
+    ]
+    if args.writes:
+        cases += [
+            ("POST /users/{id}/balance", "post", f"/users/{uid}/balance",
+             {"json": {"amount": 1}}),
+            ("PUT /users/{id} (sin cambios)", "put", f"/users/{uid}",
+             {"json": {"current_password": args.password}}),
+        ]
+    return cases
+
+
+def run(args):
+    counter = RoundTripCounter()
+    results = {}
+    with TestClient(app) as client:
+        for mode in ("callproc", "call"):
+            db.proc_mode = mode
+            for label, method, url, kwargs in build_cases(args):
+                trips = []
+                latencies = []
+                for _ in range(args.iterations):
+                    counter.reset()
+                    start = time.perf_counter()
+                    response = getattr(client, method)(url, **(kwargs or {}))
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    trips.append(counter.total)
+                    if response.status_code >= 500:
+                        raise SystemExit(f"{label} devolvió {response.status_code}: {response.text}")
+                results[(label, mode)] = (statistics.mean(trips), statistics.median(latencies))
+
+    print(f"{'ruta':38} {'rt callproc':>11} {'rt call':>8} {'ms callproc':>12} {'ms call':>8}")
+    for label, *_ in build_cases(args):
+        rt_old, ms_old = results[(label, "callproc")]
+        rt_new, ms_new = results[(label, "call")]
+        print(f"{label:38} {rt_old:11.1f} {rt_new:8.1f} {ms_old:12.2f} {ms_new:8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--artwork-owner", type=int, default=1)
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--writes", action="store_true",
+                        help="incluye rutas que modifican datos (recarga de saldo, perfil)")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Throughput de N uploads concurrentes a un S3 local (moto) comparando el
+S3Storage actual (boto3 fuera del event loop) contra el comportamiento
+anterior (put_object bloqueante dentro de la corrutina).
+
+También mide el retraso máximo del event loop mientras suben, que es lo
+que perciben las demás peticiones del worker. Uso:
+
+    pip install -r bench/requirements.txt
+    python -m bench.s3_uploads --uploads 64 --concurrency 16 --size-kb 512
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+BUCKET = "bench-bucket"
+
+
+def start_moto(port):
+    """Levanta moto en otro proceso para que no compita por el GIL"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit("moto no arrancó; ¿está instalado moto[server]?")
+
+
+class BlockingS3Storage:
+    """Réplica del upload anterior: put_object síncrono en el event loop"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    async def upload(self, stream, mime_type, folder, name_base):
+        key = f"{folder}/{name_base}-{time.time_ns()}.bin"
+        self.storage.client.put_object(Body=stream, **self.storage._object_params(key, mime_type))
+        return key
+
+
+async def _loop_lag(stop: asyncio.Event, interval=0.005):
+    """Mayor retraso observado entre ticks de un temporizador"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run_scenario(storage, uploads, concurrency, payload):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await storage.upload(payload, "application/octet-stream", "bench", f"b{i}")
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(uploads)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return elapsed, await lag_task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--size-kb", type=int, default=512)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    server = start_moto(args.port)
+    try:
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+        os.environ["S3_BUCKET_NAME"] = BUCKET
+        os.environ["S3_ENDPOINT_URL"] = f"http://127.0.0.1:{args.port}"
+        os.environ.setdefault("S3_MAX_CONCURRENCY", str(args.concurrency))
+
+        from src.storage import S3Storage
+
+        storage = S3Storage()
+        storage.client.create_bucket(Bucket=BUCKET)
+        payload = os.urandom(args.size_kb * 1024)
+        total_mb = args.uploads * len(payload) / (1024 * 1024)
+
+        print(f"{args.uploads} uploads de {args.size_kb} KB, concurrencia {args.concurrency}")
+        print(f"{'modo':12} {'seg':>8} {'uploads/s':>10} {'MB/s':>8} {'lag máx ms':>11}")
+        for label, impl in (("bloqueante", BlockingS3Storage(storage)), ("executor", storage)):
+            elapsed, lag = asyncio.run(run_scenario(impl, args.uploads, args.concurrency, payload))
+            print(f"{label:12} {elapsed:8.2f} {args.uploads / elapsed:10.1f} "
+                  f"{total_mb / elapsed:8.1f} {lag * 1000:11.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Carga datos sintéticos para los benchmarks: usuarios con saldo, obras
+publicadas y un historial de notificaciones por usuario.
+
+Usa la base de las variables DB_* (pensado para la de
+bench/docker-compose.yml). Uso:
+
+    python -m bench.seed --users 200 --artworks 5000 --notifications 50
+"""
+import argparse
+import hashlib
+import os
+import random
+import time
+
+from bench.load import TITLE_WORDS
+from src.db import db
+
+USER_PREFIX = "bench_"
+PASSWORD = "bench"
+BATCH = 1000
+
+
+def password_hash(text):
+    return hashlib.md5(text.encode('utf-8')).hexdigest()[:16]
+
+
+def insert_batched(cursor, query, rows):
+    for i in range(0, len(rows), BATCH):
+        cursor.executemany(query, rows[i:i + BATCH])
+
+
+def seed(args):
+    random.seed(args.seed)
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            if args.reset:
+                for table in ("notifications", "notification_counters", "artworks", "users"):
+                    cursor.execute(f"DELETE FROM {table}")
+
+            run_id = int(time.time())
+            insert_batched(
+                cursor,
+                "INSERT INTO users (username, full_name, password_hash, balance) "
+                "VALUES (%s, %s, %s, %s)",
+                [(f"{USER_PREFIX}{run_id}_{i:05d}", f"Bench {i}", password_hash(PASSWORD), 1_000_000)
+                 for i in range(args.users)]
+            )
+            cursor.execute(
+                "SELECT id FROM users WHERE username LIKE %s ORDER BY id",
+                (f"{USER_PREFIX}{run_id}\\_%",)
+            )
+            user_ids = [row['id'] for row in cursor.fetchall()]
+
+            insert_batched(
+                cursor,
+                "INSERT INTO artworks (image_name, url, price, original_owner_id, current_owner_id) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [(f"{random.choice(TITLE_WORDS).capitalize()} {random.choice(TITLE_WORDS)} {i}",
+                  f"Fotos_Publicadas/bench_{run_id}_{i}.png",
+                  random.randint(1, 500), owner, owner)
+                 for i, owner in ((i, random.choice(user_ids)) for i in range(args.artworks))]
+            )
+
+            insert_batched(
+                cursor,
+                "INSERT INTO notifications (user_id, type, title, body, is_read) "
+                "VALUES (%s, 'system', %s, %s, %s)",
+                [(user_id, "Bench", f"Notificación {n}", int(random.random() < 0.7))
+                 for user_id in user_ids for n in range(args.notifications)]
+            )
+        print(f"Usuarios: {len(user_ids)} (contraseña '{PASSWORD}'), obras: {args.artworks}, "
+              f"notificaciones: {len(user_ids) * args.notifications}")
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--artworks", type=int, default=5000)
+    parser.add_argument("--notifications", type=int, default=50,
+                        help="historial por usuario")
+    parser.add_argument("--seed", type=int, default=int(os.getenv("BENCH_SEED", 42)))
+    parser.add_argument("--reset", action="store_true",
+                        help="borra usuarios, obras y notificaciones antes de cargar")
+    seed(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+CPU por página de los listados de obras: armado de los items y
+serialización con jsonable_encoder + json (camino anterior) contra
+render_json (orjson, o json con default si orjson no está instalado).
+
+No usa la base de datos: genera filas con los tipos que devuelve PyMySQL
+(Decimal, datetime) y verifica que los tres caminos produzcan los mismos
+bytes. Uso:
+
+    python -m bench.serialization --rows 200 --pages 2000
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+from decimal import Decimal
+
+from src import cache
+from src.routes.artworks import _created_item, _gallery_item
+
+
+def fake_rows(count, seed=42):
+    rnd = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1, 8, 0, 0)
+    rows = []
+    for i in range(count):
+        created = start + datetime.timedelta(seconds=rnd.randint(0, 10_000_000))
+        rows.append({
+            "id": i + 1,
+            "name": f"Obra {i}",
+            "image_name": f"Obra {i} – óleo",
+            "url": f"Fotos_Publicadas/art_{i % 50}-{1735700000000 + i}.png",
+            "price": Decimal(rnd.randint(100, 5_000_000)) / 100,
+            "is_available": rnd.random() < 0.8,
+            "seller_id": i % 50 + 1,
+            "seller": f"Autor {i % 50}",
+            "acquisition_type": rnd.choice(["uploaded", "purchased"]),
+            "original_owner_id": i % 50 + 1,
+            "original_owner_full_name": f"Autor {i % 50}",
+            "current_owner_id": i % 70 + 1,
+            "current_owner_full_name": f"Dueño {i % 70}",
+            "created_at": created,
+            "updated_at": created + datetime.timedelta(hours=rnd.randint(0, 500)),
+        })
+    return rows
+
+
+def cpu_per_page(fn, rows, pages):
+    fn(rows)  # calentamiento
+    start = time.process_time()
+    for _ in range(pages):
+        fn(rows)
+    return (time.process_time() - start) / pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200, help="filas por página")
+    parser.add_argument("--pages", type=int, default=2000)
+    args = parser.parse_args()
+
+    rows = fake_rows(args.rows)
+    paths = [
+        ("jsonable_encoder + json", cache._render_slow),
+        ("json + default", lambda data: json.dumps(
+            data, default=cache._encode_value, ensure_ascii=False, allow_nan=False,
+            separators=(",", ":")).encode("utf-8")),
+    ]
+    if cache.orjson is not None:
+        paths.append(("orjson", lambda data: cache.orjson.dumps(data, default=cache._encode_value)))
+
+    print(f"{args.rows} filas por página, {args.pages} páginas; CPU por página")
+    for label, build in (("GET /artworks (galería)", _gallery_item),
+                         ("GET /artworks/created", _created_item)):
+        print(f"\n{label}")
+        items = [build(row) for row in rows]
+        build_cost = cpu_per_page(lambda page: [build(row) for row in page], rows, args.pages)
+        print(f"  {'armado de items':<26} {build_cost * 1e3:8.3f} ms")
+
+        expected = cache._render_slow(items)
+        baseline = None
+        for name, render in paths:
+            body = render(items)
+            cost = cpu_per_page(render, items, args.pages)
+            if body != expected:
+                raise SystemExit(f"{name}: la salida no coincide con jsonable_encoder")
+            baseline = baseline or cost
+            print(f"  {name:<26} {cost * 1e3:8.3f} ms  x{baseline / cost:5.1f}  "
+                  f"({len(body)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Arranque en frío: cuánto cuesta importar la app (python -X importtime),
+agrupado por paquete, y cuánto tarda un worker nuevo en responder /health
+y /ready. No necesita MySQL para el reporte de imports; sin MySQL, /ready
+nunca pasa y se reporta como tal. Uso:
+
+    python -m bench.startup
+    python -m bench.startup --serve --timeout 30
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Dependencias que la app no debería importar al arrancar con almacenamiento local
+LAZY = ("boto3", "botocore", "PIL")
+
+
+def import_times():
+    """{módulo: (self µs, acumulado µs)} de un proceso que importa src.app"""
+    env = dict(os.environ, STORAGE_DRIVER=os.getenv("STORAGE_DRIVER", "local"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.app"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr[-2000:])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def report_imports(args):
+    runs = [import_times() for _ in range(args.runs)]
+    # La primera corrida puede incluir compilar .pyc: se toma la más rápida
+    times = min(runs, key=lambda t: t["src.app"][1])
+    by_package = defaultdict(int)
+    for name, (self_us, _) in times.items():
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"import src.app: {times['src.app'][1] / 1000:.1f} ms "
+          f"(mejor de {args.runs}, {len(times)} módulos)")
+    print(f"\n{'paquete':24} {'ms':>8}")
+    for package, total in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:24} {total / 1000:8.1f}")
+
+    print(f"\n{'módulo de src':32} {'acumulado ms':>12}")
+    own = [(name, cumulative) for name, (_, cumulative) in times.items() if name.startswith("src.")]
+    for name, cumulative in sorted(own, key=lambda item: -item[1])[:args.top]:
+        print(f"{name:32} {cumulative / 1000:12.1f}")
+
+    loaded = [name for name in LAZY if name in times]
+    print("\ndiferidos: " + ", ".join(
+        f"{name} {'IMPORTADO' if name in loaded else 'no importado'}" for name in LAZY))
+
+
+def wait_for(client, path, deadline):
+    while time.monotonic() < deadline:
+        try:
+            if client.get(path).status_code == 200:
+                return True
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def report_serve(args):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    start = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR
+    )
+    try:
+        deadline = start + args.timeout
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            healthy = wait_for(client, "/health", deadline)
+            health_at = time.monotonic() - start
+            ready = healthy and wait_for(client, "/ready", deadline)
+            ready_at = time.monotonic() - start
+            status = client.get("/ready").json() if healthy else None
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    print(f"\n/health: {f'{health_at:.2f} s' if healthy else 'no respondió'}")
+    print(f"/ready:  {f'{ready_at:.2f} s' if ready else f'no pasó en {args.timeout:.0f} s'}")
+    if status and not ready:
+        print(f"         {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--serve", action="store_true", help="mide también /health y /ready")
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    report_imports(args)
+    if args.serve:
+        report_serve(args)
+
+
+if __name__ == "__main__":
+    main()
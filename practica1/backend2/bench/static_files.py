@@ -0,0 +1,96 @@
+"""
+Throughput de /static: StaticFiles de Starlette (montaje anterior) contra
+UploadFiles (src/storage/static.py), en proceso y sin red.
+
+Genera imágenes de prueba en un directorio temporal con nombres como los
+de LocalStorage y mide req/s en tres casos: descarga completa,
+revalidación con If-None-Match (lo que hace el navegador sin
+Cache-Control largo) y Range de 64 KB. Uso:
+
+    python -m bench.static_files --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import httpx
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.staticfiles import StaticFiles
+
+from src.storage.static import UploadFiles
+
+SIZES = {"thumb": 24 * 1024, "medium": 120 * 1024, "original": 900 * 1024}
+
+
+def make_files(directory, count):
+    os.makedirs(os.path.join(directory, "Fotos_Publicadas"), exist_ok=True)
+    keys = []
+    for i in range(count):
+        for variant, size in SIZES.items():
+            suffix = ".png" if variant == "original" else f".{variant}.webp"
+            key = f"Fotos_Publicadas/art_{i}-{1735700000000 + i}{suffix}"
+            with open(os.path.join(directory, *key.split("/")), "wb") as f:
+                f.write(os.urandom(size))
+            keys.append(key)
+    return keys
+
+
+async def measure(app, keys, case, args):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        etags = {}
+        for key in keys:
+            response = await client.get(f"/static/{key}")
+            etags[key] = response.headers["etag"]
+
+        counter = iter(range(args.requests))
+        statuses = {}
+
+        async def worker():
+            for i in counter:
+                key = keys[i % len(keys)]
+                headers = {}
+                if case == "revalidar":
+                    headers["If-None-Match"] = etags[key]
+                elif case == "range 64KB":
+                    headers["Range"] = "bytes=0-65535"
+                response = await client.get(f"/static/{key}", headers=headers)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        return args.requests / (time.perf_counter() - start), statuses
+
+
+async def run(args):
+    directory = tempfile.mkdtemp(prefix="bench-static-")
+    try:
+        keys = make_files(directory, args.files)
+        apps = {
+            "StaticFiles": Starlette(routes=[Mount("/static", StaticFiles(directory=directory))]),
+            "UploadFiles": Starlette(routes=[Mount("/static", UploadFiles(directory=directory))]),
+        }
+        print(f"{len(keys)} archivos, {args.requests} peticiones, concurrencia {args.concurrency}")
+        print(f"{'caso':<12} {'servidor':<12} {'req/s':>9}  estados")
+        for case in ("completa", "revalidar", "range 64KB"):
+            for name, app in apps.items():
+                rate, statuses = await measure(app, keys, case, args)
+                print(f"{case:<12} {name:<12} {rate:9.0f}  {statuses}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=20, help="obras (3 archivos cada una)")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Escalado del modo producción con el número de workers: levanta gunicorn
+(gunicorn.conf.py) con 1, 2, 4... workers y corre bench.load contra él con
+--base-url, con las mismas variables de entorno (DB_*) que bench.load.
+
+Un solo proceso de bench.load se satura antes que un servidor con muchos
+workers; --clients reparte la concurrencia entre varios procesos de carga.
+Uso:
+
+    python -m bench.workers --mix browse --workers 1,2,4 --duration 20 --clients 2
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(workers, port):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port),
+               NODE_ENV="production", LOG_LEVEL="warning")
+    env.setdefault("LOCAL_UPLOAD_DIR", tempfile.mkdtemp(prefix="bench-uploads-"))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "src.app:app"],
+        cwd=BACKEND_DIR, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn terminó al arrancar (código {process.returncode})")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit("gunicorn no arrancó")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_clients(port, args, directory):
+    """Lanza --clients procesos de bench.load a la vez y suma sus resultados"""
+    concurrency = max(1, args.concurrency // args.clients)
+    processes = []
+    for i in range(args.clients):
+        path = os.path.join(directory, f"client-{i}.json")
+        processes.append((path, subprocess.Popen(
+            [sys.executable, "-m", "bench.load", "--base-url", f"http://127.0.0.1:{port}",
+             "--mix", args.mix, "--duration", str(args.duration), "--warmup", str(args.warmup),
+             "--concurrency", str(concurrency), "--seed", str(args.seed + i), "--save", path],
+            cwd=BACKEND_DIR, stdout=subprocess.DEVNULL
+        )))
+
+    rps, errors = 0.0, 0
+    for path, process in processes:
+        if process.wait() != 0:
+            raise SystemExit(f"bench.load terminó con código {process.returncode}")
+        with open(path, encoding="utf-8") as f:
+            totals = json.load(f)["totals"]
+        rps += totals["rps"]
+        errors += totals["errors"]
+    return rps, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default=",".join(
+        str(n) for n in (1, 2, 4, 8, 16) if n <= (os.cpu_count() or 1)))
+    parser.add_argument("--mix", default="browse")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--concurrency", type=int, default=64, help="total entre todos los clientes")
+    parser.add_argument("--clients", type=int, default=1, help="procesos de bench.load")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    counts = [int(n) for n in args.workers.split(",")]
+    print(f"mezcla {args.mix}, {args.duration} s, concurrencia {args.concurrency}, "
+          f"{args.clients} cliente(s), {os.cpu_count()} núcleos")
+    print(f"{'workers':>7} {'req/s':>9} {'vs 1':>6} {'eficiencia':>10} {'errores':>8}")
+    baseline = None
+    directory = tempfile.mkdtemp(prefix="bench-workers-")
+    try:
+        for workers in counts:
+            server = start_server(workers, args.port)
+            try:
+                rps, errors = run_clients(args.port, args, directory)
+            finally:
+                stop_server(server)
+            baseline = baseline or rps / workers
+            speedup = rps / baseline
+            print(f"{workers:7} {rps:9.1f} {speedup:5.2f}x {speedup / workers:10.0%} {errors:8}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
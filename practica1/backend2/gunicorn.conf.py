@@ -0,0 +1,46 @@
+"""
+Modo producción: `NODE_ENV=production python main.py` o
+`gunicorn -c gunicorn.conf.py src.app:app`.
+
+Un worker uvicorn por núcleo, forkeados de la app ya importada (preload),
+con el pool de MySQL repartido entre ellos (DB_MAX_CONNECTIONS) y
+reiniciados cada WORKER_MAX_REQUESTS peticiones para acotar la memoria.
+"""
+import multiprocessing
+import os
+
+# Carga .env antes de leer la configuración (src/__init__.py)
+import src  # noqa: F401
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 0)) or multiprocessing.cpu_count()
+worker_class = 'src.serving.Worker'
+
+# La app se importa una vez en el master; los workers comparten esas páginas
+# (copy-on-write) y arrancan sin volver a importar FastAPI, boto3, Pillow...
+preload_app = True
+
+# db.py e images.py lo leen al importar la app para repartir conexiones y
+# procesos de miniaturas entre los workers
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+# Reinicio tras N peticiones (con jitter para que no reinicien todos juntos)
+max_requests = int(os.getenv('WORKER_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('WORKER_MAX_REQUESTS_JITTER', max_requests // 10))
+
+# SIGTERM: DRAIN_DELAY segundos con /health en 503 y luego hasta
+# GRACEFUL_TIMEOUT para terminar las peticiones en curso
+graceful_timeout = int(os.getenv('DRAIN_DELAY', 0)) + int(os.getenv('GRACEFUL_TIMEOUT', 30))
+timeout = int(os.getenv('WORKER_TIMEOUT', 60))
+keepalive = int(os.getenv('KEEPALIVE', 5))
+
+accesslog = os.getenv('ACCESS_LOG') or None
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    from src.db import pool_max_size
+    server.log.info(
+        "%s workers, hasta %s conexiones MySQL por worker",
+        server.num_workers, pool_max_size()
+    )
@@ -4,14 +4,12 @@ Punto de entrada principal para el backend Python de ArtGalleryCloud
 """
 import os
 import sys
-import uvicorn
-from dotenv import load_dotenv
 
 # Añadir el directorio actual al path para poder importar src
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# Cargar variables de entorno
-load_dotenv()
+# Cargar variables de entorno (src/__init__.py; no importa la app)
+import src  # noqa: E402,F401
 
 if __name__ == "__main__":
     port = int(os.getenv('PORT', 8000))
@@ -19,11 +17,23 @@ if __name__ == "__main__":
     
     print(f"🚀 Iniciando ArtGalleryCloud Python Backend en puerto {port}")
     print(f"🌍 Entorno: {env}")
-    
-    uvicorn.run(
-        "src.app:app",
-        host="0.0.0.0",
-        port=port,
-        reload=env != 'production',
-        log_level="info"
-    )
+
+    if env == 'production':
+        # Un worker por núcleo con gunicorn (ver gunicorn.conf.py)
+        from gunicorn.app.wsgiapp import run
+        sys.argv = [
+            "gunicorn",
+            "-c", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py"),
+            "src.app:app"
+        ]
+        run()
+    else:
+        import uvicorn
+
+        uvicorn.run(
+            "src.app:app",
+            host="0.0.0.0",
+            port=port,
+            reload=True,
+            log_level="info"
+        )
@@ -1 +1,6 @@
 # Backend Python para ArtGalleryCloud
+from dotenv import load_dotenv
+
+# Único punto donde se carga .env: todo módulo de src pasa por aquí antes
+# de leer variables de entorno
+load_dotenv()
@@ -1,24 +1,36 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
-import uvicorn
-from dotenv import load_dotenv
 
 # Importar rutas
-from .routes import auth, users, artworks, purchase
-
-# Cargar variables de entorno
-load_dotenv()
+from .routes import auth, users, artworks, purchase, uploads, admin
+from .db import db
+from .notifications import notifier
+from .readiness import readiness
+from . import images, metrics, profiling
+from .events import hub
+from .storage import MAX_BATCH_UPLOADS, MAX_UPLOAD_BYTES, PENDING_FOLDER, UploadSizeLimitMiddleware
+from .storage.static import UploadFiles
 
 # Crear aplicación FastAPI
 app = FastAPI(
     title="ArtGalleryCloud API",
     description="API para galería de arte - Backend en Python",
-    version="1.0.0"
+    version="1.0.0",
+    # Mide la serialización de las respuestas JSON en las peticiones perfiladas
+    default_response_class=profiling.ProfiledJSONResponse
+)
+
+# Cortar uploads demasiado grandes antes de leerlos completos
+# (margen de 64 KB para los demás campos del formulario)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_bytes=MAX_UPLOAD_BYTES + 64 * 1024,
+    path_limits={"/artworks/upload/batch": MAX_UPLOAD_BYTES * MAX_BATCH_UPLOADS + 64 * 1024}
 )
 
-# Configurar CORS
+# Configurar CORS (se agrega al final para envolver también las respuestas 413)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # En producción, especifica los dominios permitidos
@@ -27,24 +39,74 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Perfilado por muestreo o con X-Profile; captura peticiones lentas
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# Latencia por ruta (se agrega al final: envuelve a los demás middlewares)
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Configurar archivos estáticos
 upload_dir = os.getenv('LOCAL_UPLOAD_DIR', './uploads')
 if not os.path.exists(upload_dir):
     os.makedirs(upload_dir, exist_ok=True)
 
-app.mount("/static", StaticFiles(directory=upload_dir), name="static")
+# Uploads locales: caché immutable, ETag fuerte y Range
+# (los uploads directos sin finalizar no se sirven)
+app.mount("/static", UploadFiles(directory=upload_dir, hidden=(PENDING_FOLDER,)), name="static")
 
 # Registrar rutas
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(artworks.router, prefix="/artworks", tags=["Artworks"])
 app.include_router(purchase.router, prefix="/purchase", tags=["Purchase"])
+app.include_router(uploads.router, prefix="/uploads", tags=["Uploads"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
-# Endpoint de salud
+# Ciclo de vida del pool de conexiones
+@app.on_event("startup")
+async def open_db_pool():
+    # Pool y almacenamiento se calientan en segundo plano (ver /ready); si
+    # algo pide la DB antes, el pool se abre bajo demanda
+    readiness.start()
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    await readiness.stop()
+    # Primero las notificaciones pendientes; usan el pool
+    await notifier.close()
+    await db.disconnect()
+    images.shutdown()
+
+# Endpoint de salud: el proceso vive (no garantiza DB ni almacenamiento)
 @app.get("/health")
 async def health_check():
+    # 503 mientras el worker drena tras SIGTERM (src/serving.py)
+    if getattr(app.state, 'draining', False):
+        return JSONResponse(status_code=503, content={"ok": False, "draining": True})
     return {"ok": True}
 
+# Readiness: 200 solo con el pool de MySQL y el almacenamiento listos
+@app.get("/ready")
+async def ready_check():
+    status = readiness.status()
+    if getattr(app.state, 'draining', False):
+        status["ready"] = False
+        status["draining"] = True
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+# Métricas en formato Prometheus
+if metrics.METRICS_ENABLED:
+    metrics.Gauge('notify_stream_connections', 'Streams SSE abiertos', read=lambda: hub.connections)
+    metrics.Gauge('notify_queue_pending', 'Notificaciones en cola sin escribir', read=lambda: notifier.pending)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        return Response(
+            content=metrics.registry.render(),
+            media_type="text/plain; version=0.0.4"
+        )
+
 # Endpoint raíz
 @app.get("/")
 async def root():
@@ -55,6 +117,8 @@ async def root():
     }
 
 if __name__ == "__main__":
+    import uvicorn
+
     port = int(os.getenv('PORT', 8000))
     uvicorn.run(
         "src.app:app",
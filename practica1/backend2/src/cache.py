@@ -0,0 +1,200 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from .profiling import span
+
+try:
+    import orjson
+except ImportError:  # opcional: sin orjson se usa json con el mismo default
+    orjson = None
+
+
+def _encode_value(value):
+    """
+    Tipos que devuelve PyMySQL, codificados como jsonable_encoder:
+    DECIMAL sin decimales como int y con decimales como float, fechas en ISO 8601.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+
+def _render_slow(data) -> bytes:
+    return json.dumps(
+        jsonable_encoder(data),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _render_fast(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, default=_encode_value)
+    return json.dumps(
+        data,
+        default=_encode_value,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def render_json(data) -> bytes:
+    """
+    Serializa igual que JSONResponse de FastAPI, sin recorrer la respuesta
+    con jsonable_encoder: las filas de la BD (dicts, listas, Decimal, fechas)
+    van directo a orjson. Cualquier otro tipo usa el camino de FastAPI.
+    """
+    with span('serialize'):
+        try:
+            return _render_fast(data)
+        except TypeError:
+            return _render_slow(data)
+
+
+def json_response(data, status_code: int = 200) -> Response:
+    """Respuesta ya serializada; FastAPI no vuelve a pasarla por jsonable_encoder"""
+    return Response(content=render_json(data), status_code=status_code, media_type="application/json")
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in [tag.strip() for tag in header.split(",")]
+
+
+class ResponseCache:
+    """
+    Cache LRU con TTL de respuestas JSON ya serializadas.
+
+    Las claves son (namespace, scope, params): el namespace agrupa un
+    endpoint ('gallery', 'mine', 'user') y el scope un usuario concreto
+    (None si es público). invalidate() borra por namespace o por
+    namespace + scope; una respuesta que se estaba construyendo mientras
+    hubo una invalidación se entrega pero no se guarda.
+
+    invalidate() solo alcanza al worker que atendió la escritura; para los
+    demás, respond() recibe `not_before` (la última escritura del usuario,
+    ver db.sticky) y descarta lo que se empezó a construir antes.
+    """
+
+    def __init__(self, max_entries=512, ttl=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expira_en, body, etag, construida_desde)
+        self._epoch = 0                 # sube con cada invalidación
+        self._inflight = {}             # key -> (asyncio.Future, construida_desde)
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key, not_before=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic() or (not_before is not None and entry[3] < not_before):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, body: bytes, built_from=None):
+        now = time.monotonic()
+        entry = (now + self.ttl, body, etag_for(body), now if built_from is None else built_from)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, namespace, scope=None):
+        """Invalida un namespace completo o solo el scope indicado"""
+        for key in list(self._entries):
+            if key[0] == namespace and (scope is None or key[1] == scope):
+                del self._entries[key]
+        self._epoch += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._epoch += 1
+
+    async def _load(self, key, build, not_before=None):
+        """Construye la respuesta una sola vez aunque lleguen peticiones concurrentes"""
+        pending = self._inflight.get(key)
+        if pending is not None and (not_before is None or pending[1] >= not_before):
+            return await asyncio.shield(pending[0])
+
+        future = asyncio.get_running_loop().create_future()
+        started = time.monotonic()
+        self._inflight[key] = (future, started)
+        epoch = self._epoch
+        try:
+            body = render_json(await build())
+            if self._epoch == epoch:
+                entry = self.set(key, body, started)
+            else:
+                entry = (0, body, etag_for(body), started)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evita el aviso de "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            # Una construcción más nueva pudo reemplazarla en _inflight
+            current = self._inflight.get(key)
+            if current is not None and current[0] is future:
+                del self._inflight[key]
+
+    async def respond(self, request: Request, key, build, not_before=None) -> Response:
+        """
+        Devuelve la respuesta cacheada (o la construye con `build`) con un
+        ETag fuerte; responde 304 sin cuerpo si el cliente ya la tiene.
+        Con `not_before` (time.monotonic) ignora lo construido antes.
+        """
+        if self.enabled:
+            entry = self.get(key, not_before) or await self._load(key, build, not_before)
+        else:
+            body = render_json(await build())
+            entry = (0, body, etag_for(body), 0)
+
+        _, body, etag, _ = entry
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Instancia global
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 512)),
+    ttl=float(os.getenv('RESPONSE_CACHE_TTL', 5))
+)
@@ -1,8 +1,382 @@
-import pymysql
+import asyncio
+import itertools
+import mmap
 import os
-from dotenv import load_dotenv
+import random
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import pymysql
+
+from . import metrics, profiling
+
+# Códigos de error del cliente (CR_*) que dejan la conexión inservible
+_BROKEN_CONNECTION_ERRORS = {2006, 2013, 2014, 2055}
+
+_PROCEDURE_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# Errores del servidor (ER_*) que se clasifican por código, no por mensaje
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_LOCK_DEADLOCK = 1213
+ER_SIGNAL_EXCEPTION = 1644    # SIGNAL SQLSTATE '45000' desde un SP
+_RETRYABLE_ERRORS = {ER_LOCK_WAIT_TIMEOUT, ER_LOCK_DEADLOCK}
+
+# Errores con los que una réplica se da por caída y la lectura pasa a otra:
+# no se pudo conectar (2002, 2003, 2005) o se perdió la conexión
+_REPLICA_DOWN_ERRORS = _BROKEN_CONNECTION_ERRORS | {2002, 2003, 2005}
+
+# Procedimientos de solo lectura que pueden ir a una réplica. El valor es la
+# posición del parámetro con el usuario que lee (None si no es de un
+# usuario): si ese usuario escribió hace poco, se lee del primario.
+# sp_auth_login y sp_get_notifications_since (stream SSE) no están: van
+# siempre al primario, como todo lo que no figure aquí.
+READ_PROCEDURES = {
+    'sp_artworks_list': None,
+    'sp_artworks_list_keyset': None,
+    'sp_artworks_search': None,
+    'sp_artworks_export': None,
+    'sp_artworks_created': 0,
+    'sp_artworks_created_keyset': 0,
+    'sp_artworks_mine': 0,
+    'sp_get_user_profile': 0,
+    'sp_get_user_photo': 0,
+    'sp_get_notifications': 0,
+    'sp_notifications_unread_count': 0,
+}
+
+# Escrituras tras las que el usuario (posición del parámetro) lee del
+# primario durante DB_STICKY_SECONDS
+WRITE_PROCEDURES = {
+    'sp_purchase': 0,
+    'sp_purchase_cart': 0,
+    'sp_add_balance': 0,
+    'sp_update_user_profile': 0,
+    'sp_set_user_photo': 0,
+    'sp_user_set_photo': 0,
+    'sp_artwork_publish': 0,
+    'sp_artwork_publish_batch': 0,
+    'sp_mark_notification_read': 0,
+}
+
+
+def error_code(error):
+    """errno de MySQL de una excepción de PyMySQL (None si no aplica)"""
+    if isinstance(error, pymysql.err.MySQLError) and error.args and isinstance(error.args[0], int):
+        return error.args[0]
+    return None
+
+
+def error_message(error):
+    """Texto del error tal como lo envió MySQL (MESSAGE_TEXT en un SIGNAL)"""
+    if isinstance(error, pymysql.err.MySQLError) and len(error.args) > 1:
+        return str(error.args[1])
+    return str(error)
+
+
+def is_retryable(error):
+    """Deadlock o lock wait timeout: la transacción se puede repetir completa"""
+    return error_code(error) in _RETRYABLE_ERRORS
+
+
+class PoolClosed(Exception):
+    """El pool ya se cerró en el shutdown: no abre conexiones nuevas"""
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones PyMySQL.
+
+    PyMySQL es bloqueante, así que toda operación sobre una conexión
+    (connect, ping, queries) se ejecuta en un ThreadPoolExecutor con un
+    hilo por conexión posible; el event loop solo espera el resultado.
+    """
+
+    def __init__(self, config, min_size=1, max_size=10, max_idle=300,
+                 recycle=3600, ping_interval=30, drain_timeout=10):
+        self.config = config
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.max_idle = max_idle
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self.drain_timeout = drain_timeout
+
+        # Conexiones libres: (conexión, creada_en, último_uso)
+        self._idle = deque()
+        self._in_use = 0
+        self._semaphore = None
+        self._drained = None
+        self._executor = None
+        self._reaper = None
+        self._closed = True
+        # close() es definitivo: una petición tardía no vuelve a abrirlo
+        self._shutdown = False
+
+    @property
+    def size(self):
+        return len(self._idle) + self._in_use
+
+    @property
+    def in_use(self):
+        return self._in_use
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    async def open(self):
+        """Crea el executor y precalienta min_size conexiones"""
+        if self._shutdown:
+            raise PoolClosed("El pool de conexiones está cerrado")
+        if not self._closed:
+            return
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_size,
+            thread_name_prefix="db-pool"
+        )
+        self._semaphore = asyncio.Semaphore(self.max_size)
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._closed = False
+
+        if self.max_idle:
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+        for _ in range(self.min_size):
+            connection = await self.run(self._connect)
+            now = time.monotonic()
+            self._idle.append((connection, now, now))
+
+    async def close(self):
+        """Espera a que se devuelvan las conexiones en uso y cierra todo"""
+        self._shutdown = True
+        if self._closed:
+            return
+        self._closed = True
+
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"DB_POOL: {self._in_use} conexiones seguían en uso al cerrar")
+
+        while self._idle:
+            connection, _, _ = self._idle.popleft()
+            await self.run(self._close_quietly, connection)
+
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    async def run(self, fn, *args):
+        """Ejecuta una función bloqueante en el executor del pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Presta una conexión viva y la devuelve al salir. Abre el pool en el
+        primer uso; después de close() lanza PoolClosed.
+        """
+        if self._closed:
+            await self.open()
+
+        waited_from = time.perf_counter()
+        await self._semaphore.acquire()
+        self._in_use += 1
+        self._drained.clear()
+        connection = None
+        reusable = True
+        try:
+            connection = await self._checkout()
+            checked_out = time.perf_counter()
+            metrics.db_pool_wait.observe(checked_out - waited_from)
+            profiling.record('db.checkout', waited_from, checked_out)
+            yield connection
+        except BaseException as e:
+            reusable = not self._is_broken(connection, e)
+            raise
+        finally:
+            try:
+                if connection is not None:
+                    if reusable and not self._closed and connection.open:
+                        created = getattr(connection, "_pool_created_at", time.monotonic())
+                        self._idle.append((connection, created, time.monotonic()))
+                    else:
+                        # Con la tarea cancelada (cliente desconectado) este
+                        # await también se cancela; el cierre sigue igual
+                        await asyncio.shield(self.run(self._close_quietly, connection))
+            finally:
+                self._in_use -= 1
+                if self._in_use == 0:
+                    self._drained.set()
+                self._semaphore.release()
+
+    async def _checkout(self):
+        now = time.monotonic()
+        while self._idle:
+            # LIFO: reutiliza la más reciente y deja envejecer las demás
+            connection, created, last_used = self._idle.pop()
+
+            if self.recycle and now - created > self.recycle:
+                await self.run(self._close_quietly, connection)
+                continue
+
+            if self.ping_interval is not None and now - last_used >= self.ping_interval:
+                try:
+                    await self._run_owned(connection.ping, False, connection=connection)
+                except Exception:
+                    await self.run(self._close_quietly, connection)
+                    continue
+
+            connection._pool_created_at = created
+            return connection
+
+        connection = await self._run_owned(self._connect)
+        connection._pool_created_at = time.monotonic()
+        return connection
+
+    async def _run_owned(self, fn, *args, connection=None):
+        """
+        run() para el ping y el connect del checkout. Si la tarea se cancela
+        mientras el hilo trabaja, la conexión todavía no está en _idle ni la
+        tiene nadie: se cierra cuando el hilo termina en vez de perderse.
+        """
+        future = asyncio.ensure_future(self.run(fn, *args))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda done: self._discard(done, connection))
+            raise
+
+    def _discard(self, future, connection):
+        if future.cancelled():
+            return
+        if connection is None and future.exception() is None:
+            connection = future.result()
+        if connection is None:
+            return
+        try:
+            future.get_loop().run_in_executor(self._executor, self._close_quietly, connection)
+        except RuntimeError:
+            # El executor ya se cerró en el shutdown
+            self._close_quietly(connection)
+
+    async def _reap_idle(self):
+        """Cierra periódicamente las conexiones ociosas por encima de min_size"""
+        interval = max(1, min(self.max_idle, 60))
+        while not self._closed:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            keep = deque()
+            expired = []
+            # Las más antiguas están al inicio de la cola
+            while self._idle:
+                item = self._idle.popleft()
+                _, created, last_used = item
+                too_old = self.recycle and now - created > self.recycle
+                too_idle = now - last_used > self.max_idle
+                if (too_old or too_idle) and len(keep) + len(self._idle) + self._in_use >= self.min_size:
+                    expired.append(item[0])
+                else:
+                    keep.append(item)
+            self._idle = keep
+            for connection in expired:
+                await self.run(self._close_quietly, connection)
+
+    def _connect(self):
+        return pymysql.connect(**self.config)
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_broken(connection, error):
+        if connection is None or not connection.open:
+            return True
+        if isinstance(error, pymysql.err.InterfaceError):
+            return True
+        if isinstance(error, pymysql.err.MySQLError) and error.args:
+            return error.args[0] in _BROKEN_CONNECTION_ERRORS
+        # Cancelaciones u otros errores a mitad de protocolo
+        return not isinstance(error, pymysql.err.MySQLError)
+
+
+def pool_max_size():
+    """
+    DB_POOL_MAX, acotado por DB_MAX_CONNECTIONS repartido entre los
+    WEB_CONCURRENCY workers: cada proceso tiene su propio pool.
+    """
+    max_size = int(os.getenv('DB_POOL_MAX', 10))
+    budget = int(os.getenv('DB_MAX_CONNECTIONS', 0))
+    if budget:
+        workers = max(1, int(os.getenv('WEB_CONCURRENCY', 1)))
+        max_size = min(max_size, max(1, budget // workers))
+    return max_size
+
+def replica_endpoints():
+    """DB_REPLICA_HOSTS: 'host[:puerto],...'; sin puerto se usa DB_PORT"""
+    endpoints = []
+    for item in os.getenv('DB_REPLICA_HOSTS', '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(':')
+        endpoints.append((host, int(port or os.getenv('DB_PORT', 3306))))
+    return endpoints
+
+
+class StickyPrimary:
+    """
+    Read-your-writes: cuándo (time.monotonic) escribió cada usuario por
+    última vez. Durante `seconds` desde entonces lee del primario, y el
+    cache de respuestas descarta lo que se construyó antes (written_at).
+
+    Es una tabla de `slots` doubles en memoria compartida anónima; creada
+    al importar, antes del fork de gunicorn (preload_app), la comparten
+    todos los workers: la compra que atiende un worker fija también las
+    lecturas que atienden los demás. Dos usuarios pueden caer en el mismo
+    slot; en ese caso los dos leen del primario, que es el lado seguro.
+    """
+
+    def __init__(self, seconds, slots=65536):
+        self.seconds = seconds
+        self.slots = max(1, slots)
+        self._buffer = mmap.mmap(-1, self.slots * 8)
+        self._written = memoryview(self._buffer).cast('d')
+
+    def mark(self, user_id):
+        slot = self._slot(user_id)
+        if slot is not None:
+            self._written[slot] = time.monotonic()
+
+    def written_at(self, user_id):
+        """Última escritura del usuario (o de otro en su slot); None si no hay"""
+        slot = self._slot(user_id)
+        if slot is None or not self._written[slot]:
+            return None
+        return self._written[slot]
+
+    def active(self, user_id):
+        written = self.written_at(user_id)
+        return written is not None and written + self.seconds > time.monotonic()
+
+    def _slot(self, user_id):
+        try:
+            return int(user_id) % self.slots
+        except (TypeError, ValueError):
+            return None
 
-load_dotenv()
 
 class Database:
     def __init__(self):
@@ -13,41 +387,297 @@ class Database:
             'password': os.getenv('DB_PASSWORD'),
             'database': os.getenv('DB_NAME'),
             'autocommit': True,
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 10)),
             'cursorclass': pymysql.cursors.DictCursor
         }
+        self.pool = ConnectionPool(
+            self.connection_config,
+            min_size=int(os.getenv('DB_POOL_MIN', 1)),
+            max_size=pool_max_size(),
+            max_idle=float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+            recycle=float(os.getenv('DB_POOL_RECYCLE', 3600)),
+            ping_interval=float(os.getenv('DB_POOL_PING_INTERVAL', 30)),
+            drain_timeout=float(os.getenv('DB_POOL_DRAIN_TIMEOUT', 10))
+        )
+        # Réplicas de lectura: mismo usuario, password y base que el primario,
+        # un pool por réplica con los mismos límites
+        self.replicas = [
+            ConnectionPool(
+                dict(self.connection_config, host=host, port=port),
+                min_size=self.pool.min_size,
+                max_size=self.pool.max_size,
+                max_idle=self.pool.max_idle,
+                recycle=self.pool.recycle,
+                ping_interval=self.pool.ping_interval,
+                drain_timeout=self.pool.drain_timeout
+            )
+            for host, port in replica_endpoints()
+        ]
+        # Hasta cuándo se salta cada réplica tras un error de conexión
+        self.replica_down_until = [0.0] * len(self.replicas)
+        self.replica_retry = float(os.getenv('DB_REPLICA_RETRY', 10))
+        self._next_replica = itertools.count()
+        self.sticky = StickyPrimary(
+            float(os.getenv('DB_STICKY_SECONDS', 5)),
+            slots=int(os.getenv('DB_STICKY_SLOTS', 65536))
+        )
+        # 'call': un solo CALL parametrizado (1 round trip)
+        # 'callproc': cursor.callproc de PyMySQL (SET @_sp_n=... + CALL, 2 round trips)
+        self.proc_mode = os.getenv('DB_PROC_MODE', 'call').lower()
+        # Reintentos de execute_procedure_retrying (incluye el primer intento)
+        self.tx_attempts = max(1, int(os.getenv('DB_TX_ATTEMPTS', 4)))
+        self.tx_retry_base = float(os.getenv('DB_TX_RETRY_BASE', 0.02))
+        self.tx_retry_max = float(os.getenv('DB_TX_RETRY_MAX', 0.5))
+        # Segundos que MySQL espera a que se lea un result set en streaming
+        self.stream_write_timeout = int(os.getenv('DB_STREAM_WRITE_TIMEOUT', 600))
 
     def get_connection(self):
+        """Conexión directa fuera del pool (scripts y tareas puntuales)"""
         return pymysql.connect(**self.connection_config)
 
-    async def execute_procedure(self, procedure_name, params=None):
-        """Ejecuta un stored procedure y retorna el primer result set"""
-        connection = None
+    async def connect(self):
+        """Abre los pools (startup de la app); una réplica caída no lo impide"""
+        await self.pool.open()
+        for index, replica in enumerate(self.replicas):
+            try:
+                await replica.open()
+            except Exception as e:
+                self._replica_failed(index, e)
+
+    async def disconnect(self):
+        """Drena y cierra los pools (shutdown de la app)"""
+        await self.pool.close()
+        for replica in self.replicas:
+            await replica.close()
+
+    def route(self, procedure_name, params=None):
+        """
+        Pools a intentar en orden para un SP: las lecturas van a las réplicas
+        sanas (round-robin) con el primario como último recurso; las
+        escrituras y las lecturas de un usuario que escribió hace poco, solo
+        al primario. Una escritura declarada fija a su usuario al primario.
+        """
+        if procedure_name in READ_PROCEDURES and self.replicas:
+            user_id = self._param(params, READ_PROCEDURES[procedure_name])
+            if user_id is not None and self.sticky.active(user_id):
+                metrics.db_reads_routed.inc('sticky')
+                return [(None, self.pool)]
+            now = time.monotonic()
+            first = next(self._next_replica)
+            order = [(first + i) % len(self.replicas) for i in range(len(self.replicas))]
+            healthy = [(i, self.replicas[i]) for i in order if self.replica_down_until[i] <= now]
+            metrics.db_reads_routed.inc('replica' if healthy else 'primary')
+            return healthy + [(None, self.pool)]
+
+        self._mark_writer(procedure_name, params)
+        return [(None, self.pool)]
+
+    async def execute_procedure(self, procedure_name, params=None, last=False):
+        """
+        Ejecuta un stored procedure y retorna el primer result set, o el
+        último con last=True (SPs que cierran con un SELECT de resumen)
+        """
+        if self.proc_mode == 'callproc':
+            invoke = self._callproc
+        else:
+            invoke = self._call
+        start = time.perf_counter()
         try:
-            connection = self.get_connection()
-            with connection.cursor() as cursor:
+            with profiling.span(f'db.{procedure_name}'):
+                for index, pool in self.route(procedure_name, params):
+                    try:
+                        async with pool.connection() as connection:
+                            return await pool.run(invoke, connection, procedure_name, params, last)
+                    except Exception as e:
+                        # Solo las lecturas en réplica pasan a la siguiente
+                        if index is None or not self._replica_down_error(e):
+                            raise
+                        self._replica_failed(index, e)
+        except Exception as e:
+            metrics.db_procedure_errors.inc(procedure_name, str(error_code(e) or type(e).__name__))
+            raise
+        finally:
+            # También al terminar: lo leído antes del COMMIT queda viejo
+            self._mark_writer(procedure_name, params)
+            metrics.db_procedure_duration.observe(time.perf_counter() - start, procedure_name)
+
+    async def execute_procedure_retrying(self, procedure_name, params=None, last=False):
+        """
+        execute_procedure para SPs transaccionales: ante deadlock o lock wait
+        timeout repite la llamada completa, con backoff exponencial y jitter
+        (full jitter) para que los reintentos no vuelvan a chocar juntos.
+        """
+        for attempt in range(self.tx_attempts):
+            try:
+                return await self.execute_procedure(procedure_name, params, last)
+            except pymysql.err.MySQLError as e:
+                if not is_retryable(e) or attempt + 1 >= self.tx_attempts:
+                    raise
+                delay = min(self.tx_retry_max, self.tx_retry_base * 2 ** attempt)
+                print(f"DB_TX_RETRY {procedure_name} ({error_code(e)}), intento {attempt + 2}")
+                await asyncio.sleep(random.uniform(0, delay))
+
+    async def stream_procedure(self, procedure_name, params=None, batch_size=500):
+        """
+        Ejecuta un SP y entrega su primer result set por lotes, leído con un
+        cursor sin buffer (SSDictCursor): la memoria no depende del total de
+        filas. La conexión queda prestada mientras se itera; si se corta
+        antes de terminar, el pool la cierra en vez de leer lo que falta.
+        Una réplica caída se salta solo si aún no se entregó ningún lote.
+        """
+        for index, pool in self.route(procedure_name, params):
+            delivered = False
+            try:
+                async with pool.connection() as connection:
+                    cursor = await pool.run(self._open_stream, connection, procedure_name, params)
+                    while True:
+                        rows = await pool.run(cursor.fetchmany, batch_size)
+                        if not rows:
+                            break
+                        delivered = True
+                        yield rows
+                    await pool.run(self._close_stream, cursor)
+                return
+            except Exception as e:
+                if index is None or delivered or not self._replica_down_error(e):
+                    raise
+                self._replica_failed(index, e)
+
+    async def execute_query(self, query, params=None):
+        """Ejecuta una query directa"""
+        async with self.pool.connection() as connection:
+            return await self.pool.run(self._query, connection, query, params)
+
+    async def execute_many(self, query, rows):
+        """INSERT de varias filas; PyMySQL lo envía como un solo INSERT multi-fila"""
+        async with self.pool.connection() as connection:
+            return await self.pool.run(self._many, connection, query, rows)
+
+    def _mark_writer(self, procedure_name, params):
+        user_id = self._param(params, WRITE_PROCEDURES.get(procedure_name))
+        if user_id is not None:
+            self.sticky.mark(user_id)
+
+    def _replica_failed(self, index, error):
+        self.replica_down_until[index] = time.monotonic() + self.replica_retry
+        config = self.replicas[index].config
+        replica = f"{config['host']}:{config['port']}"
+        metrics.db_replica_failures.inc(replica)
+        print(f"DB_REPLICA {replica} caída por {self.replica_retry:g} s: {error}")
+
+    @staticmethod
+    def _replica_down_error(error):
+        if isinstance(error, pymysql.err.InterfaceError):
+            return True
+        return error_code(error) in _REPLICA_DOWN_ERRORS
+
+    @staticmethod
+    def _param(params, position):
+        if position is None or not params or position >= len(params):
+            return None
+        return params[position]
+
+    @staticmethod
+    def _call(connection, procedure_name, params, last=False):
+        if not _PROCEDURE_NAME.match(procedure_name):
+            raise ValueError(f"Nombre de procedimiento inválido: {procedure_name}")
+
+        params = list(params or [])
+        placeholders = ", ".join(["%s"] * len(params))
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(f"CALL {procedure_name}({placeholders})", params)
+            except pymysql.err.MySQLError:
+                Database._rollback_quietly(connection)
+                raise
+
+            # Todos los result sets (incluido el OK final del CALL) llegan
+            # en la misma respuesta
+            return Database._read_results(cursor, last)
+
+    @staticmethod
+    def _callproc(connection, procedure_name, params, last=False):
+        with connection.cursor() as cursor:
+            try:
                 if params:
                     cursor.callproc(procedure_name, params)
                 else:
                     cursor.callproc(procedure_name)
-                
-                # Obtener el primer result set
+            except pymysql.err.MySQLError:
+                Database._rollback_quietly(connection)
+                raise
+
+            return Database._read_results(cursor, last)
+
+    @staticmethod
+    def _read_results(cursor, last):
+        """
+        Primer result set (o el último con filas, sin contar el OK final del
+        CALL), consumiendo el resto para dejar la conexión reutilizable
+        """
+        result = cursor.fetchall()
+        while cursor.nextset():
+            if last and cursor.description is not None:
                 result = cursor.fetchall()
-                return result
-        finally:
-            if connection:
-                connection.close()
+        return result
 
-    async def execute_query(self, query, params=None):
-        """Ejecuta una query directa"""
-        connection = None
+    def _open_stream(self, connection, procedure_name, params):
+        if not _PROCEDURE_NAME.match(procedure_name):
+            raise ValueError(f"Nombre de procedimiento inválido: {procedure_name}")
+        with connection.cursor() as cursor:
+            # Si el cliente HTTP lee lento, MySQL espera con el envío bloqueado
+            cursor.execute("SET SESSION net_write_timeout = %s", (self.stream_write_timeout,))
+        cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+        placeholders = ", ".join(["%s"] * len(params or []))
+        cursor.execute(f"CALL {procedure_name}({placeholders})", params or None)
+        return cursor
+
+    @staticmethod
+    def _close_stream(cursor):
+        # El OK final del CALL y el valor por defecto de la sesión
+        while cursor.nextset():
+            pass
+        cursor.close()
+        with cursor.connection.cursor() as reset:
+            reset.execute("SET SESSION net_write_timeout = DEFAULT")
+
+    @staticmethod
+    def _rollback_quietly(connection):
+        """
+        Cierra la transacción que un SP pudo dejar abierta al fallar: un lock
+        wait timeout solo revierte la sentencia, y el START TRANSACTION del
+        siguiente uso de la conexión haría commit de lo anterior.
+        """
         try:
-            connection = self.get_connection()
-            with connection.cursor() as cursor:
-                cursor.execute(query, params)
-                return cursor.fetchall()
-        finally:
-            if connection:
-                connection.close()
+            connection.rollback()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _many(connection, query, rows):
+        with connection.cursor() as cursor:
+            return cursor.executemany(query, rows)
+
+    @staticmethod
+    def _query(connection, query, params):
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
 
 # Instancia global
 db = Database()
+
+metrics.Gauge(
+    'db_pool_connections', 'Conexiones del pool por estado', ('state',),
+    read=lambda: {('in_use',): db.pool.in_use, ('idle',): db.pool.idle}
+)
+metrics.Gauge(
+    'db_pool_max_connections', 'Tamaño máximo del pool', read=lambda: db.pool.max_size
+)
+metrics.Gauge(
+    'db_replica_up', 'Réplicas de lectura disponibles (1) o saltadas tras un error (0)', ('replica',),
+    read=lambda: {
+        (f"{replica.config['host']}:{replica.config['port']}",): int(until <= time.monotonic())
+        for replica, until in zip(db.replicas, db.replica_down_until)
+    }
+)
@@ -0,0 +1,99 @@
+"""
+Notificaciones en vivo por Server-Sent Events.
+
+El hub solo lleva avisos "hay algo nuevo para el usuario X"; el stream de
+cada cliente lee las filas con sp_get_notifications_since a partir del
+último id enviado. Así un aviso perdido o duplicado no pierde ni repite
+notificaciones, y el cliente puede reanudar con Last-Event-ID.
+
+Una conexión inactiva solo cuesta un asyncio.Event y la corrutina del
+stream: no toca la base hasta que llega un aviso (o toca el resync).
+"""
+import asyncio
+import os
+import time
+
+from .cache import render_json
+from .db import db
+
+HEARTBEAT_SECONDS = float(os.getenv('NOTIFY_STREAM_HEARTBEAT', 20))
+# Relectura periódica para avisos publicados en otro worker o en el backend
+# Node; 0 la desactiva (un solo worker)
+RESYNC_SECONDS = float(os.getenv('NOTIFY_STREAM_RESYNC', 60))
+RETRY_MS = int(os.getenv('NOTIFY_STREAM_RETRY_MS', 5000))
+BATCH_SIZE = 50
+
+
+class NotificationHub:
+    """Pub/sub en memoria: user_id -> eventos de los streams abiertos"""
+
+    def __init__(self):
+        self._subscribers = {}
+
+    @property
+    def connections(self):
+        return sum(len(events) for events in self._subscribers.values())
+
+    def subscribe(self, user_id: int) -> asyncio.Event:
+        event = asyncio.Event()
+        self._subscribers.setdefault(user_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, user_id: int, event: asyncio.Event):
+        events = self._subscribers.get(user_id)
+        if events is None:
+            return
+        events.discard(event)
+        if not events:
+            del self._subscribers[user_id]
+
+    def publish(self, *user_ids: int):
+        """Despierta los streams de los usuarios indicados"""
+        for user_id in user_ids:
+            for event in self._subscribers.get(user_id, ()):
+                event.set()
+
+
+def _format_event(row) -> str:
+    return f"id: {row['id']}\nevent: notification\ndata: {render_json(row).decode('utf-8')}\n\n"
+
+
+async def notification_stream(user_id: int, last_id=None):
+    """Generador SSE para un usuario; last_id None empieza desde ahora"""
+    wakeup = hub.subscribe(user_id)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+
+        if last_id is None:
+            latest = await db.execute_procedure(
+                'sp_get_notifications_since', [user_id, None, 1]
+            )
+            last_id = latest[0]['id'] if latest else 0
+
+        while True:
+            # Se limpia antes de leer: un aviso durante la lectura no se pierde
+            wakeup.clear()
+            while True:
+                rows = await db.execute_procedure(
+                    'sp_get_notifications_since', [user_id, last_id, BATCH_SIZE]
+                )
+                for row in rows:
+                    last_id = row['id']
+                    yield _format_event(row)
+                if len(rows) < BATCH_SIZE:
+                    break
+            synced_at = time.monotonic()
+
+            while not wakeup.is_set():
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if RESYNC_SECONDS > 0 and time.monotonic() - synced_at >= RESYNC_SECONDS:
+                        break
+                    yield ": ping\n\n"
+    finally:
+        hub.unsubscribe(user_id, wakeup)
+
+
+# Instancia global
+hub = NotificationHub()
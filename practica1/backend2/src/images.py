@@ -0,0 +1,207 @@
+"""
+Derivados de imágenes (miniatura y tamaño medio en WebP).
+
+El decodificado y redimensionado con Pillow es CPU puro, así que corre en
+un ProcessPoolExecutor para no competir por el GIL con el event loop.
+Las variantes se guardan junto al original con una key derivada:
+Fotos_Publicadas/art_1-123.jpg -> Fotos_Publicadas/art_1-123.thumb.webp
+"""
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import posixpath
+import shutil
+import sys
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+from . import profiling
+from .storage import UPLOAD_CHUNK_SIZE, as_stream, get_storage
+
+# Lado mayor de cada variante, en píxeles
+VARIANTS = {
+    'thumb': int(os.getenv('IMAGE_THUMB_SIZE', 320)),
+    'medium': int(os.getenv('IMAGE_MEDIUM_SIZE', 1024)),
+}
+WEBP_QUALITY = int(os.getenv('IMAGE_WEBP_QUALITY', 80))
+# Protección contra "decompression bombs"
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', 40_000_000))
+DERIVATIVES_ENABLED = os.getenv('IMAGE_DERIVATIVES', 'true').lower() == 'true'
+
+_executor = None
+
+class ImageTooLarge(Exception):
+    """La imagen supera MAX_IMAGE_PIXELS"""
+
+class UnsupportedImage(Exception):
+    """Pillow no puede decodificar el archivo (p. ej. SVG)"""
+
+def derivative_key(key: str, variant: str) -> str:
+    base, _ = posixpath.splitext(key)
+    return f"{base}.{variant}.webp"
+
+def derivative_urls(storage, key: str, available=True) -> dict:
+    """
+    thumbnail_url / medium_url para las respuestas de la API. Si las
+    variantes no existen (desactivadas, formato no soportado o imagen
+    anterior al backfill) ambas apuntan al original.
+    """
+    if not key:
+        return {"thumbnail_url": None, "medium_url": None}
+    if not DERIVATIVES_ENABLED or not available or key.lower().endswith('.svg'):
+        # SVG: vectorial, el original sirve para cualquier tamaño
+        url = storage.public_url_from_key(key)
+        return {"thumbnail_url": url, "medium_url": url}
+    return {
+        "thumbnail_url": storage.public_url_from_key(derivative_key(key, 'thumb')),
+        "medium_url": storage.public_url_from_key(derivative_key(key, 'medium')),
+    }
+
+def _render(path: str, variants: dict, max_pixels: int, quality: int) -> dict:
+    """Corre en el proceso hijo: decodifica, valida y genera las variantes"""
+    # Pillow solo se importa en los procesos hijos, no al arrancar la API
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    # El límite se valida explícitamente abajo; el aviso de Pillow sobra
+    warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            if width * height > max_pixels:
+                raise ImageTooLarge(f"La imagen excede {max_pixels} píxeles")
+
+            # Aplica la orientación EXIF y descarta los metadatos
+            img = ImageOps.exif_transpose(img)
+            has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+
+            rendered = {}
+            for variant, size in variants.items():
+                copy = img.copy()
+                copy.thumbnail((size, size), Image.LANCZOS)
+                out = io.BytesIO()
+                copy.save(out, format='WEBP', quality=quality, method=4)
+                rendered[variant] = out.getvalue()
+            return rendered
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e))
+    except (OSError, ValueError, SyntaxError) as e:
+        # Formato no reconocido o archivo corrupto/truncado
+        raise UnsupportedImage(str(e))
+
+def _default_image_workers():
+    # Con varios workers de gunicorn, los núcleos se reparten entre ellos
+    workers = max(1, int(os.getenv('WEB_CONCURRENCY', 1)))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn: el proceso padre ya tiene hilos (pool de DB, S3)
+        _executor = ProcessPoolExecutor(
+            max_workers=int(os.getenv('IMAGE_WORKERS', 0)) or _default_image_workers(),
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _executor
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _spool(fileobj, path: str):
+    fileobj.seek(0)
+    with open(path, 'wb') as out:
+        shutil.copyfileobj(fileobj, out, UPLOAD_CHUNK_SIZE)
+
+async def render_file(path: str) -> dict:
+    """Genera las variantes de un archivo local en el pool de procesos"""
+    loop = asyncio.get_running_loop()
+    with profiling.span('images.render'):
+        return await loop.run_in_executor(
+            _get_executor(), _render, path, VARIANTS, MAX_IMAGE_PIXELS, WEBP_QUALITY
+        )
+
+async def render_upload(upload) -> dict:
+    """
+    Genera las variantes de un UploadFile. Se copia por bloques a un
+    archivo temporal para que el proceso hijo lo lea por ruta en vez de
+    recibir los bytes por pickle.
+
+    Retorna {} si los derivados están desactivados o el formato no es
+    soportado; lanza ImageTooLarge si excede MAX_IMAGE_PIXELS.
+    """
+    if not DERIVATIVES_ENABLED:
+        return {}
+
+    fd, path = tempfile.mkstemp(suffix='.upload')
+    os.close(fd)
+    try:
+        await asyncio.to_thread(_spool, upload.file, path)
+        return await render_path(path)
+    finally:
+        os.remove(path)
+        await upload.seek(0)
+
+async def render_path(path: str) -> dict:
+    """Como render_upload, para un archivo que ya está en disco"""
+    if not DERIVATIVES_ENABLED:
+        return {}
+    try:
+        return await render_file(path)
+    except UnsupportedImage as e:
+        print(f"IMAGE_DERIVATIVES_SKIPPED: {e}")
+        return {}
+
+async def save_derivatives(key: str, rendered: dict) -> dict:
+    """Guarda las variantes junto al original; retorna {variante: key}"""
+    storage = get_storage()
+    keys = {}
+    for variant, data in rendered.items():
+        variant_key = derivative_key(key, variant)
+        # Con keys por contenido, si el original ya existía sus variantes también
+        if storage.naming != 'content' or not await storage.exists(variant_key):
+            await storage.save(variant_key, as_stream(data), 'image/webp')
+        keys[variant] = variant_key
+    return keys
+
+async def backfill():
+    """Regenera las variantes de todas las obras y fotos de perfil existentes"""
+    from .db import db
+
+    storage = get_storage()
+    rows = list(await db.execute_query("SELECT url AS k, 1 AS artwork FROM artworks"))
+    rows += await db.execute_query(
+        "SELECT photo_url AS k, 0 AS artwork FROM users WHERE photo_url IS NOT NULL"
+    )
+    done = skipped = 0
+    for row in rows:
+        fd, path = tempfile.mkstemp(suffix='.backfill')
+        os.close(fd)
+        try:
+            await storage.download(row['k'], path)
+            await save_derivatives(row['k'], await render_file(path))
+            if row['artwork']:
+                # Desde aquí los listados devuelven las miniaturas
+                await db.execute_procedure('sp_artworks_mark_derivatives', [json.dumps([row['k']])])
+            done += 1
+        except Exception as e:
+            print(f"BACKFILL {row['k']}: {e}")
+            skipped += 1
+        finally:
+            os.remove(path)
+    print(f"Variantes generadas: {done}, omitidas: {skipped}")
+    shutdown()
+    await db.disconnect()
+
+if __name__ == "__main__":
+    # python -m src.images backfill
+    if sys.argv[1:] == ['backfill']:
+        asyncio.run(backfill())
+    else:
+        print("Uso: python -m src.images backfill")
@@ -0,0 +1,34 @@
+"""
+Locks en memoria por clave (p. ej. por obra).
+
+Serializa dentro del worker las operaciones sobre una misma clave: las
+peticiones concurrentes esperan aquí en lugar de competir por los row
+locks de InnoDB. Los locks se crean bajo demanda y se descartan cuando
+nadie los usa, así que la memoria depende de las claves activas.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class KeyedLocks:
+    def __init__(self):
+        self._locks = {}     # clave -> [asyncio.Lock, usuarios]
+
+    def waiting(self, key) -> int:
+        """Peticiones con la clave tomada o en espera"""
+        entry = self._locks.get(key)
+        return entry[1] if entry else 0
+
+    @asynccontextmanager
+    async def hold(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
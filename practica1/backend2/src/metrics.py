@@ -0,0 +1,217 @@
+"""
+Métricas en formato de texto de Prometheus (GET /metrics).
+
+Sin dependencias: contadores, gauges e histogramas mínimos. No usan
+locks porque todas las actualizaciones se hacen desde corrutinas, en el
+hilo del event loop; un observe() es un bisect y dos sumas.
+"""
+import os
+import time
+from bisect import bisect_left
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Segundos; cubre desde hits de cache hasta uploads grandes
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra='') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        registry.register(self)
+
+    def _header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount=1):
+        self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = self._header()
+        for values, total in self._series.items():
+            lines.append(f'{self.name}{_labels(self.labelnames, values)} {_number(total)}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Gauge con inc/dec, o calculado al exportar si se pasa `read`"""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=(), read=None):
+        super().__init__(name, help_text, labelnames)
+        self.read = read
+
+    def inc(self, *labelvalues, amount=1):
+        self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def render(self):
+        lines = self._header()
+        series = self._series
+        if self.read is not None:
+            value = self.read()
+            series = value if isinstance(value, dict) else {(): value}
+        for values, current in series.items():
+            lines.append(f'{self.name}{_labels(self.labelnames, values)} {_number(current)}')
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labelvalues):
+        series = self._series.get(labelvalues)
+        if series is None:
+            # [conteo por bucket (el último es +Inf), suma]
+            series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = self._header()
+        bounds = self.buckets + (float('inf'),)
+        for values, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = _labels(self.labelnames, values, f'le="{_number(bound)}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            labels = _labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {_number(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# --- HTTP ---
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'Latencia de las peticiones por ruta',
+    ('method', 'route', 'status')
+)
+http_requests_in_flight = Gauge(
+    'http_requests_in_flight', 'Peticiones en curso'
+)
+
+# --- Base de datos ---
+db_procedure_duration = Histogram(
+    'db_procedure_duration_seconds', 'Duración de cada stored procedure (incluye esperar conexión)',
+    ('procedure',)
+)
+db_procedure_errors = Counter(
+    'db_procedure_errors_total', 'Errores por stored procedure y código de MySQL',
+    ('procedure', 'code')
+)
+db_pool_wait = Histogram(
+    'db_pool_wait_seconds', 'Espera para obtener una conexión del pool'
+)
+db_reads_routed = Counter(
+    'db_reads_routed_total', 'Lecturas por destino: replica, primary (sin réplicas sanas) o sticky',
+    ('target',)
+)
+db_replica_failures = Counter(
+    'db_replica_failures_total', 'Errores de conexión que sacaron a una réplica', ('replica',)
+)
+
+# --- Almacenamiento ---
+storage_upload_bytes = Counter(
+    'storage_upload_bytes_total', 'Bytes recibidos en uploads', ('backend',)
+)
+storage_upload_duration = Histogram(
+    'storage_upload_duration_seconds', 'Duración de cada upload', ('backend',)
+)
+storage_upload_errors = Counter(
+    'storage_upload_errors_total', 'Uploads fallidos', ('backend',)
+)
+
+
+def _route_label(scope: Scope, path: str) -> str:
+    """Plantilla de la ruta (/users/{user_id}); evita una serie por id"""
+    route = scope.get('route')
+    if route is not None:
+        return route.path
+    # El Mount reescribe scope['path']; se usa el original
+    if path.startswith('/static/'):
+        return '/static'
+    return 'unmatched'
+
+
+class MetricsMiddleware:
+    """Latencia por ruta y peticiones en curso"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        path = scope['path']
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                scope['method'], _route_label(scope, path), str(status)
+            )
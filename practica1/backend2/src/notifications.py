@@ -0,0 +1,118 @@
+"""
+Escritura diferida (write-behind) de notificaciones.
+
+Las rutas encolan la notificación y responden sin esperar a MySQL; una
+tarea de fondo junta lo encolado y lo inserta en un solo INSERT
+multi-fila cuando se llena el lote o vence el intervalo. Con la cola
+llena, notify() espera (backpressure) en vez de crecer sin límite.
+En el shutdown se vacía la cola antes de cerrar el pool.
+"""
+import asyncio
+import os
+
+from .db import db
+from .events import hub
+
+INSERT_NOTIFICATION = (
+    "INSERT INTO notifications (user_id, type, title, body) "
+    "VALUES (%s, %s, %s, %s)"
+)
+
+
+class NotificationWriter:
+    def __init__(self, enabled=True, max_queue=1000, batch_size=100,
+                 flush_interval=0.05, flush_timeout=10.0):
+        self.enabled = enabled
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_timeout = flush_timeout
+        self._queue = None
+        self._task = None
+        self._closing = False
+
+    @property
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def notify(self, user_id, notif_type, title, body):
+        """Encola una notificación (mismas validaciones que sp_notify)"""
+        title = (title or '').strip()
+        body = (body or '').strip()
+        if not user_id:
+            raise ValueError("user_id requerido")
+        if not title or not body:
+            raise ValueError("title y body requeridos")
+        row = (int(user_id), notif_type or 'system', title[:200], body[:1000])
+
+        if not self.enabled or self._closing:
+            await db.execute_procedure('sp_notify', list(row))
+            hub.publish(row[0])
+            return
+
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run())
+        await self._queue.put(row)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch):
+        try:
+            await db.execute_many(INSERT_NOTIFICATION, batch)
+            hub.publish(*{row[0] for row in batch})
+            return
+        except Exception as e:
+            print(f"NOTIFICATION_BATCH_ERROR ({len(batch)} filas): {e}")
+
+        # Fila por fila: un usuario inválido no debe tirar el lote completo
+        for row in batch:
+            try:
+                await db.execute_many(INSERT_NOTIFICATION, [row])
+                hub.publish(row[0])
+            except Exception as e:
+                print(f"NOTIFICATION_DROPPED user={row[0]}: {e}")
+
+    async def close(self):
+        """Vacía la cola (shutdown); lo que llegue después se escribe directo"""
+        self._closing = True
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.flush_timeout)
+        except asyncio.TimeoutError:
+            print(f"NOTIFICATIONS_NOT_FLUSHED: {self.pending}")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._queue = None
+
+
+# Instancia global
+notifier = NotificationWriter(
+    enabled=os.getenv('NOTIFY_WRITE_BEHIND', 'true').lower() == 'true',
+    max_queue=int(os.getenv('NOTIFY_QUEUE_MAX', 1000)),
+    batch_size=int(os.getenv('NOTIFY_BATCH_SIZE', 100)),
+    flush_interval=float(os.getenv('NOTIFY_FLUSH_INTERVAL', 0.05)),
+    flush_timeout=float(os.getenv('NOTIFY_FLUSH_TIMEOUT', 10))
+)
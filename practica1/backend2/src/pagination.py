@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import datetime
+
+# Los TIMESTAMP de MySQL tienen precisión de segundos
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def pack_cursor(payload: dict) -> str:
+    """JSON compacto en base64 url-safe, sin relleno"""
+    data = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def unpack_cursor(cursor: str) -> dict:
+    """Inverso de pack_cursor; lanza ValueError si no es válido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Cursor inválido") from e
+    if not isinstance(payload, dict):
+        raise ValueError("Cursor inválido")
+    return payload
+
+
+def format_timestamp(value) -> str:
+    if isinstance(value, datetime):
+        return value.strftime(_TIMESTAMP_FORMAT)
+    return str(value)
+
+
+def parse_timestamp(value) -> str:
+    """Normaliza un TIMESTAMP de un cursor; lanza ValueError si no es válido"""
+    return datetime.strptime(value, _TIMESTAMP_FORMAT).strftime(_TIMESTAMP_FORMAT)
+
+
+def encode_cursor(created_at, row_id) -> str:
+    """Cursor opaco a partir de la última fila de una página"""
+    return pack_cursor({"c": format_timestamp(created_at), "i": int(row_id)})
+
+
+def decode_cursor(cursor: str):
+    """
+    Devuelve (created_at, id) o (None, None) para la primera página.
+    Lanza ValueError si el cursor no es válido.
+    """
+    if not cursor:
+        return None, None
+    payload = unpack_cursor(cursor)
+    try:
+        return parse_timestamp(payload["c"]), int(payload["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def keyset_page(rows, limit):
+    """
+    Recorta una consulta hecha con limit + 1 filas y calcula next_cursor.
+    Retorna (filas_de_la_página, next_cursor).
+    """
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last['created_at'], last['id'])
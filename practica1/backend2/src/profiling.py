@@ -0,0 +1,182 @@
+"""
+Perfilado por petición y captura de peticiones lentas.
+
+Una fracción de las peticiones (PROFILE_SAMPLE_RATE), o las que traen
+X-Profile con el token de PROFILE_TOKEN, registran spans: espera de
+conexión, cada stored procedure, uploads, render de imágenes y
+serialización. Se devuelven en Server-Timing y, si la petición superó
+PROFILE_SLOW_MS, quedan en un buffer circular que expone /admin.
+
+span() sin perfil activo es una lectura de contextvar, así que se puede
+dejar en las rutas calientes.
+"""
+import contextvars
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from hmac import compare_digest
+
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', 500))
+PROFILE_BUFFER_SIZE = int(os.getenv('PROFILE_BUFFER_SIZE', 100))
+# Habilita X-Profile y /admin; vacío = deshabilitados
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+# Si se define, los cProfile se guardan también como .prof (snakeviz, pstats)
+PROFILE_DUMP_DIR = os.getenv('PROFILE_DUMP_DIR', '')
+
+# Respuestas que duran lo que dura la conexión (SSE, export NDJSON): su
+# duración no es lentitud y llenarían el buffer de peticiones lentas
+STREAMING_CONTENT_TYPES = (b'text/event-stream', b'application/x-ndjson')
+
+_current = contextvars.ContextVar('profile', default=None)
+_ids = itertools.count(1)
+slow_requests = deque(maxlen=PROFILE_BUFFER_SIZE)
+# cProfile perfila el hilo completo: solo uno a la vez
+_cprofile_active = False
+
+
+class Profile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []     # (nombre, inicio, fin)
+
+    def add(self, name, start, end):
+        self.spans.append((name, start, end))
+
+    def summary(self):
+        """Milisegundos totales por nombre de span"""
+        totals = {}
+        for name, start, end in self.spans:
+            totals[name] = totals.get(name, 0.0) + (end - start) * 1000
+        return totals
+
+
+def is_privileged(token) -> bool:
+    return bool(PROFILE_TOKEN) and token is not None and compare_digest(token, PROFILE_TOKEN)
+
+
+def record(name: str, start: float, end: float):
+    """Agrega un span ya medido (perf_counter) a la petición actual"""
+    profile = _current.get()
+    if profile is not None:
+        profile.add(name, start, end)
+
+
+@contextmanager
+def span(name: str):
+    """Mide el bloque si la petición actual se está perfilando"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, start, time.perf_counter())
+
+
+class ProfiledJSONResponse(JSONResponse):
+    """JSONResponse que mide su serialización (default_response_class de la app)"""
+
+    def render(self, content) -> bytes:
+        with span('serialize'):
+            return super().render(content)
+
+
+def _server_timing(profile: Profile, total_ms: float) -> bytes:
+    parts = [f'{name.replace(":", "_")};dur={ms:.2f}' for name, ms in profile.summary().items()]
+    parts.append(f'total;dur={total_ms:.2f}')
+    return ', '.join(parts).encode('latin-1', 'replace')
+
+
+def _cprofile_report(profiler: cProfile.Profile, entry_id: int) -> str:
+    if PROFILE_DUMP_DIR:
+        os.makedirs(PROFILE_DUMP_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DUMP_DIR, f'request-{entry_id}.prof'))
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(40)
+    return out.getvalue()
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        global _cprofile_active
+        headers = dict(scope['headers'])
+        forced = is_privileged(headers.get(b'x-profile', b'').decode('latin-1') or None)
+        sampled = forced or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+        profile = Profile() if sampled else None
+        token = _current.set(profile)
+        profiler = None
+        if forced and headers.get(b'x-profile-cprofile') == b'1' and not _cprofile_active:
+            _cprofile_active = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        status = 500
+        streaming = False
+        path = scope['path']
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status, streaming
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                content_type = dict(message.get('headers', [])).get(b'content-type', b'')
+                streaming = content_type.split(b';')[0].strip().lower() in STREAMING_CONTENT_TYPES
+                if profile is not None:
+                    total_ms = (time.perf_counter() - start) * 1000
+                    message.setdefault('headers', [])
+                    message['headers'] = list(message['headers']) + [
+                        (b'server-timing', _server_timing(profile, total_ms))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                _cprofile_active = False
+            _current.reset(token)
+
+            total_ms = (time.perf_counter() - start) * 1000
+            if (total_ms >= PROFILE_SLOW_MS and not streaming) or profiler is not None:
+                entry_id = next(_ids)
+                route = scope.get('route')
+                slow_requests.append({
+                    "id": entry_id,
+                    "at": datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                    "method": scope['method'],
+                    "path": path,
+                    "route": route.path if route is not None else None,
+                    "status": status,
+                    "duration_ms": round(total_ms, 2),
+                    "spans": [
+                        {"name": name,
+                         "start_ms": round((s - profile.start) * 1000, 2),
+                         "duration_ms": round((e - s) * 1000, 2)}
+                        for name, s, e in profile.spans
+                    ] if profile is not None else None,
+                    "summary_ms": ({name: round(ms, 2) for name, ms in profile.summary().items()}
+                                   if profile is not None else None),
+                    "cprofile": _cprofile_report(profiler, entry_id) if profiler is not None else None,
+                })
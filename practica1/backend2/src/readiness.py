@@ -0,0 +1,86 @@
+"""
+Calentamiento al arrancar y /ready.
+
+El startup ya no espera a MySQL ni al almacenamiento: el worker acepta
+conexiones enseguida (/health responde) y en segundo plano abre el pool,
+hace un SELECT 1 y prepara el cliente de almacenamiento (en S3, un
+head_bucket que resuelve credenciales y abre la conexión). /ready responde
+200 solo cuando las dos cosas terminaron; si fallan se reintenta con
+backoff hasta WARMUP_RETRY_MAX segundos entre intentos.
+"""
+import asyncio
+import os
+import time
+
+from .db import db
+from .storage import get_storage
+
+WARMUP_RETRY_MAX = float(os.getenv('WARMUP_RETRY_MAX', 10))
+
+
+class Readiness:
+    def __init__(self):
+        self.checks = {"db": False, "storage": False}
+        self.errors = {}
+        # Segundos desde el startup hasta quedar listo
+        self.ready_after = None
+        self._started = None
+        self._task = None
+
+    @property
+    def ready(self):
+        return all(self.checks.values())
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "checks": dict(self.checks),
+            "errors": dict(self.errors),
+            "ready_after": None if self.ready_after is None else round(self.ready_after, 3),
+        }
+
+    async def _run(self):
+        await asyncio.gather(
+            self._retry("db", self._warm_db),
+            self._retry("storage", self._warm_storage)
+        )
+        self.ready_after = time.perf_counter() - self._started
+        print(f"READY: pool y almacenamiento listos en {self.ready_after:.2f} s")
+
+    async def _retry(self, name, warm):
+        delay = 0.5
+        while True:
+            try:
+                await warm()
+                self.checks[name] = True
+                self.errors.pop(name, None)
+                return
+            except Exception as e:
+                self.errors[name] = str(e)
+                print(f"WARMUP {name} error: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, WARMUP_RETRY_MAX)
+
+    @staticmethod
+    async def _warm_db():
+        await db.connect()
+        await db.execute_query("SELECT 1")
+
+    @staticmethod
+    async def _warm_storage():
+        await get_storage().warm()
+
+
+readiness = Readiness()
@@ -0,0 +1,49 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import PlainTextResponse
+from .. import profiling
+
+router = APIRouter()
+
+def _require_admin(token: Optional[str]):
+    # Sin PROFILE_TOKEN configurado los endpoints no existen
+    if not profiling.PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.is_privileged(token):
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+
+@router.get("/slow-requests")
+async def list_slow_requests(
+    limit: int = Query(50, ge=1, le=500),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Peticiones lentas (> PROFILE_SLOW_MS) y perfiladas con cProfile,
+    la más reciente primero. El detalle de cProfile se pide aparte.
+    """
+    _require_admin(x_admin_token)
+    entries = list(profiling.slow_requests)[::-1][:limit]
+    return {
+        "slowMs": profiling.PROFILE_SLOW_MS,
+        "sampleRate": profiling.PROFILE_SAMPLE_RATE,
+        "requests": [
+            {**{k: v for k, v in entry.items() if k != "cprofile"},
+             "hasCProfile": entry["cprofile"] is not None}
+            for entry in entries
+        ]
+    }
+
+@router.get("/slow-requests/{entry_id}/cprofile", response_class=PlainTextResponse)
+async def get_slow_request_cprofile(entry_id: int, x_admin_token: Optional[str] = Header(None)):
+    """Salida de pstats (top 40 por tiempo acumulado) de una petición perfilada"""
+    _require_admin(x_admin_token)
+    entry = next((e for e in profiling.slow_requests if e["id"] == entry_id), None)
+    if entry is None or entry["cprofile"] is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return entry["cprofile"]
+
+@router.delete("/slow-requests")
+async def clear_slow_requests(x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    profiling.slow_requests.clear()
+    return {"ok": True}
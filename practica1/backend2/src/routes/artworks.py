@@ -1,108 +1,285 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional
 from ..db import db
-from ..storage import get_storage
+from ..storage import get_storage, iter_upload, UploadTooLarge, MAX_BATCH_UPLOADS, BATCH_UPLOAD_CONCURRENCY
+from ..pagination import decode_cursor, keyset_page
+from ..search import SORTS, decode_search_cursor, fulltext_query, search_page
+from ..cache import response_cache, json_response, render_json
+from ..notifications import notifier
+from ..images import ImageTooLarge, derivative_urls, render_upload, save_derivatives
 
 router = APIRouter()
-storage = get_storage()
+
+def _gallery_item(artwork):
+    storage = get_storage()
+    return {
+        "id": artwork['id'],
+        "name": artwork['name'],
+        "image_name": artwork['image_name'],
+        "url_key": artwork['url'],
+        "price": artwork['price'],
+        "is_available": bool(artwork['is_available']),
+        "seller_id": artwork['seller_id'],
+        "seller": artwork['seller'],
+        "public_url": storage.public_url_from_key(artwork['url']),
+        **derivative_urls(storage, artwork['url'], artwork.get('has_derivatives'))
+    }
+
+def _created_item(artwork):
+    storage = get_storage()
+    return {
+        "id": artwork['id'],
+        "name": artwork['name'],
+        "image_name": artwork['image_name'],
+        "url_key": artwork['url'],
+        "price": artwork['price'],
+        "is_available": bool(artwork['is_available']),
+        "acquisition_type": artwork['acquisition_type'],
+        "original_owner_id": artwork['original_owner_id'],
+        "seller": artwork['original_owner_full_name'],
+        "current_owner_id": artwork['current_owner_id'],
+        "current_owner_full_name": artwork['current_owner_full_name'],
+        "created_at": artwork['created_at'],
+        "updated_at": artwork['updated_at'],
+        "public_url": storage.public_url_from_key(artwork['url']),
+        **derivative_urls(storage, artwork['url'], artwork.get('has_derivatives'))
+    }
 
 @router.get("/")
 async def list_artworks(
+    request: Request,
     limit: int = Query(default=100, le=200),
-    offset: int = Query(default=0, ge=0)
+    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None)
 ):
-    """Lista pública de obras con paginación"""
-    try:
-        result = await db.execute_procedure('sp_artworks_list', [limit, offset])
-        
-        data = []
-        for artwork in result:
-            data.append({
-                "id": artwork['id'],
-                "name": artwork['name'],
-                "image_name": artwork['image_name'],
-                "url_key": artwork['url'],
-                "price": artwork['price'],
-                "is_available": bool(artwork['is_available']),
-                "seller_id": artwork['seller_id'],
-                "seller": artwork['seller'],
-                "public_url": storage.public_url_from_key(artwork['url'])
-            })
+    """
+    Lista pública de obras con paginación.
+
+    Sin `cursor` pagina por offset y devuelve una lista (compatibilidad).
+    Con `cursor` (vacío para la primera página) pagina por keyset y
+    devuelve {"items": [...], "next_cursor": ...}.
+    """
+    if cursor is not None:
+        try:
+            after_created, after_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        page_size = limit if limit > 0 else 100
 
-        return data
+        async def build():
+            result = await db.execute_procedure('sp_artworks_list_keyset', [
+                page_size + 1, after_created, after_id
+            ])
+            rows, next_cursor = keyset_page(result, page_size)
+            return {
+                "items": [_gallery_item(artwork) for artwork in rows],
+                "next_cursor": next_cursor
+            }
 
+        key = ('gallery', None, ('cursor', page_size, cursor))
+    else:
+        async def build():
+            result = await db.execute_procedure('sp_artworks_list', [limit, offset])
+            return [_gallery_item(artwork) for artwork in result]
+
+        key = ('gallery', None, ('offset', limit, offset))
+
+    try:
+        return await response_cache.respond(request, key, build)
     except Exception as e:
         print(f"GET /artworks error: {e}")
         raise HTTPException(status_code=500, detail="No se pudieron listar las obras")
 
+@router.get("/search")
+async def search_artworks(
+    request: Request,
+    q: Optional[str] = Query(default=None, max_length=200),
+    min_price: Optional[float] = Query(default=None, ge=0),
+    max_price: Optional[float] = Query(default=None, ge=0),
+    available: bool = Query(default=True),
+    seller_id: Optional[int] = Query(default=None),
+    sort: str = Query(default="newest"),
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = Query(default=None)
+):
+    """
+    Búsqueda por título (FULLTEXT, cada palabra por prefijo) con filtros de
+    precio, disponibilidad y vendedor (propietario actual). Pagina por
+    cursor: {"items": [...], "next_cursor": ...} con el formato de la galería.
+    """
+    if sort not in SORTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"sort debe ser uno de: {', '.join(SORTS)}"
+        )
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price no puede ser mayor que max_price")
+
+    match = None
+    if q is not None and q.strip():
+        match = fulltext_query(q)
+        if match is None:
+            raise HTTPException(status_code=400, detail="La búsqueda no contiene palabras")
+
+    try:
+        after_key, after_id = decode_search_cursor(cursor, sort)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+    async def build():
+        result = await db.execute_procedure('sp_artworks_search', [
+            match, min_price, max_price, int(available), seller_id,
+            sort, limit + 1, after_key, after_id
+        ])
+        rows, next_cursor = search_page(result, limit, sort)
+        return {
+            "items": [_gallery_item(artwork) for artwork in rows],
+            "next_cursor": next_cursor
+        }
+
+    # Mismo namespace que la galería: compras y publicaciones la invalidan
+    key = ('gallery', None, ('search', match, min_price, max_price, available,
+                             seller_id, sort, limit, cursor))
+    try:
+        return await response_cache.respond(request, key, build)
+    except Exception as e:
+        print(f"GET /artworks/search error: {e}")
+        raise HTTPException(status_code=500, detail="No se pudo realizar la búsqueda")
+
 @router.get("/created")
 async def get_created_artworks(
     userId: int = Query(...),
     limit: int = Query(default=100, le=200),
-    offset: int = Query(default=0, ge=0)
+    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None)
 ):
-    """Obras creadas por un autor (paginado)"""
-    try:
-        if not userId:
-            raise HTTPException(status_code=400, detail="userId es requerido")
+    """Obras creadas por un autor (paginado por offset o por cursor)"""
+    if not userId:
+        raise HTTPException(status_code=400, detail="userId es requerido")
 
-        result = await db.execute_procedure('sp_artworks_created', [userId, limit, offset])
-        
-        data = []
-        for artwork in result:
-            public_url = storage.public_url_from_key(artwork['url'])
-            data.append({
-                "id": artwork['id'],
-                "name": artwork['name'],
-                "image_name": artwork['image_name'],
-                "url_key": artwork['url'],
-                "price": artwork['price'],
-                "is_available": bool(artwork['is_available']),
-                "acquisition_type": artwork['acquisition_type'],
-                "original_owner_id": artwork['original_owner_id'],
-                "seller": artwork['original_owner_full_name'],
-                "current_owner_id": artwork['current_owner_id'],
-                "current_owner_full_name": artwork['current_owner_full_name'],
-                "created_at": artwork['created_at'],
-                "updated_at": artwork['updated_at'],
-                "public_url": public_url
+    if cursor is not None:
+        try:
+            after_created, after_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+
+    try:
+        if cursor is not None:
+            page_size = limit if limit > 0 else 100
+            result = await db.execute_procedure('sp_artworks_created_keyset', [
+                userId, page_size + 1, after_created, after_id
+            ])
+            rows, next_cursor = keyset_page(result, page_size)
+            return json_response({
+                "items": [_created_item(artwork) for artwork in rows],
+                "next_cursor": next_cursor
             })
 
-        return data
+        result = await db.execute_procedure('sp_artworks_created', [userId, limit, offset])
+        return json_response([_created_item(artwork) for artwork in result])
 
-    except HTTPException:
-        raise
     except Exception as e:
         print(f"GET /artworks/created error: {e}")
         raise HTTPException(status_code=500, detail="No se pudieron obtener las obras creadas")
 
+@router.get("/export")
+async def export_artworks(
+    updated_since: Optional[str] = Query(default=None),
+    ownerId: Optional[int] = Query(default=None),
+    available: Optional[bool] = Query(default=None)
+):
+    """
+    Catálogo completo en NDJSON (una obra por línea, mismo formato que
+    /created), ordenado por updated_at e id y enviado a medida que MySQL
+    entrega las filas.
+
+    Para sincronizar solo los cambios, pedir `updated_since` con el mayor
+    `updated_at` recibido; es inclusivo, así que pueden repetirse obras de
+    ese mismo segundo.
+    """
+    since = None
+    if updated_since:
+        try:
+            since = datetime.fromisoformat(updated_since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="updated_since inválido")
+        if since.tzinfo is not None:
+            raise HTTPException(
+                status_code=400,
+                detail="updated_since va sin zona horaria, igual que updated_at"
+            )
+
+    params = [
+        since.strftime("%Y-%m-%d %H:%M:%S") if since else None,
+        ownerId,
+        None if available is None else int(available)
+    ]
+
+    # El primer lote se lee antes de responder: si el SP falla aún hay 500
+    batches = db.stream_procedure('sp_artworks_export', params)
+    try:
+        first = await batches.__anext__()
+    except StopAsyncIteration:
+        first = []
+    except Exception as e:
+        print(f"GET /artworks/export error: {e}")
+        raise HTTPException(status_code=500, detail="No se pudo exportar el catálogo")
+
+    def render(rows):
+        # Un bloque por lote de filas en vez de un send por obra
+        return b"".join(render_json(_created_item(row)) + b"\n" for row in rows)
+
+    async def lines():
+        if not first:
+            return
+        yield render(first)
+        try:
+            async for rows in batches:
+                yield render(rows)
+        except Exception as e:
+            # Ya se envió el 200: cortar la respuesta para que el cliente lo note
+            print(f"GET /artworks/export error: {e}")
+            raise
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/mine")
-async def get_my_artworks(userId: int = Query(...)):
+async def get_my_artworks(request: Request, userId: int = Query(...)):
     """Inventario del usuario"""
+    storage = get_storage()
     try:
         if not userId:
             raise HTTPException(status_code=400, detail="userId es requerido")
 
-        result = await db.execute_procedure('sp_artworks_mine', [userId])
-        
-        data = []
-        for artwork in result:
-            public_url = storage.public_url_from_key(artwork['url'])
-            data.append({
-                "id": artwork['id'],
-                "name": artwork['name'],
-                "image_name": artwork['image_name'],
-                "url_key": artwork['url'],
-                "price": artwork['price'],
-                "is_available": bool(artwork['is_available']),
-                "acquisition_type": artwork['acquisition_type'],
-                "seller_id": artwork['original_owner_id'],
-                "seller": artwork['original_owner_full_name'],
-                "public_url": public_url
-            })
+        async def build():
+            result = await db.execute_procedure('sp_artworks_mine', [userId])
 
-        return data
+            data = []
+            for artwork in result:
+                public_url = storage.public_url_from_key(artwork['url'])
+                data.append({
+                    "id": artwork['id'],
+                    "name": artwork['name'],
+                    "image_name": artwork['image_name'],
+                    "url_key": artwork['url'],
+                    "price": artwork['price'],
+                    "is_available": bool(artwork['is_available']),
+                    "acquisition_type": artwork['acquisition_type'],
+                    "seller_id": artwork['original_owner_id'],
+                    "seller": artwork['original_owner_full_name'],
+                    "public_url": public_url,
+                    **derivative_urls(storage, artwork['url'], artwork.get('has_derivatives'))
+                })
+            return data
+
+        return await response_cache.respond(
+            request, ('mine', userId, None), build, not_before=db.sticky.written_at(userId)
+        )
 
     except HTTPException:
         raise
@@ -110,6 +287,72 @@ async def get_my_artworks(userId: int = Query(...)):
         print(f"GET /artworks/mine error: {e}")
         raise HTTPException(status_code=500, detail="No se pudo obtener el inventario")
 
+def validate_artwork(name: str, price: float) -> str:
+    """Valida nombre y precio de una obra nueva; retorna el nombre sin espacios"""
+    if price < 0:
+        raise HTTPException(status_code=400, detail="El precio no puede ser negativo")
+
+    name = (name or "").strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="El nombre es requerido")
+
+    if len(name) > 255:
+        raise HTTPException(status_code=400, detail="El nombre es muy largo")
+    return name
+
+async def publish_artwork(user_id: int, name: str, price: float, key: str, rendered: dict) -> dict:
+    """
+    Registra una obra cuya imagen (y variantes) ya están en el almacenamiento,
+    invalida la galería y notifica al autor. Usado por /upload y por
+    /uploads/finalize.
+    """
+    result = await db.execute_procedure('sp_artwork_publish', [
+        user_id, name, price, key
+    ])
+
+    new_id = None
+    if result:
+        new_id = (result[0].get('id') or 
+                 result[0].get('insert_id') or 
+                 result[0].get('LAST_INSERT_ID'))
+
+    if rendered:
+        await mark_derivatives([key])
+
+    # La galería y el inventario del autor cambiaron
+    response_cache.invalidate('gallery')
+    response_cache.invalidate('mine', user_id)
+
+    await notifier.notify(
+        user_id,
+        'system',
+        'Obra publicada',
+        f'Publicaste "{name}" por Q{price:.2f}.'
+    )
+
+    return _published_item(new_id, name, price, key, rendered)
+
+async def mark_derivatives(keys: list):
+    """
+    Marca las obras cuyas variantes ya se guardaron. Si falla, los
+    listados devuelven el original en lugar de las miniaturas.
+    """
+    try:
+        await db.execute_procedure('sp_artworks_mark_derivatives', [json.dumps(keys)])
+    except Exception as e:
+        print(f"MARK_DERIVATIVES error: {e}")
+
+def _published_item(new_id, name, price, key, rendered):
+    storage = get_storage()
+    return {
+        "id": new_id,
+        "name": name,
+        "url_key": key,
+        "public_url": storage.public_url_from_key(key),
+        **(derivative_urls(storage, key) if rendered else {}),
+        "price": price
+    }
+
 @router.post("/upload")
 async def upload_artwork(
     userId: int = Form(...),
@@ -118,6 +361,7 @@ async def upload_artwork(
     image: UploadFile = File(...)
 ):
     """Subir nueva obra de arte"""
+    storage = get_storage()
     try:
         if not userId:
             raise HTTPException(status_code=400, detail="userId es requerido")
@@ -125,60 +369,159 @@ async def upload_artwork(
         if not image:
             raise HTTPException(status_code=400, detail="Imagen es requerida")
         
-        if price < 0:
-            raise HTTPException(status_code=400, detail="El precio no puede ser negativo")
-        
-        name = name.strip()
-        if not name:
-            raise HTTPException(status_code=400, detail="El nombre es requerido")
-        
-        if len(name) > 255:
-            raise HTTPException(status_code=400, detail="El nombre es muy largo")
+        name = validate_artwork(name, price)
 
-        # 1) Subir imagen
-        image_content = await image.read()
+        # 1) Validar la imagen y generar miniaturas (pool de procesos)
+        rendered = await render_upload(image)
+
+        # 2) Subir imagen original y sus variantes
         key = await storage.upload(
-            buffer=image_content,
+            stream=iter_upload(image),
             mime_type=image.content_type,
             folder="Fotos_Publicadas",
             name_base=f"art_{userId}"
         )
+        await save_derivatives(key, rendered)
 
-        # 2) Guardar en BD
-        result = await db.execute_procedure('sp_artwork_publish', [
-            userId, name, price, key
-        ])
-
-        new_id = None
-        if result:
-            new_id = (result[0].get('id') or 
-                     result[0].get('insert_id') or 
-                     result[0].get('LAST_INSERT_ID'))
-
-        # 3) Enviar notificación
-        await db.execute_procedure('sp_notify', [
-            userId,
-            'system',
-            'Obra publicada',
-            f'Publicaste "{name}" por Q{price:.2f}.'
-        ])
-
-        return {
-            "id": new_id,
-            "name": name,
-            "url_key": key,
-            "public_url": storage.public_url_from_key(key),
-            "price": price
-        }
+        # 3) Guardar en BD y notificar
+        return await publish_artwork(userId, name, price, key, rendered)
 
     except HTTPException:
         raise
+    except (UploadTooLarge, ImageTooLarge) as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
+        # uq_artworks__url: con STORAGE_NAMING=content la key es el hash de la imagen
         if 'Duplicate entry' in str(e):
-            raise HTTPException(status_code=409, detail="Ya existe una obra con ese nombre")
+            raise HTTPException(status_code=409, detail="Ya existe una obra con esa imagen")
         print(f"POST /artworks/upload error: {e}")
         raise HTTPException(status_code=500, detail="No se pudo publicar la obra")
 
+async def _store_batch_image(semaphore, user_id: int, index: int, image: UploadFile):
+    """Miniaturas y escritura de una imagen del lote; a lo sumo BATCH_UPLOAD_CONCURRENCY a la vez"""
+    storage = get_storage()
+    async with semaphore:
+        rendered = await render_upload(image)
+        key = await storage.upload(
+            stream=iter_upload(image),
+            mime_type=image.content_type,
+            folder="Fotos_Publicadas",
+            # El índice evita que dos imágenes del mismo milisegundo compartan key
+            name_base=f"art_{user_id}_{index}"
+        )
+        await save_derivatives(key, rendered)
+        return key, rendered
+
+@router.post("/upload/batch")
+async def upload_artworks_batch(
+    userId: int = Form(...),
+    names: List[str] = Form(...),
+    prices: List[float] = Form(default=[]),
+    images: List[UploadFile] = File(...)
+):
+    """
+    Publicar varias obras en una petición: `images`, `names` y `prices` se
+    repiten una vez por obra, en el mismo orden (`prices` es opcional).
+
+    Las imágenes se escriben en paralelo (BATCH_UPLOAD_CONCURRENCY) y las
+    obras se insertan juntas con sp_artwork_publish_batch. Responde el
+    resultado de cada obra por índice y envía una sola notificación.
+    """
+    if not userId:
+        raise HTTPException(status_code=400, detail="userId es requerido")
+    if not images:
+        raise HTTPException(status_code=400, detail="Imagen es requerida")
+    if len(images) > MAX_BATCH_UPLOADS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {MAX_BATCH_UPLOADS} obras por lote"
+        )
+    if len(names) != len(images) or (prices and len(prices) != len(images)):
+        raise HTTPException(
+            status_code=400,
+            detail="Se requiere un name (y un price, si se envían) por imagen"
+        )
+    prices = prices or [0.0] * len(images)
+
+    results = [None] * len(images)
+    valid = []
+    for index, (name, price) in enumerate(zip(names, prices)):
+        try:
+            valid.append((index, validate_artwork(name, price), price))
+        except HTTPException as e:
+            results[index] = {"index": index, "ok": False, "name": name, "error": e.detail}
+
+    # 1) Miniaturas y almacenamiento, en paralelo con tope
+    semaphore = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+    stored = await asyncio.gather(
+        *(_store_batch_image(semaphore, userId, index, images[index]) for index, _, _ in valid),
+        return_exceptions=True
+    )
+
+    publish = []
+    keys = set()
+    for (index, name, price), outcome in zip(valid, stored):
+        if isinstance(outcome, BaseException):
+            if isinstance(outcome, (UploadTooLarge, ImageTooLarge)):
+                error = str(outcome)
+            else:
+                print(f"POST /artworks/upload/batch error (#{index}): {outcome}")
+                error = "No se pudo guardar la imagen"
+            results[index] = {"index": index, "ok": False, "name": name, "error": error}
+            continue
+        key, rendered = outcome
+        # Con STORAGE_NAMING=content la misma imagen dos veces da la misma key
+        if key in keys:
+            results[index] = {"index": index, "ok": False, "name": name,
+                              "error": "Imagen repetida en el lote"}
+            continue
+        keys.add(key)
+        publish.append((index, name, price, key, rendered))
+
+    # 2) Un INSERT multi-fila en una transacción
+    ids = {}
+    if publish:
+        try:
+            rows = await db.execute_procedure('sp_artwork_publish_batch', [
+                userId,
+                json.dumps([{"name": name, "price": price, "url": key}
+                            for _, name, price, key, _ in publish])
+            ])
+        except Exception as e:
+            print(f"POST /artworks/upload/batch error: {e}")
+            raise HTTPException(status_code=500, detail="No se pudieron publicar las obras")
+        ids = {row['url']: row['id'] for row in rows}
+        rendered_keys = [key for _, _, _, key, rendered in publish if rendered and key in ids]
+        if rendered_keys:
+            await mark_derivatives(rendered_keys)
+
+    published = []
+    for index, name, price, key, rendered in publish:
+        if key not in ids:
+            results[index] = {"index": index, "ok": False, "name": name,
+                              "error": "Ya existe una obra con esa imagen"}
+            continue
+        published.append(price)
+        results[index] = {"index": index, "ok": True,
+                          **_published_item(ids[key], name, price, key, rendered)}
+
+    # 3) Cache y una sola notificación
+    failed = len(images) - len(published)
+    if published:
+        response_cache.invalidate('gallery')
+        response_cache.invalidate('mine', userId)
+
+        body = (f'Publicaste {len(published)} obra{"s" if len(published) != 1 else ""} '
+                f'por un total de Q{sum(published):.2f}.')
+        if failed:
+            body += f' {failed} no se pudieron publicar.'
+        try:
+            await notifier.notify(userId, 'system', 'Obras publicadas', body)
+        except Exception as e:
+            print(f"POST /artworks/upload/batch notify error: {e}")
+
+    return {"published": len(published), "failed": failed, "items": results}
+
 @router.get("/__debug")
 async def debug_storage():
     """Endpoint de debug para verificar configuración de almacenamiento"""
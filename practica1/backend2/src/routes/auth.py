@@ -3,10 +3,11 @@ from pydantic import BaseModel
 import hashlib
 from typing import Optional
 from ..db import db
-from ..storage import get_storage
+from ..notifications import notifier
+from ..storage import get_storage, iter_upload
+from ..images import derivative_urls, render_upload, save_derivatives
 
 router = APIRouter()
-storage = get_storage()
 
 class LoginRequest(BaseModel):
     username: str
@@ -28,6 +29,7 @@ async def register(
     password: str = Form(...),
     image: Optional[UploadFile] = File(None)
 ):
+    storage = get_storage()
     try:
         if not username or not full_name or not password:
             raise HTTPException(
@@ -52,26 +54,28 @@ async def register(
 
         # 2) Si hay imagen, subir y guardar KEY
         photo_key = None
+        rendered = {}
         if image:
             try:
-                image_content = await image.read()
+                rendered = await render_upload(image)
                 photo_key = await storage.upload(
-                    buffer=image_content,
+                    stream=iter_upload(image),
                     mime_type=image.content_type,
                     folder="Fotos_Perfil",
                     name_base=f"u_{user_id}"
                 )
+                await save_derivatives(photo_key, rendered)
                 await db.execute_procedure('sp_user_set_photo', [user_id, photo_key])
             except Exception as err:
                 print(f"REGISTER_PHOTO_UPLOAD_ERROR: {err}")
 
         # 3) Enviar notificación de bienvenida
-        await db.execute_procedure('sp_notify', [
+        await notifier.notify(
             user_id,
             'system',
             '¡Bienvenido a ArtGalleryCloud!',
             f'Hola {full_name.strip()}, tu cuenta fue creada correctamente.'
-        ])
+        )
 
         response = {
             "ok": True,
@@ -84,7 +88,8 @@ async def register(
         if photo_key:
             response.update({
                 "photo_key": photo_key,
-                "public_url": storage.public_url_from_key(photo_key)
+                "public_url": storage.public_url_from_key(photo_key),
+                **(derivative_urls(storage, photo_key) if rendered else {})
             })
         elif image:
             response["warning"] = "La imagen no se pudo guardar; el usuario se creó sin foto."
@@ -1,34 +1,111 @@
+import json
+import os
+import time
+from contextlib import AsyncExitStack
+from typing import List
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from ..db import db
+from ..db import db, error_code, error_message, is_retryable, ER_SIGNAL_EXCEPTION
+from ..cache import response_cache
+from ..events import hub
+from ..locks import KeyedLocks
 
 router = APIRouter()
 
+# Compras de una misma obra se serializan en el worker
+artwork_locks = KeyedLocks()
+# Obras vendidas recientemente: quien esperaba en el lock falla sin ir a la BD
+SOLD_TTL = 60
+_recently_sold = {}
+MAX_CART_ITEMS = int(os.getenv('MAX_CART_ITEMS', 50))
+
 class PurchaseRequest(BaseModel):
     buyerId: int
     artworkId: int
 
+class CartRequest(BaseModel):
+    buyerId: int
+    artworkIds: List[int]
+
+def _mark_sold(art_id: int):
+    now = time.monotonic()
+    _recently_sold[art_id] = now
+    if len(_recently_sold) > 1024:
+        for key, sold_at in list(_recently_sold.items()):
+            if now - sold_at > SOLD_TTL:
+                del _recently_sold[key]
+
+def _was_sold(art_id: int) -> bool:
+    sold_at = _recently_sold.get(art_id)
+    return sold_at is not None and time.monotonic() - sold_at <= SOLD_TTL
+
+def _business_error(message: str) -> HTTPException:
+    """Errores de negocio (SIGNAL 45000) del SP"""
+    if message.startswith(('La obra', 'No puedes', 'Saldo')):
+        return HTTPException(status_code=409, detail=message)
+    return HTTPException(status_code=409, detail="Operación inválida")
+
+def _purchase_error(error, route: str) -> HTTPException:
+    # Errores de negocio señalados con SIGNAL 45000 desde el SP
+    if error_code(error) == ER_SIGNAL_EXCEPTION:
+        return _business_error(error_message(error))
+
+    # Deadlocks o timeouts que siguieron después de los reintentos
+    if is_retryable(error):
+        return HTTPException(
+            status_code=409,
+            detail="Conflicto de concurrencia, intenta de nuevo",
+            headers={"Retry-After": "1"}
+        )
+
+    print(f"{route} error: {error}")
+    return HTTPException(
+        status_code=500,
+        detail="No se pudo completar la compra"
+    )
+
 @router.post("/")
 async def purchase_artwork(request: PurchaseRequest):
     """
     Procesar compra de obra de arte
-    
+
     Llama al SP transaccional sp_purchase(buyerId, artworkId)
     La lógica de negocio (locks, saldo, transferencia, notificaciones)
-    vive en la base de datos.
+    vive en la base de datos. Los deadlocks y lock wait timeouts se
+    reintentan aquí, y los compradores de una misma obra esperan su turno
+    en el worker en vez de acumularse sobre el row lock de InnoDB.
     """
+    buyer = request.buyerId
+    art_id = request.artworkId
+
+    if not buyer or not art_id:
+        raise HTTPException(
+            status_code=400,
+            detail="buyerId y artworkId son requeridos"
+        )
+
     try:
-        buyer = request.buyerId
-        art_id = request.artworkId
+        async with artwork_locks.hold(art_id):
+            # Ya la compró quien tenía el turno antes
+            if _was_sold(art_id):
+                raise _business_error('La obra no está disponible')
 
-        if not buyer or not art_id:
-            raise HTTPException(
-                status_code=400, 
-                detail="buyerId y artworkId son requeridos"
-            )
+            # Ejecuta el SP (él hace todo: valida, mueve saldos, transfiere, notifica)
+            # El seller_id es el SELECT final; con last=True no importa si
+            # el SP emite antes otros result sets
+            result = await db.execute_procedure_retrying('sp_purchase', [buyer, art_id], last=True)
+            _mark_sold(art_id)
 
-        # Ejecuta el SP (él hace todo: valida, mueve saldos, transfiere, notifica)
-        await db.execute_procedure('sp_purchase', [buyer, art_id])
+        # La obra sale de la galería y cambian inventarios y saldos de
+        # comprador y vendedor
+        response_cache.invalidate('gallery')
+        response_cache.invalidate('mine')
+        response_cache.invalidate('user')
+
+        # Avisar en vivo a comprador y vendedor (el SP insertó ambas notificaciones)
+        seller = result[0].get('seller_id') if result else None
+        hub.publish(buyer, *([int(seller)] if seller else []))
 
         # Si llegó aquí, la compra se concretó
         return {
@@ -37,33 +114,68 @@ async def purchase_artwork(request: PurchaseRequest):
             "buyerId": buyer
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        error_msg = str(e)
-        
-        # Errores de negocio señalados con SIGNAL 45000 desde el SP
-        if ('45000' in error_msg or 
-            'La obra no existe' in error_msg or
-            'La obra no está disponible' in error_msg or
-            'No puedes comprar tu propia obra' in error_msg or
-            'Saldo insuficiente' in error_msg or
-            'Vendedor no existe' in error_msg or
-            'Comprador no existe' in error_msg):
-            
-            raise HTTPException(
-                status_code=409, 
-                detail=error_msg if 'La obra' in error_msg or 'No puedes' in error_msg or 'Saldo' in error_msg 
-                       else "Operación inválida"
-            )
+        raise _purchase_error(e, "POST /purchase")
 
-        # Deadlocks o timeouts
-        if 'Deadlock' in error_msg or 'Lock wait timeout' in error_msg:
-            raise HTTPException(
-                status_code=409, 
-                detail="Conflicto de concurrencia, intenta de nuevo"
-            )
+@router.post("/cart")
+async def purchase_cart(request: CartRequest):
+    """
+    Comprar varias obras en una sola transacción (sp_purchase_cart).
 
-        print(f"POST /purchase error: {e}")
+    Todo o nada: si una obra no está disponible o no alcanza el saldo no se
+    compra ninguna. Un solo chequeo de saldo, un UPDATE por vendedor y las
+    notificaciones en un INSERT, en lugar de N llamadas a /purchase.
+    """
+    buyer = request.buyerId
+    art_ids = sorted(set(request.artworkIds))
+
+    if not buyer or not art_ids or art_ids[0] <= 0:
+        raise HTTPException(
+            status_code=400,
+            detail="buyerId y artworkIds son requeridos"
+        )
+    if len(art_ids) > MAX_CART_ITEMS:
         raise HTTPException(
-            status_code=500, 
-            detail="No se pudo completar la compra"
+            status_code=400,
+            detail=f"El carrito admite hasta {MAX_CART_ITEMS} obras"
         )
+
+    try:
+        async with AsyncExitStack() as stack:
+            # Mismo orden que el SP: dos carritos no se esperan en círculo
+            for art_id in art_ids:
+                await stack.enter_async_context(artwork_locks.hold(art_id))
+
+            sold = next((art_id for art_id in art_ids if _was_sold(art_id)), None)
+            if sold is not None:
+                raise _business_error(f'La obra #{sold} no está disponible')
+
+            result = await db.execute_procedure_retrying(
+                'sp_purchase_cart', [buyer, json.dumps(art_ids)]
+            )
+            for art_id in art_ids:
+                _mark_sold(art_id)
+
+        response_cache.invalidate('gallery')
+        response_cache.invalidate('mine')
+        response_cache.invalidate('user')
+
+        sellers = {int(row['seller_id']) for row in result}
+        hub.publish(buyer, *sellers)
+
+        return {
+            "ok": True,
+            "buyerId": buyer,
+            "items": [
+                {"artworkId": row['artwork_id'], "sellerId": row['seller_id'], "price": row['price']}
+                for row in result
+            ],
+            "total": sum(row['price'] for row in result)
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _purchase_error(e, "POST /purchase/cart")
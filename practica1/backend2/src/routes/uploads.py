@@ -0,0 +1,248 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import tempfile
+import time
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel
+from ..db import db
+from ..storage import get_storage, limit_stream, UploadTooLarge, MAX_UPLOAD_BYTES, PENDING_FOLDER
+from ..images import DERIVATIVES_ENABLED, ImageTooLarge, render_path, save_derivatives
+from ..locks import KeyedLocks
+from .artworks import validate_artwork, publish_artwork
+from .users import set_user_photo
+
+router = APIRouter()
+
+# Vigencia de la URL de subida, y margen extra para llamar a finalize
+UPLOAD_URL_TTL = int(os.getenv('UPLOAD_URL_TTL', 900))
+UPLOAD_FINALIZE_GRACE = int(os.getenv('UPLOAD_FINALIZE_GRACE', 3600))
+_signing_key = os.getenv('UPLOAD_SIGNING_KEY', '').encode('utf-8')
+if not _signing_key:
+    # Con preload (gunicorn.conf.py) los workers la heredan del master; sin
+    # preload o con varias instancias cada proceso tendría la suya
+    print("UPLOAD_SIGNING_KEY no definido: los tokens de upload no sobreviven a un reinicio")
+    _signing_key = secrets.token_bytes(32)
+
+# propósito -> (carpeta, prefijo del nombre), igual que los uploads por la API
+PURPOSES = {
+    'artwork': ('Fotos_Publicadas', 'art'),
+    'photo': ('Fotos_Perfil', 'u'),
+}
+
+# Dos finalize del mismo token en el worker no se pisan; entre workers e
+# instancias lo resuelve sp_upload_claim
+_finalizing = KeyedLocks()
+
+class PresignRequest(BaseModel):
+    userId: int
+    purpose: str
+    contentType: str
+    size: int
+    name: Optional[str] = None
+    price: float = 0
+
+class FinalizeRequest(BaseModel):
+    token: str
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def _sign(payload: dict) -> str:
+    body = _b64(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    signature = hmac.new(_signing_key, body.encode('ascii'), hashlib.sha256).digest()
+    return f"{body}.{_b64(signature)}"
+
+def _verify(token: str, grace: int = 0) -> dict:
+    """Payload del token si la firma es válida y no venció (más `grace` segundos)"""
+    try:
+        body, signature = token.split('.')
+        expected = hmac.new(_signing_key, body.encode('ascii'), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _unb64(signature)):
+            raise ValueError("firma")
+        payload = json.loads(_unb64(body))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=403, detail="Token de upload inválido")
+    if time.time() > payload['e'] + grace:
+        raise HTTPException(status_code=403, detail="El token de upload venció")
+    return payload
+
+def _published_key(pending_key: str) -> str:
+    """Key final con nombres por timestamp: la misma sin el prefijo Pendientes/"""
+    return pending_key[len(PENDING_FOLDER) + 1:]
+
+async def _already_finalized(storage, pending_key: str) -> bool:
+    """El token ya se usó: está reservado en la base o su destino ya existe"""
+    result = await db.execute_procedure('sp_upload_claimed', [pending_key])
+    if result and result[0].get('claimed'):
+        return True
+    return storage.naming != 'content' and await storage.exists(_published_key(pending_key))
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+@router.post("/presign")
+async def presign_upload(request: PresignRequest):
+    """
+    Paso 1 del upload directo: reserva una key y devuelve a dónde subir el
+    archivo (PUT prefirmado de S3, o /uploads/local/{token} con
+    LocalStorage) y el token que después se manda a /uploads/finalize.
+    """
+    storage = get_storage()
+    if not request.userId:
+        raise HTTPException(status_code=400, detail="userId es requerido")
+    if request.purpose not in PURPOSES:
+        raise HTTPException(status_code=400, detail="purpose debe ser 'artwork' o 'photo'")
+    mime_type = request.contentType.strip().lower()
+    if not mime_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="Solo se aceptan imágenes")
+    if request.size <= 0:
+        raise HTTPException(status_code=400, detail="size es requerido")
+    if request.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=str(UploadTooLarge(MAX_UPLOAD_BYTES)))
+
+    name = None
+    if request.purpose == 'artwork':
+        name = validate_artwork(request.name, request.price)
+
+    folder, prefix = PURPOSES[request.purpose]
+    key = storage.new_key(mime_type, f"{PENDING_FOLDER}/{folder}", f"{prefix}_{request.userId}")
+    token = _sign({
+        "k": key,
+        "u": request.userId,
+        "p": request.purpose,
+        "m": mime_type,
+        "s": request.size,
+        "n": name,
+        "$": request.price,
+        "e": int(time.time()) + UPLOAD_URL_TTL,
+    })
+
+    try:
+        target = storage.presign_put(key, mime_type, request.size, UPLOAD_URL_TTL)
+    except Exception as e:
+        print(f"POST /uploads/presign error: {e}")
+        raise HTTPException(status_code=500, detail="No se pudo preparar el upload")
+    if target is None:
+        target = {"url": f"/uploads/local/{token}", "headers": {"Content-Type": mime_type}}
+
+    return {
+        "method": "PUT",
+        "url": target["url"],
+        "headers": target["headers"],
+        "token": token,
+        "expiresIn": UPLOAD_URL_TTL
+    }
+
+@router.put("/local/{token}")
+async def put_local_upload(token: str, request: Request):
+    """Destino del PUT con LocalStorage: guarda el cuerpo tal cual en la key del token"""
+    storage = get_storage()
+    if storage.backend != 'local':
+        raise HTTPException(status_code=404, detail="Not Found")
+    payload = _verify(token)
+
+    if await _already_finalized(storage, payload['k']):
+        raise HTTPException(status_code=409, detail="El upload ya fue finalizado")
+    if request.headers.get('content-type', '').split(';')[0].strip().lower() != payload['m']:
+        raise HTTPException(status_code=400, detail="Content-Type distinto al declarado")
+    content_length = request.headers.get('content-length')
+    if content_length is not None and content_length != str(payload['s']):
+        raise HTTPException(status_code=400, detail="El tamaño no coincide con el declarado")
+
+    try:
+        await storage.save(payload['k'], limit_stream(request.stream(), payload['s']), payload['m'])
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail="El tamaño no coincide con el declarado")
+    except Exception as e:
+        print(f"PUT /uploads/local error: {e}")
+        raise HTTPException(status_code=500, detail="No se pudo guardar el archivo")
+    return {"ok": True}
+
+@router.post("/finalize")
+async def finalize_upload(request: FinalizeRequest):
+    """
+    Paso 2: verifica el archivo subido (tamaño declarado, imagen válida),
+    genera miniaturas, lo mueve de Pendientes/ a su carpeta y lo registra
+    con sp_artwork_publish o sp_set_user_photo. El token es de un solo uso:
+    se reserva con sp_upload_claim antes de mover nada.
+    """
+    storage = get_storage()
+    payload = _verify(request.token, UPLOAD_FINALIZE_GRACE)
+    pending_key = payload['k']
+
+    async with _finalizing.hold(pending_key):
+        try:
+            size = await storage.size_of(pending_key)
+            if size is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail="No se encontró el archivo: súbelo o ya fue finalizado"
+                )
+            if size != payload['s']:
+                await storage.delete(pending_key)
+                raise HTTPException(status_code=400, detail="El tamaño no coincide con el declarado")
+
+            claim = await db.execute_procedure('sp_upload_claim', [pending_key, payload['u']])
+            if not claim or not claim[0].get('claimed'):
+                # Sin borrar Pendientes/: otro worker puede estar moviéndolo
+                raise HTTPException(status_code=404, detail="El upload ya fue finalizado")
+
+            # Los bytes solo pasan por el worker si hacen falta miniaturas o el hash
+            rendered, digest = {}, None
+            if DERIVATIVES_ENABLED or storage.naming == 'content':
+                fd, path = tempfile.mkstemp(suffix='.finalize')
+                os.close(fd)
+                try:
+                    await storage.download(pending_key, path)
+                    try:
+                        rendered = await render_path(path)
+                    except ImageTooLarge:
+                        await storage.delete(pending_key)
+                        raise
+                    if storage.naming == 'content':
+                        digest = await asyncio.to_thread(_sha256_file, path)
+                finally:
+                    os.remove(path)
+
+            folder, _ = PURPOSES[payload['p']]
+            if digest is not None:
+                key = storage.content_key(folder, digest, payload['m'])
+                if await storage.exists(key):
+                    await storage.delete(pending_key)
+                else:
+                    await storage.move(pending_key, key)
+            else:
+                key = _published_key(pending_key)
+                # Las keys publicadas son immutable: nunca se reemplazan
+                if await storage.exists(key):
+                    await storage.delete(pending_key)
+                    raise HTTPException(status_code=409, detail="El upload ya fue finalizado")
+                await storage.move(pending_key, key)
+            await save_derivatives(key, rendered)
+
+            if payload['p'] == 'artwork':
+                return await publish_artwork(payload['u'], payload['n'], payload['$'], key, rendered)
+            return await set_user_photo(payload['u'], key, rendered)
+
+        except HTTPException:
+            raise
+        except ImageTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            if 'Duplicate entry' in str(e):
+                raise HTTPException(status_code=409, detail="Ya existe una obra con esa imagen")
+            print(f"POST /uploads/finalize error: {e}")
+            raise HTTPException(status_code=500, detail="No se pudo finalizar el upload")
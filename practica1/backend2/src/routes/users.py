@@ -1,13 +1,16 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header, Query, Request
+from fastapi.responses import RedirectResponse, StreamingResponse
 from pydantic import BaseModel
 import hashlib
 from typing import Optional
 from ..db import db
-from ..storage import get_storage
+from ..storage import get_storage, iter_upload, UploadTooLarge
+from ..cache import response_cache
+from ..events import notification_stream
+from ..notifications import notifier
+from ..images import ImageTooLarge, derivative_urls, render_upload, save_derivatives
 
 router = APIRouter()
-storage = get_storage()
 
 class BalanceRequest(BaseModel):
     amount: float
@@ -23,17 +26,23 @@ def md5_hash(text: str) -> str:
     return hashlib.md5(text.encode('utf-8')).hexdigest()[:16]
 
 @router.get("/{user_id}")
-async def get_user_profile(user_id: int):
+async def get_user_profile(request: Request, user_id: int):
     try:
         if not user_id:
             raise HTTPException(status_code=400, detail="ID de usuario inválido")
 
-        result = await db.execute_procedure('sp_get_user_profile', [user_id])
-        
-        if not result:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-        
-        return result[0]
+        async def build():
+            result = await db.execute_procedure('sp_get_user_profile', [user_id])
+
+            if not result:
+                raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+            return result[0]
+
+        # Tras una recarga o compra atendida por otro worker, no servir el saldo viejo
+        return await response_cache.respond(
+            request, ('user', user_id, None), build, not_before=db.sticky.written_at(user_id)
+        )
 
     except HTTPException:
         raise
@@ -55,13 +64,15 @@ async def add_balance(user_id: int, request: BalanceRequest):
         if not result:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
+        response_cache.invalidate('user', user_id)
+
         # Enviar notificación
-        await db.execute_procedure('sp_notify', [
+        await notifier.notify(
             user_id,
             'system',
             'Saldo recargado',
             f'Se acreditó Q{request.amount:.2f} a tu cuenta.'
-        ])
+        )
 
         return {
             "ok": True,
@@ -107,13 +118,19 @@ async def update_profile(user_id: int, request: UpdateProfileRequest):
         elif status == 'NO_CHANGES':
             return {"ok": True, "message": "No se detectaron cambios"}
 
+        # El nombre del usuario aparece en la galería y en inventarios ajenos
+        response_cache.invalidate('user', user_id)
+        if full_name:
+            response_cache.invalidate('gallery')
+            response_cache.invalidate('mine')
+
         # Enviar notificación
-        await db.execute_procedure('sp_notify', [
+        await notifier.notify(
             user_id,
             'system',
             'Perfil actualizado',
             'Tus datos de perfil fueron actualizados.'
-        ])
+        )
 
         return {"ok": True}
 
@@ -123,8 +140,36 @@ async def update_profile(user_id: int, request: UpdateProfileRequest):
         print(f"PUT /users/{user_id} error: {e}")
         raise HTTPException(status_code=500, detail="No se pudo editar el perfil")
 
+async def set_user_photo(user_id: int, key: str, rendered: dict) -> dict:
+    """
+    Asigna una foto ya subida (sp_set_user_photo) y notifica. Usado por
+    POST /{user_id}/photo y por /uploads/finalize.
+    """
+    storage = get_storage()
+    result = await db.execute_procedure('sp_set_user_photo', [user_id, key])
+    
+    if result and result[0].get('status') == 'NOT_FOUND':
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    response_cache.invalidate('user', user_id)
+
+    await notifier.notify(
+        user_id,
+        'system',
+        'Foto de perfil actualizada',
+        'Tu foto de perfil se actualizó correctamente.'
+    )
+
+    return {
+        "ok": True,
+        "photo_key": key,
+        "public_url": storage.public_url_from_key(key),
+        **(derivative_urls(storage, key) if rendered else {})
+    }
+
 @router.post("/{user_id}/photo")
 async def upload_photo(user_id: int, image: UploadFile = File(...)):
+    storage = get_storage()
     try:
         if not user_id:
             raise HTTPException(status_code=400, detail="ID de usuario inválido")
@@ -132,43 +177,30 @@ async def upload_photo(user_id: int, image: UploadFile = File(...)):
         if not image:
             raise HTTPException(status_code=400, detail="No se proporcionó imagen")
 
-        # Subir imagen
-        image_content = await image.read()
+        # Validar y generar miniaturas, luego subir original y variantes
+        rendered = await render_upload(image)
         key = await storage.upload(
-            buffer=image_content,
+            stream=iter_upload(image),
             mime_type=image.content_type,
             folder="Fotos_Perfil",
             name_base=f"u_{user_id}"
         )
+        await save_derivatives(key, rendered)
 
-        # Guardar en BD
-        result = await db.execute_procedure('sp_set_user_photo', [user_id, key])
-        
-        if result and result[0].get('status') == 'NOT_FOUND':
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-
-        # Enviar notificación
-        await db.execute_procedure('sp_notify', [
-            user_id,
-            'system',
-            'Foto de perfil actualizada',
-            'Tu foto de perfil se actualizó correctamente.'
-        ])
-
-        return {
-            "ok": True,
-            "photo_key": key,
-            "public_url": storage.public_url_from_key(key)
-        }
+        # Guardar en BD y notificar
+        return await set_user_photo(user_id, key, rendered)
 
     except HTTPException:
         raise
+    except (UploadTooLarge, ImageTooLarge) as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         print(f"POST /users/{user_id}/photo error: {e}")
         raise HTTPException(status_code=500, detail="No se pudo actualizar la foto")
 
 @router.get("/{user_id}/photo")
 async def get_user_photo(user_id: int):
+    storage = get_storage()
     try:
         if not user_id:
             raise HTTPException(status_code=400, detail="ID de usuario inválido")
@@ -190,18 +222,75 @@ async def get_user_photo(user_id: int):
         raise HTTPException(status_code=500, detail="Error al obtener la foto")
 
 @router.get("/{user_id}/notifications")
-async def get_notifications(user_id: int):
+async def get_notifications(
+    user_id: int,
+    since_id: Optional[int] = Query(default=None, ge=0),
+    limit: Optional[int] = Query(default=None, ge=1, le=200)
+):
+    """
+    Sin parámetros retorna el historial completo (compatibilidad).
+    Con limit: las `limit` más recientes. Con since_id: solo las nuevas
+    (id > since_id, orden ascendente), para polling incremental.
+    """
     try:
         if not user_id:
             raise HTTPException(status_code=400, detail="ID de usuario inválido")
 
-        result = await db.execute_procedure('sp_get_notifications', [user_id])
+        if since_id is None and limit is None:
+            return await db.execute_procedure('sp_get_notifications', [user_id])
+
+        result = await db.execute_procedure(
+            'sp_get_notifications_since', [user_id, since_id, limit or 50]
+        )
         return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"GET /users/{user_id}/notifications error: {e}")
         raise HTTPException(status_code=500, detail="Error al obtener notificaciones")
 
+@router.get("/{user_id}/notifications/unread-count")
+async def get_unread_count(user_id: int):
+    try:
+        if not user_id:
+            raise HTTPException(status_code=400, detail="ID de usuario inválido")
+
+        result = await db.execute_procedure('sp_notifications_unread_count', [user_id])
+        return {"unread": int(result[0]['unread']) if result else 0}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"GET /users/{user_id}/notifications/unread-count error: {e}")
+        raise HTTPException(status_code=500, detail="Error al obtener notificaciones")
+
+@router.get("/{user_id}/notifications/stream")
+async def stream_notifications(
+    user_id: int,
+    last_event_id: Optional[str] = Header(default=None),
+    since_id: Optional[int] = Query(default=None, ge=0)
+):
+    """
+    Stream SSE de notificaciones nuevas (evento `notification`, con el id
+    de la notificación como id del evento). EventSource reenvía
+    Last-Event-ID al reconectar y se continúa desde ahí.
+    """
+    if not user_id:
+        raise HTTPException(status_code=400, detail="ID de usuario inválido")
+
+    last_id = since_id
+    if last_event_id:
+        if not last_event_id.isdigit():
+            raise HTTPException(status_code=400, detail="Last-Event-ID inválido")
+        last_id = int(last_event_id)
+
+    return StreamingResponse(
+        notification_stream(user_id, last_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.put("/{user_id}/notifications/{notif_id}/read")
 async def mark_notification_read(user_id: int, notif_id: int):
     try:
@@ -0,0 +1,69 @@
+"""
+Búsqueda de obras (GET /artworks/search): consulta FULLTEXT y cursores
+por el campo de orden elegido.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+from .pagination import format_timestamp, pack_cursor, parse_timestamp, unpack_cursor
+
+# orden -> columna de la fila que va en el cursor
+SORTS = {
+    "newest": "created_at",
+    "oldest": "created_at",
+    "price_asc": "price",
+    "price_desc": "price",
+}
+MAX_TERMS = 8
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def fulltext_query(text: str):
+    """
+    Convierte el texto del usuario en una consulta BOOLEAN MODE donde cada
+    palabra es obligatoria y por prefijo ("flor roja" -> "+flor* +roja*").
+    Los operadores que escriba el usuario se descartan. None si no hay
+    palabras.
+    """
+    terms = _WORD.findall(text or "")[:MAX_TERMS]
+    if not terms:
+        return None
+    return " ".join(f"+{term}*" for term in terms)
+
+
+def encode_search_cursor(sort: str, row) -> str:
+    column = SORTS[sort]
+    key = format_timestamp(row[column]) if column == "created_at" else str(row[column])
+    return pack_cursor({"s": sort, "k": key, "i": int(row["id"])})
+
+
+def decode_search_cursor(cursor: str, sort: str):
+    """
+    Devuelve (clave, id) o (None, None) para la primera página. El cursor
+    solo vale para el mismo orden con el que se generó.
+    """
+    if not cursor:
+        return None, None
+    payload = unpack_cursor(cursor)
+    try:
+        if payload["s"] != sort:
+            raise ValueError("El cursor es de otro orden")
+        if SORTS[sort] == "created_at":
+            key = parse_timestamp(payload["k"])
+        else:
+            price = Decimal(payload["k"])
+            if not price.is_finite():
+                raise ValueError("Cursor inválido")
+            key = str(price)
+        return key, int(payload["i"])
+    except (KeyError, TypeError, InvalidOperation) as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def search_page(rows, limit, sort):
+    """Como keyset_page, con el cursor del orden de la búsqueda"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_search_cursor(sort, rows[-1])
@@ -0,0 +1,48 @@
+"""
+Worker de gunicorn para producción (ver gunicorn.conf.py).
+
+Igual que uvicorn.workers.UvicornWorker, pero el primer SIGTERM no corta
+de inmediato: durante DRAIN_DELAY segundos /health responde 503 y se siguen
+atendiendo peticiones, para que el balanceador saque la instancia antes de
+que se cierre el socket. Después se cierra como siempre: deja de aceptar,
+termina lo que está en curso y corre el shutdown (notificaciones, pool).
+"""
+import os
+import signal
+import sys
+import time
+
+from gunicorn.arbiter import Arbiter
+from uvicorn.server import Server
+from uvicorn.workers import UvicornWorker
+
+DRAIN_DELAY = int(os.getenv('DRAIN_DELAY', 0))
+
+
+class DrainingServer(Server):
+    drain_until = None
+
+    def handle_exit(self, sig, frame):
+        if sig == signal.SIGTERM and DRAIN_DELAY > 0 and self.drain_until is None:
+            self.drain_until = time.monotonic() + DRAIN_DELAY
+            # config.app es la app de FastAPI (sin middlewares de uvicorn)
+            state = getattr(self.config.app, 'state', None)
+            if state is not None:
+                state.draining = True
+            return
+        super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter) -> bool:
+        if self.drain_until is not None and time.monotonic() >= self.drain_until:
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+
+class Worker(UvicornWorker):
+    async def _serve(self) -> None:
+        self.config.app = self.wsgi
+        server = DrainingServer(config=self.config)
+        self._install_sigquit_handler()
+        await server.serve(sockets=self.sockets)
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
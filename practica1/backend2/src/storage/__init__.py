@@ -1,42 +1,283 @@
+import asyncio
+import hashlib
 import os
+import tempfile
 import time
+import uuid
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Optional, Union
 import aiofiles
-import boto3
-from botocore.exceptions import ClientError
+from fastapi import HTTPException, UploadFile
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .. import metrics, profiling
+from .static import write_precompressed
+
+# Límite por archivo (10 MB, igual que multer en el backend Node)
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 256 * 1024))
+# Uploads en lote: imágenes por petición y cuántas se escriben a la vez
+MAX_BATCH_UPLOADS = int(os.getenv('MAX_BATCH_UPLOADS', 20))
+BATCH_UPLOAD_CONCURRENCY = max(1, int(os.getenv('BATCH_UPLOAD_CONCURRENCY', 4)))
+# 'timestamp': {name_base}-{millis}.{ext} | 'content': {sha256}.{ext} con deduplicación
+STORAGE_NAMING = os.getenv('STORAGE_NAMING', 'timestamp').lower()
+# Uploads directos aún sin verificar (/uploads/finalize los mueve a su carpeta)
+PENDING_FOLDER = 'Pendientes'
+
+class UploadTooLarge(Exception):
+    """El archivo supera MAX_UPLOAD_BYTES"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"El archivo supera el máximo de {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+async def iter_upload(upload: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Lee un UploadFile por bloques sin cargarlo completo en memoria"""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+async def as_stream(data: Union[bytes, AsyncIterator[bytes]]) -> AsyncIterator[bytes]:
+    """Normaliza bytes o un iterador asíncrono a un iterador de bloques"""
+    if isinstance(data, (bytes, bytearray)):
+        yield bytes(data)
+    else:
+        async for chunk in data:
+            yield chunk
+
+async def iter_file(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Lee un archivo local por bloques"""
+    async with aiofiles.open(path, 'rb') as f:
+        while True:
+            chunk = await f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+async def limit_stream(stream: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    """Corta el stream en cuanto se pasa de max_bytes"""
+    total = 0
+    async for chunk in stream:
+        total += len(chunk)
+        if max_bytes and total > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        yield chunk
 
 class StorageInterface(ABC):
+    backend = 'base'
+    max_upload_bytes = MAX_UPLOAD_BYTES
+    naming = STORAGE_NAMING
+
+    async def upload(self, stream: Union[bytes, AsyncIterator[bytes]], mime_type: str,
+                     folder: str, name_base: str) -> str:
+        """
+        Guarda el contenido bajo una key nueva y la retorna.
+        `stream` puede ser bytes o un iterador asíncrono de bloques.
+        """
+        chunks = self._count_bytes(limit_stream(as_stream(stream), self.max_upload_bytes))
+
+        start = time.perf_counter()
+        try:
+            if self.naming == 'content':
+                return await self._upload_content_addressed(chunks, mime_type, folder)
+
+            key = self.new_key(mime_type, folder, name_base)
+            await self.save(key, chunks, mime_type)
+            return key
+        except Exception:
+            metrics.storage_upload_errors.inc(self.backend)
+            raise
+        finally:
+            end = time.perf_counter()
+            metrics.storage_upload_duration.observe(end - start, self.backend)
+            profiling.record(f'storage.upload:{self.backend}', start, end)
+
+    def new_key(self, mime_type: str, folder: str, name_base: str) -> str:
+        """Key con timestamp: {folder}/{name_base}-{millis}.{ext}"""
+        ext = self._get_extension_from_mime(mime_type)
+        return f"{folder}/{name_base}-{int(time.time() * 1000)}.{ext}"
+
+    def content_key(self, folder: str, digest: str, mime_type: str) -> str:
+        return f"{folder}/{digest}.{self._get_extension_from_mime(mime_type)}"
+
+    async def _count_bytes(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            metrics.storage_upload_bytes.inc(self.backend, amount=len(chunk))
+            yield chunk
+
+    async def _upload_content_addressed(self, chunks: AsyncIterator[bytes], mime_type: str,
+                                        folder: str) -> str:
+        """
+        La key es el SHA-256 del contenido. Como el hash solo se conoce al
+        final, se vuelca a un archivo temporal mientras se calcula; si el
+        objeto ya existe no se vuelve a escribir.
+        """
+        path = self._spool_path(folder)
+        digest = hashlib.sha256()
+        try:
+            async with aiofiles.open(path, 'wb') as f:
+                async for chunk in chunks:
+                    digest.update(chunk)
+                    await f.write(chunk)
+
+            key = self.content_key(folder, digest.hexdigest(), mime_type)
+            if not await self.exists(key):
+                await self.save_file(key, path, mime_type)
+            return key
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _spool_path(self, folder: str) -> str:
+        fd, path = tempfile.mkstemp(suffix='.part')
+        os.close(fd)
+        return path
+
+    async def save_file(self, key: str, path: str, mime_type: str) -> None:
+        """Guarda un archivo local ya completo en la key indicada"""
+        await self.save(key, iter_file(path), mime_type)
+
     @abstractmethod
-    async def upload(self, buffer: bytes, mime_type: str, folder: str, name_base: str) -> str:
+    async def exists(self, key: str) -> bool:
         pass
-    
+
+    @abstractmethod
+    async def save(self, key: str, stream: AsyncIterator[bytes], mime_type: str) -> None:
+        """Escribe el stream en la key indicada a medida que llegan los bloques"""
+        pass
+
+    @abstractmethod
+    async def download(self, key: str, dest_path: str) -> None:
+        """Copia el objeto a un archivo local"""
+        pass
+
+    @abstractmethod
+    def presign_put(self, key: str, mime_type: str, size: int, expires: int):
+        """
+        URL y headers para que el cliente suba el objeto directo al
+        almacenamiento, o None si debe subirlo por la API (token local)
+        """
+        pass
+
+    @abstractmethod
+    async def size_of(self, key: str):
+        """Tamaño en bytes del objeto, o None si no existe"""
+        pass
+
+    @abstractmethod
+    async def move(self, source_key: str, dest_key: str) -> None:
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    async def warm(self) -> None:
+        """Prepara el cliente antes de recibir tráfico (/ready); lanza si no está disponible"""
+        pass
+
     @abstractmethod
     def public_url_from_key(self, key: str) -> str:
         pass
 
+    @abstractmethod
+    def _get_extension_from_mime(self, mime_type: str) -> str:
+        pass
+
 class LocalStorage(StorageInterface):
+    backend = 'local'
+
     def __init__(self):
         self.base_dir = os.getenv('LOCAL_UPLOAD_DIR', './uploads')
         os.makedirs(self.base_dir, exist_ok=True)
 
-    async def upload(self, buffer: bytes, mime_type: str, folder: str, name_base: str) -> str:
-        # Determinar extensión del archivo
-        ext = self._get_extension_from_mime(mime_type)
-        
+    async def save(self, key: str, stream: AsyncIterator[bytes], mime_type: str) -> None:
+        file_path = self._path(key)
+
         # Crear directorio si no existe
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        # Escribir a un archivo temporal y renombrar al terminar, para no
+        # dejar archivos a medias si el upload se corta o excede el límite
+        part_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        try:
+            async with aiofiles.open(part_path, 'wb') as f:
+                async for chunk in stream:
+                    await f.write(chunk)
+            os.replace(part_path, file_path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        await self._precompress(file_path, mime_type)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.base_dir, *key.split('/'))
+
+    async def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def _spool_path(self, folder: str) -> str:
+        # Mismo directorio que el destino para que save_file sea un rename
         dir_path = os.path.join(self.base_dir, folder)
         os.makedirs(dir_path, exist_ok=True)
-        
-        # Generar nombre único
-        filename = f"{name_base}-{int(time.time() * 1000)}.{ext}"
-        file_path = os.path.join(dir_path, filename)
-        
-        # Guardar archivo
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(buffer)
-        
-        # Retornar key (ruta relativa)
-        return f"{folder}/{filename}"
+        return os.path.join(dir_path, f".{uuid.uuid4().hex}.part")
+
+    async def save_file(self, key: str, path: str, mime_type: str) -> None:
+        file_path = self._path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.replace(path, file_path)
+        await self._precompress(file_path, mime_type)
+
+    @staticmethod
+    async def _precompress(file_path: str, mime_type: str) -> None:
+        # SVG: /static entrega el .gz a quien acepte gzip
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, write_precompressed, file_path, mime_type
+            )
+        except OSError as e:
+            print(f"STATIC_PRECOMPRESS_ERROR {file_path}: {e}")
+
+    async def warm(self) -> None:
+        if not os.access(self.base_dir, os.W_OK):
+            raise OSError(f"Sin permiso de escritura en {self.base_dir}")
+
+    async def download(self, key: str, dest_path: str) -> None:
+        source = self._path(key)
+        async with aiofiles.open(source, 'rb') as src, aiofiles.open(dest_path, 'wb') as dst:
+            while True:
+                chunk = await src.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                await dst.write(chunk)
+
+    def presign_put(self, key: str, mime_type: str, size: int, expires: int):
+        return None
+
+    async def size_of(self, key: str):
+        try:
+            return os.stat(self._path(key)).st_size
+        except FileNotFoundError:
+            return None
+
+    async def move(self, source_key: str, dest_key: str) -> None:
+        dest = self._path(dest_key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(self._path(source_key), dest)
+        for suffix in ('.gz', '.br'):
+            if os.path.exists(self._path(source_key) + suffix):
+                os.replace(self._path(source_key) + suffix, dest + suffix)
+
+    async def delete(self, key: str) -> None:
+        for path in (self._path(key), self._path(key) + '.gz', self._path(key) + '.br'):
+            if os.path.exists(path):
+                os.remove(path)
 
     def public_url_from_key(self, key: str) -> str:
         return f"/static/{key}"
@@ -53,37 +294,175 @@ class LocalStorage(StorageInterface):
         return mime_map.get(mime_type, 'bin')
 
 class S3Storage(StorageInterface):
+    backend = 's3'
+
     def __init__(self):
+        # boto3 tarda en importarse (~0.2 s): solo cuando se usa S3
+        import boto3
+        from botocore.config import Config
+        from botocore.exceptions import ClientError
+        self.ClientError = ClientError
+
         self.region = os.getenv('AWS_REGION', 'us-east-1')
         self.bucket = os.getenv('S3_BUCKET_NAME')
         if not self.bucket:
             raise ValueError("S3_BUCKET_NAME no está definido en el entorno")
-        
-        self.client = boto3.client('s3', region_name=self.region)
+
+        # Concurrencia máxima contra S3: hilos del executor y conexiones
+        # HTTP del cliente van a la par para que ningún hilo espere socket
+        self.max_concurrency = max(1, int(os.getenv('S3_MAX_CONCURRENCY', 10)))
+        self.client = boto3.client(
+            's3',
+            region_name=self.region,
+            endpoint_url=os.getenv('S3_ENDPOINT_URL') or None,
+            config=Config(
+                max_pool_connections=self.max_concurrency,
+                connect_timeout=float(os.getenv('S3_CONNECT_TIMEOUT', 5)),
+                read_timeout=float(os.getenv('S3_READ_TIMEOUT', 60)),
+                retries={
+                    'max_attempts': int(os.getenv('S3_MAX_ATTEMPTS', 3)),
+                    'mode': os.getenv('S3_RETRY_MODE', 'standard')
+                }
+            )
+        )
+        self._executor = None
         self.use_public_acl = os.getenv('S3_USE_PUBLIC_READ_ACL', '').lower() == 'true'
         self.cdn_domain = os.getenv('CDN_DOMAIN')
+        # Tamaño de cada parte del multipart upload (S3 exige mínimo 5 MB)
+        self.part_size = max(5 * 1024 * 1024, int(os.getenv('S3_MULTIPART_PART_SIZE', 8 * 1024 * 1024)))
 
-    async def upload(self, buffer: bytes, mime_type: str, folder: str, name_base: str) -> str:
-        ext = self._get_extension_from_mime(mime_type)
-        filename = f"{name_base}-{int(time.time() * 1000)}.{ext}"
-        key = f"{folder}/{filename}"
+    async def _call(self, fn, **kwargs):
+        """Ejecuta una operación de boto3 (bloqueante) fuera del event loop"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix="s3"
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, **kwargs))
 
-        put_params = {
+    def _object_params(self, key: str, mime_type: str) -> dict:
+        params = {
             'Bucket': self.bucket,
             'Key': key,
-            'Body': buffer,
             'ContentType': mime_type or 'application/octet-stream',
             'CacheControl': 'public, max-age=31536000, immutable'
         }
 
         if self.use_public_acl:
-            put_params['ACL'] = 'public-read'
+            params['ACL'] = 'public-read'
+        return params
+
+    async def save(self, key: str, stream: AsyncIterator[bytes], mime_type: str) -> None:
+        """
+        Archivos menores a una parte se suben con un solo put_object; los
+        demás con multipart upload, así en memoria nunca hay más de una parte.
+        """
+        params = self._object_params(key, mime_type)
+        buffer = bytearray()
+        upload_id = None
+        parts = []
 
         try:
-            self.client.put_object(**put_params)
-            return key
-        except ClientError as e:
-            raise Exception(f"Error uploading to S3: {e}")
+            async for chunk in stream:
+                buffer.extend(chunk)
+                if len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        response = await self._call(self.client.create_multipart_upload, **params)
+                        upload_id = response['UploadId']
+                    parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+                    buffer.clear()
+
+            if upload_id is None:
+                await self._call(self.client.put_object, Body=bytes(buffer), **params)
+                return
+
+            if buffer:
+                parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            await self._call(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+        except BaseException as e:
+            if upload_id is not None:
+                try:
+                    await self._call(
+                        self.client.abort_multipart_upload,
+                        Bucket=self.bucket, Key=key, UploadId=upload_id
+                    )
+                except self.ClientError:
+                    pass
+            if isinstance(e, self.ClientError):
+                raise Exception(f"Error uploading to S3: {e}")
+            raise
+
+    async def _upload_part(self, key: str, upload_id: str, number: int, body: bytes) -> dict:
+        response = await self._call(
+            self.client.upload_part,
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=number,
+            Body=body
+        )
+        return {'ETag': response['ETag'], 'PartNumber': number}
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await self._call(self.client.head_object, Bucket=self.bucket, Key=key)
+            return True
+        except self.ClientError as e:
+            # Sin s3:ListBucket, S3 responde 403 en vez de 404 para keys inexistentes
+            if e.response.get('Error', {}).get('Code') in ('404', '403', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    async def warm(self) -> None:
+        # HEAD de una key inexistente: crea el hilo del executor, resuelve
+        # credenciales y deja abierta la conexión HTTPS
+        await self.exists('.warmup')
+
+    async def download(self, key: str, dest_path: str) -> None:
+        await self._call(self.client.download_file, Bucket=self.bucket, Key=key, Filename=dest_path)
+
+    def presign_put(self, key: str, mime_type: str, size: int, expires: int):
+        """
+        PUT prefirmado. Content-Length va firmado, así que S3 rechaza un
+        cuerpo de otro tamaño; el cliente debe enviar los headers indicados.
+        """
+        params = self._object_params(key, mime_type)
+        params['ContentLength'] = size
+        url = self.client.generate_presigned_url(
+            'put_object', Params=params, ExpiresIn=expires, HttpMethod='PUT'
+        )
+        headers = {'Content-Type': params['ContentType'], 'Cache-Control': params['CacheControl']}
+        if 'ACL' in params:
+            headers['x-amz-acl'] = params['ACL']
+        return {'url': url, 'headers': headers}
+
+    async def size_of(self, key: str):
+        try:
+            response = await self._call(self.client.head_object, Bucket=self.bucket, Key=key)
+        except self.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', '403', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return response['ContentLength']
+
+    async def move(self, source_key: str, dest_key: str) -> None:
+        # Copia dentro de S3 (los bytes no pasan por el worker)
+        params = {'Bucket': self.bucket, 'Key': dest_key,
+                  'CopySource': {'Bucket': self.bucket, 'Key': source_key}}
+        if self.use_public_acl:
+            params['ACL'] = 'public-read'
+        await self._call(self.client.copy_object, **params)
+        await self.delete(source_key)
+
+    async def delete(self, key: str) -> None:
+        await self._call(self.client.delete_object, Bucket=self.bucket, Key=key)
 
     def public_url_from_key(self, key: str) -> str:
         if self.cdn_domain:
@@ -93,7 +472,7 @@ class S3Storage(StorageInterface):
     def _get_extension_from_mime(self, mime_type: str) -> str:
         if not mime_type:
             return 'bin'
-        
+
         mime = mime_type.lower()
         if 'jpeg' in mime:
             return 'jpg'
@@ -108,6 +487,65 @@ class S3Storage(StorageInterface):
         else:
             return mime.split('/')[1] if '/' in mime else 'bin'
 
+class UploadSizeLimitMiddleware:
+    """
+    Rechaza con 413 los multipart/form-data que superan el límite antes de
+    que el parser termine de leerlos: por Content-Length si viene, o
+    cortando el body en cuanto se pasa del máximo. `path_limits` fija otro
+    máximo para rutas concretas (p. ej. el upload en lote).
+    """
+
+    def __init__(self, app: ASGIApp, max_body_bytes: int, path_limits: Optional[dict] = None):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        max_body_bytes = self.path_limits.get(scope["path"], self.max_body_bytes)
+        if not max_body_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_body_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_bytes:
+                    # FastAPI propaga las HTTPException que ocurren al leer el form
+                    raise HTTPException(status_code=413, detail="El archivo es demasiado grande")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    async def _reject(send: Send) -> None:
+        body = b'{"detail":"El archivo es demasiado grande"}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
 # Storage factory
 _storage_instance = None
 
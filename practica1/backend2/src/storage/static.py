@@ -0,0 +1,242 @@
+"""
+Servidor de /static para LocalStorage.
+
+A diferencia de StaticFiles:
+- Las keys con timestamp o hash de contenido (y sus miniaturas) nunca se
+  sobrescriben, así que salen con Cache-Control immutable de un año.
+- ETag fuerte (inode, tamaño y mtime: los archivos se escriben con rename)
+  y respuestas 304 con If-None-Match / If-Modified-Since.
+- Range de un solo intervalo (206/416) con If-Range.
+- Variantes precomprimidas .br / .gz junto al original si existen.
+- Envío zero-copy si el servidor ASGI ofrece la extensión
+  http.response.zerocopysend; si no, por bloques grandes en un hilo.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import shutil
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+
+import anyio
+from starlette.types import Receive, Scope, Send
+
+STATIC_CHUNK_SIZE = int(os.getenv('STATIC_CHUNK_SIZE', 256 * 1024))
+# Cache-Control de archivos que sí pueden cambiar
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', 60))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# {name_base}-{millis}.ext, {sha256}.ext y sus variantes .thumb/.medium.webp
+_IMMUTABLE_KEY = re.compile(r'(-\d{13}|(^|/)[0-9a-f]{64})(\.(thumb|medium))?\.[A-Za-z0-9]+$')
+# Solo estos se guardan precomprimidos; las imágenes rasterizadas ya lo están
+COMPRESSIBLE_TYPES = {'image/svg+xml'}
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/svg+xml', '.svg')
+
+
+def write_precompressed(path: str, mime_type: str) -> None:
+    """Deja {path}.gz junto a los tipos comprimibles (bloqueante)"""
+    if mime_type not in COMPRESSIBLE_TYPES:
+        return
+    part_path = f"{path}.gz.part"
+    with open(path, 'rb') as src, gzip.open(part_path, 'wb', compresslevel=9) as dst:
+        shutil.copyfileobj(src, dst, STATIC_CHUNK_SIZE)
+    os.replace(part_path, f"{path}.gz")
+
+
+def is_immutable_key(key: str) -> bool:
+    return bool(_IMMUTABLE_KEY.search(key))
+
+
+def _parse_range(header: str, size: int):
+    """
+    (inicio, fin) inclusivo de un Range de un solo intervalo, None si hay
+    que ignorarlo (varios intervalos o formato desconocido) o 'invalid' si
+    no se puede satisfacer.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                return 'invalid'
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return 'invalid'
+    return start, min(end, size - 1)
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        if name.strip().lower() == coding:
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+class UploadFiles:
+    def __init__(self, directory: str, hidden=()):
+        self.directory = os.path.realpath(directory)
+        # Carpetas de primer nivel que no se sirven
+        self.hidden = set(hidden)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope['type'] == 'http'
+        if scope['method'] not in ('GET', 'HEAD'):
+            await self._send_empty(send, 405, [(b'allow', b'GET, HEAD')], b'Method Not Allowed')
+            return
+
+        key = scope['path'].lstrip('/')
+        path = self._resolve(key)
+        info = await anyio.to_thread.run_sync(self._stat, path) if path else None
+        if info is None:
+            await self._send_empty(send, 404, [], b'Not Found')
+            return
+
+        headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope['headers']}
+        media_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        etag = f'"{info.st_ino:x}-{info.st_size:x}-{info.st_mtime_ns:x}"'
+        last_modified = formatdate(info.st_mtime, usegmt=True)
+        response_headers = [
+            (b'etag', etag.encode()),
+            (b'last-modified', last_modified.encode()),
+            (b'accept-ranges', b'bytes'),
+            (b'cache-control', (IMMUTABLE_CACHE_CONTROL if is_immutable_key(key)
+                                else f'public, max-age={STATIC_MAX_AGE}').encode()),
+        ]
+        if media_type in COMPRESSIBLE_TYPES:
+            response_headers.append((b'vary', b'Accept-Encoding'))
+
+        size = info.st_size
+        range_header = headers.get('range')
+        if media_type in COMPRESSIBLE_TYPES and not range_header:
+            for coding, suffix in _ENCODINGS:
+                if not _accepts(headers.get('accept-encoding', ''), coding):
+                    continue
+                compressed = await anyio.to_thread.run_sync(self._stat, path + suffix)
+                if compressed is not None:
+                    # Otra representación: otro ETag
+                    path, size = path + suffix, compressed.st_size
+                    etag = f'{etag[:-1]}-{coding}"'
+                    response_headers[0] = (b'etag', etag.encode())
+                    response_headers.append((b'content-encoding', coding.encode()))
+                    break
+
+        if self._not_modified(headers, etag, info.st_mtime):
+            await self._send_empty(send, 304, response_headers)
+            return
+
+        status = 200
+        offset, count = 0, size
+        if range_header and self._range_applies(headers.get('if-range'), etag, info.st_mtime):
+            byte_range = _parse_range(range_header, size)
+            if byte_range == 'invalid':
+                await self._send_empty(send, 416, response_headers + [
+                    (b'content-range', f'bytes */{size}'.encode())
+                ], b'Range Not Satisfiable')
+                return
+            if byte_range is not None:
+                status = 206
+                offset, count = byte_range[0], byte_range[1] - byte_range[0] + 1
+                response_headers.append(
+                    (b'content-range', f'bytes {byte_range[0]}-{byte_range[1]}/{size}'.encode())
+                )
+
+        response_headers += [
+            (b'content-type', media_type.encode()),
+            (b'content-length', str(count).encode()),
+        ]
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        if scope['method'] == 'HEAD' or count == 0:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await self._send_file(scope, send, path, offset, count)
+
+    def _resolve(self, key: str):
+        """Ruta dentro del directorio; None si sale de él o es un archivo oculto (.part)"""
+        parts = key.split('/')
+        if not key or key.endswith('.part') or parts[0] in self.hidden:
+            return None
+        if any(not part or part.startswith('.') for part in parts):
+            return None
+        path = os.path.realpath(os.path.join(self.directory, *parts))
+        if os.path.commonpath([path, self.directory]) != self.directory:
+            return None
+        return path
+
+    @staticmethod
+    def _stat(path: str):
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        return info if stat.S_ISREG(info.st_mode) else None
+
+    @staticmethod
+    def _not_modified(headers: dict, etag: str, mtime: float) -> bool:
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            # Comparación débil, como pide RFC 9110 para If-None-Match
+            return '*' in tags or etag in tags or f'W/{etag}' in tags
+        if_modified_since = headers.get('if-modified-since')
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _range_applies(if_range, etag: str, mtime: float) -> bool:
+        if if_range is None:
+            return True
+        if if_range.startswith('"'):
+            return if_range == etag
+        try:
+            return int(mtime) == int(parsedate_to_datetime(if_range).timestamp())
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    async def _send_empty(send: Send, status: int, headers, body: bytes = b'') -> None:
+        headers = list(headers) + [(b'content-length', str(len(body)).encode())]
+        if status >= 400:
+            headers.append((b'content-type', b'text/plain; charset=utf-8'))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    @staticmethod
+    async def _send_file(scope: Scope, send: Send, path: str, offset: int, count: int) -> None:
+        f = await anyio.to_thread.run_sync(open, path, 'rb')
+        with f:
+            if 'http.response.zerocopysend' in scope.get('extensions', {}):
+                await send({'type': 'http.response.zerocopysend', 'file': f,
+                            'offset': offset, 'count': count, 'more_body': False})
+                return
+            f.seek(offset)
+            remaining = count
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(f.read, min(STATIC_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': remaining > 0})
+            if remaining > 0:
+                # El archivo se acortó mientras se enviaba: el Content-Length
+                # ya no se cumple, así que se corta la conexión (el servidor
+                # ASGI la cierra si la app falla con la respuesta empezada)
+                raise OSError(f"{path} se acortó mientras se enviaba: faltan {remaining} bytes")
@@ -41,6 +41,7 @@ CREATE TABLE IF NOT EXISTS artworks
     price             DECIMAL(12, 2)                NOT NULL DEFAULT 0.00,
     is_available      TINYINT(1)                    NOT NULL DEFAULT 1,
     acquisition_type  ENUM ('uploaded','purchased') NOT NULL DEFAULT 'uploaded',
+    has_derivatives   TINYINT(1)                    NOT NULL DEFAULT 0, -- ya existen .thumb/.medium.webp
     original_owner_id BIGINT UNSIGNED               NOT NULL,
     current_owner_id  BIGINT UNSIGNED               NOT NULL,
     created_at        TIMESTAMP                     NOT NULL DEFAULT CURRENT_TIMESTAMP,
@@ -49,6 +50,10 @@ CREATE TABLE IF NOT EXISTS artworks
     UNIQUE KEY uq_artworks__url (url),                        -- evita repetir la misma imagen publicada
     KEY ix_artworks__available_created (is_available, created_at DESC),
     KEY ix_artworks__owner_current (current_owner_id, created_at DESC),
+    KEY ix_artworks__owner_original (original_owner_id, created_at DESC),
+    KEY ix_artworks__updated (updated_at, id),                -- export incremental
+    KEY ix_artworks__available_price (is_available, price),   -- búsqueda ordenada por precio
+    FULLTEXT KEY ft_artworks__image_name (image_name),        -- búsqueda por título
     CONSTRAINT fk_artworks__orig_user FOREIGN KEY (original_owner_id)
         REFERENCES users (id) ON DELETE RESTRICT ON UPDATE CASCADE,
     CONSTRAINT fk_artworks__curr_user FOREIGN KEY (current_owner_id)
@@ -74,6 +79,34 @@ CREATE TABLE IF NOT EXISTS notifications
     created_at TIMESTAMP                         NOT NULL DEFAULT CURRENT_TIMESTAMP,
     PRIMARY KEY (id),
     KEY ix_notifications__user_created (user_id, created_at DESC),
+    KEY ix_notifications__user_id (user_id, id),
     CONSTRAINT fk_notifications__user FOREIGN KEY (user_id)
         REFERENCES users (id) ON DELETE CASCADE ON UPDATE CASCADE
 ) ENGINE = InnoDB;
+
+-- =========================
+-- Tabla: notification_counters
+-- Contador de no leídas por usuario, mantenido por triggers
+-- =========================
+CREATE TABLE IF NOT EXISTS notification_counters
+(
+    user_id BIGINT UNSIGNED NOT NULL,
+    unread  INT UNSIGNED    NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id),
+    CONSTRAINT fk_notification_counters__user FOREIGN KEY (user_id)
+        REFERENCES users (id) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE = InnoDB;
+
+-- =========================
+-- Tabla: upload_claims
+-- Uploads directos ya finalizados: cada token de /uploads/presign se usa
+-- una sola vez aunque el finalize llegue a otro worker o instancia
+-- =========================
+CREATE TABLE IF NOT EXISTS upload_claims
+(
+    upload_key VARCHAR(255)    NOT NULL, -- key en Pendientes/ que reservó el token
+    user_id    BIGINT UNSIGNED NOT NULL,
+    claimed_at TIMESTAMP       NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (upload_key),
+    KEY ix_upload_claims__claimed_at (claimed_at)
+) ENGINE = InnoDB;
@@ -0,0 +1,9 @@
+-- =========================
+-- ArtGalleryCloud - MIGRACIÓN 001
+-- Índice para paginar "obras creadas" por cursor.
+-- Solo para bases creadas antes de este cambio; base.sql ya lo incluye.
+-- =========================
+USE `Semi_grupo_2322`;
+
+ALTER TABLE artworks
+    ADD KEY ix_artworks__owner_original (original_owner_id, created_at DESC);
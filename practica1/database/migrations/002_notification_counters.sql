@@ -0,0 +1,26 @@
+-- =========================
+-- ArtGalleryCloud - MIGRACIÓN 002
+-- Lectura incremental de notificaciones y contador de no leídas.
+-- Solo para bases creadas antes de este cambio; base.sql ya lo incluye.
+-- Aplicar antes de triggers.sql (que crea los triggers del contador).
+-- =========================
+USE `Semi_grupo_2322`;
+
+ALTER TABLE notifications
+    ADD KEY ix_notifications__user_id (user_id, id);
+
+CREATE TABLE IF NOT EXISTS notification_counters
+(
+    user_id BIGINT UNSIGNED NOT NULL,
+    unread  INT UNSIGNED    NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id),
+    CONSTRAINT fk_notification_counters__user FOREIGN KEY (user_id)
+        REFERENCES users (id) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE = InnoDB;
+
+-- Inicializar contadores con el historial existente
+INSERT INTO notification_counters (user_id, unread)
+SELECT user_id, SUM(is_read = 0)
+FROM notifications
+GROUP BY user_id
+ON DUPLICATE KEY UPDATE unread = VALUES(unread);
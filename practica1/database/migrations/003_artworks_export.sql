@@ -0,0 +1,9 @@
+-- =========================
+-- ArtGalleryCloud - MIGRACIÓN 003
+-- Índice para el export NDJSON incremental (GET /artworks/export).
+-- Solo para bases creadas antes de este cambio; base.sql ya lo incluye.
+-- =========================
+USE `Semi_grupo_2322`;
+
+ALTER TABLE artworks
+    ADD KEY ix_artworks__updated (updated_at, id);
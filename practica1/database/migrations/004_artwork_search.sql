@@ -0,0 +1,13 @@
+-- =========================
+-- ArtGalleryCloud - MIGRACIÓN 004
+-- Índices para GET /artworks/search.
+-- Solo para bases creadas antes de este cambio; base.sql ya lo incluye.
+-- Crear el FULLTEXT reconstruye la tabla: correrlo fuera de horas pico.
+-- =========================
+USE `Semi_grupo_2322`;
+
+ALTER TABLE artworks
+    ADD KEY ix_artworks__available_price (is_available, price);
+
+ALTER TABLE artworks
+    ADD FULLTEXT KEY ft_artworks__image_name (image_name);
@@ -0,0 +1,15 @@
+-- =========================
+-- ArtGalleryCloud - MIGRACIÓN 005
+-- Tokens de upload directo de un solo uso (POST /uploads/finalize).
+-- Solo para bases creadas antes de este cambio; base.sql ya lo incluye.
+-- =========================
+USE `Semi_grupo_2322`;
+
+CREATE TABLE IF NOT EXISTS upload_claims
+(
+    upload_key VARCHAR(255)    NOT NULL,
+    user_id    BIGINT UNSIGNED NOT NULL,
+    claimed_at TIMESTAMP       NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (upload_key),
+    KEY ix_upload_claims__claimed_at (claimed_at)
+) ENGINE = InnoDB;
@@ -0,0 +1,11 @@
+-- =========================
+-- ArtGalleryCloud - MIGRACIÓN 006
+-- Marca qué obras ya tienen miniaturas (.thumb.webp / .medium.webp).
+-- Solo para bases creadas antes de este cambio; base.sql ya lo incluye.
+-- Las obras existentes quedan en 0 (la API devuelve el original) hasta
+-- correr `python -m src.images backfill`, que las marca.
+-- =========================
+USE `Semi_grupo_2322`;
+
+ALTER TABLE artworks
+    ADD COLUMN has_derivatives TINYINT(1) NOT NULL DEFAULT 0 AFTER acquisition_type;
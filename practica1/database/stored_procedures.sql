@@ -200,6 +200,47 @@ BEGIN
 END$$
 DELIMITER ;
 
+-- Lectura incremental de notificaciones (usa ix_notifications__user_id)
+-- p_since_id NULL: las p_limit más recientes (id DESC)
+-- p_since_id N:    las siguientes p_limit con id > N (id ASC)
+DROP PROCEDURE IF EXISTS sp_get_notifications_since;
+DELIMITER $$
+CREATE PROCEDURE sp_get_notifications_since(
+    IN p_user_id BIGINT UNSIGNED,
+    IN p_since_id BIGINT UNSIGNED,
+    IN p_limit INT
+)
+BEGIN
+    IF p_limit IS NULL OR p_limit <= 0 THEN SET p_limit = 50; END IF;
+
+    IF p_since_id IS NULL THEN
+        SELECT id, type, title, body, is_read, created_at
+        FROM notifications
+        WHERE user_id = p_user_id
+        ORDER BY id DESC
+        LIMIT p_limit;
+    ELSE
+        SELECT id, type, title, body, is_read, created_at
+        FROM notifications
+        WHERE user_id = p_user_id
+          AND id > p_since_id
+        ORDER BY id ASC
+        LIMIT p_limit;
+    END IF;
+END$$
+DELIMITER ;
+
+-- Cantidad de no leídas (lectura por PK de notification_counters)
+DROP PROCEDURE IF EXISTS sp_notifications_unread_count;
+DELIMITER $$
+CREATE PROCEDURE sp_notifications_unread_count(IN p_user_id BIGINT UNSIGNED)
+BEGIN
+    SELECT COALESCE(
+                   (SELECT unread FROM notification_counters WHERE user_id = p_user_id),
+                   0) AS unread;
+END$$
+DELIMITER ;
+
 -- Marcar notificación como leída
 DROP PROCEDURE IF EXISTS sp_mark_notification_read;
 DELIMITER $$
@@ -234,6 +275,7 @@ BEGIN
            a.image_name AS name,
            a.image_name,
            a.url,
+           a.has_derivatives,
            a.price,
            a.is_available,
            u.id         AS seller_id,
@@ -261,6 +303,7 @@ BEGIN
            a.image_name AS name,
            a.image_name,
            a.url,
+           a.has_derivatives,
            a.price,
            a.is_available,
            a.acquisition_type,
@@ -279,6 +322,223 @@ BEGIN
 END$$
 DELIMITER ;
 
+-- Galería pública por cursor (keyset sobre created_at DESC, id ASC).
+-- Recorre ix_artworks__available_created (el id va implícito en el índice),
+-- así que el costo por página no depende de la profundidad.
+DROP PROCEDURE IF EXISTS sp_artworks_list_keyset;
+DELIMITER $$
+CREATE PROCEDURE sp_artworks_list_keyset(
+    IN p_limit INT,
+    IN p_after_created TIMESTAMP, -- NULL = primera página
+    IN p_after_id BIGINT UNSIGNED
+)
+BEGIN
+    IF p_limit IS NULL OR p_limit <= 0 THEN SET p_limit = 100; END IF;
+
+    IF p_after_created IS NULL THEN
+        SELECT a.id,
+               a.image_name AS name,
+               a.image_name,
+               a.url,
+               a.has_derivatives,
+               a.price,
+               a.is_available,
+               u.id         AS seller_id,
+               u.full_name  AS seller,
+               a.created_at
+        FROM artworks a
+                 JOIN users u ON u.id = a.current_owner_id
+        WHERE a.is_available = 1
+        ORDER BY a.created_at DESC, a.id ASC
+        LIMIT p_limit;
+    ELSE
+        SELECT a.id,
+               a.image_name AS name,
+               a.image_name,
+               a.url,
+               a.has_derivatives,
+               a.price,
+               a.is_available,
+               u.id         AS seller_id,
+               u.full_name  AS seller,
+               a.created_at
+        FROM artworks a
+                 JOIN users u ON u.id = a.current_owner_id
+        WHERE a.is_available = 1
+          AND a.created_at <= p_after_created
+          AND (a.created_at < p_after_created OR a.id > p_after_id)
+        ORDER BY a.created_at DESC, a.id ASC
+        LIMIT p_limit;
+    END IF;
+END$$
+DELIMITER ;
+
+-- Búsqueda de obras con filtros y paginación por cursor.
+-- p_match llega ya armado para BOOLEAN MODE desde la app (+palabra* ...).
+-- El SQL se arma con los filtros presentes (los valores van con QUOTE o
+-- como números) para que el optimizador use ft_artworks__image_name o el
+-- índice compuesto del orden pedido; con "col = x OR ..." no lo haría.
+-- Orden de desempate por id: newest ASC, oldest DESC, price_asc ASC,
+-- price_desc DESC (recorren los índices en un solo sentido).
+DROP PROCEDURE IF EXISTS sp_artworks_search;
+DELIMITER $$
+CREATE PROCEDURE sp_artworks_search(
+    IN p_match VARCHAR(500),          -- NULL = sin filtro de texto
+    IN p_min_price DECIMAL(12, 2),
+    IN p_max_price DECIMAL(12, 2),
+    IN p_available TINYINT,
+    IN p_seller_id BIGINT UNSIGNED,   -- propietario actual; NULL = cualquiera
+    IN p_sort VARCHAR(16),            -- newest | oldest | price_asc | price_desc
+    IN p_limit INT,
+    IN p_after_key VARCHAR(32),       -- created_at o price de la última fila; NULL = primera página
+    IN p_after_id BIGINT UNSIGNED
+)
+BEGIN
+    DECLARE v_col VARCHAR(16);
+    DECLARE v_dir VARCHAR(4);
+    DECLARE v_id_dir VARCHAR(4);
+    DECLARE v_key TEXT;
+
+    IF p_limit IS NULL OR p_limit <= 0 THEN SET p_limit = 50; END IF;
+    IF p_limit > 201 THEN SET p_limit = 201; END IF;
+    IF p_available IS NULL THEN SET p_available = 1; END IF;
+    IF p_after_id IS NULL THEN SET p_after_key = NULL; END IF;
+
+    CASE p_sort
+        WHEN 'oldest' THEN SET v_col = 'a.created_at', v_dir = 'ASC', v_id_dir = 'DESC';
+        WHEN 'price_asc' THEN SET v_col = 'a.price', v_dir = 'ASC', v_id_dir = 'ASC';
+        WHEN 'price_desc' THEN SET v_col = 'a.price', v_dir = 'DESC', v_id_dir = 'DESC';
+        ELSE SET v_col = 'a.created_at', v_dir = 'DESC', v_id_dir = 'ASC';
+    END CASE;
+
+    IF v_col = 'a.price' THEN
+        SET v_key = CAST(CAST(p_after_key AS DECIMAL(12, 2)) AS CHAR);
+    ELSE
+        SET v_key = QUOTE(CAST(p_after_key AS DATETIME));
+    END IF;
+
+    SET @sp_search_sql = CONCAT(
+        'SELECT a.id, a.image_name AS name, a.image_name, a.url, a.has_derivatives, a.price, a.is_available, ',
+        'u.id AS seller_id, u.full_name AS seller, a.created_at ',
+        'FROM artworks a JOIN users u ON u.id = a.current_owner_id ',
+        'WHERE a.is_available = ', IF(p_available = 0, '0', '1'),
+        IF(p_match IS NULL, '',
+           CONCAT(' AND MATCH(a.image_name) AGAINST (', QUOTE(p_match), ' IN BOOLEAN MODE)')),
+        IF(p_min_price IS NULL, '', CONCAT(' AND a.price >= ', p_min_price)),
+        IF(p_max_price IS NULL, '', CONCAT(' AND a.price <= ', p_max_price)),
+        IF(p_seller_id IS NULL, '', CONCAT(' AND a.current_owner_id = ', p_seller_id)),
+        IF(p_after_key IS NULL, '',
+           CONCAT(' AND ', v_col, IF(v_dir = 'DESC', ' <= ', ' >= '), v_key,
+                  ' AND (', v_col, IF(v_dir = 'DESC', ' < ', ' > '), v_key,
+                  ' OR a.id ', IF(v_id_dir = 'DESC', '< ', '> '), p_after_id, ')')),
+        ' ORDER BY ', v_col, ' ', v_dir, ', a.id ', v_id_dir,
+        ' LIMIT ', p_limit
+    );
+
+    PREPARE stmt FROM @sp_search_sql;
+    EXECUTE stmt;
+    DEALLOCATE PREPARE stmt;
+END$$
+DELIMITER ;
+
+-- Obras creadas por autor, por cursor (usa ix_artworks__owner_original)
+DROP PROCEDURE IF EXISTS sp_artworks_created_keyset;
+DELIMITER $$
+CREATE PROCEDURE sp_artworks_created_keyset(
+    IN p_owner_id BIGINT UNSIGNED,
+    IN p_limit INT,
+    IN p_after_created TIMESTAMP, -- NULL = primera página
+    IN p_after_id BIGINT UNSIGNED
+)
+BEGIN
+    IF p_owner_id IS NULL OR p_owner_id = 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'ownerId requerido';
+    END IF;
+    IF p_limit IS NULL OR p_limit <= 0 THEN SET p_limit = 100; END IF;
+
+    IF p_after_created IS NULL THEN
+        SELECT a.id,
+               a.image_name AS name,
+               a.image_name,
+               a.url,
+               a.has_derivatives,
+               a.price,
+               a.is_available,
+               a.acquisition_type,
+               a.original_owner_id,
+               uo.full_name AS original_owner_full_name,
+               a.current_owner_id,
+               uc.full_name AS current_owner_full_name,
+               a.created_at,
+               a.updated_at
+        FROM artworks a
+                 JOIN users uo ON uo.id = a.original_owner_id
+                 JOIN users uc ON uc.id = a.current_owner_id
+        WHERE a.original_owner_id = p_owner_id
+        ORDER BY a.created_at DESC, a.id ASC
+        LIMIT p_limit;
+    ELSE
+        SELECT a.id,
+               a.image_name AS name,
+               a.image_name,
+               a.url,
+               a.has_derivatives,
+               a.price,
+               a.is_available,
+               a.acquisition_type,
+               a.original_owner_id,
+               uo.full_name AS original_owner_full_name,
+               a.current_owner_id,
+               uc.full_name AS current_owner_full_name,
+               a.created_at,
+               a.updated_at
+        FROM artworks a
+                 JOIN users uo ON uo.id = a.original_owner_id
+                 JOIN users uc ON uc.id = a.current_owner_id
+        WHERE a.original_owner_id = p_owner_id
+          AND a.created_at <= p_after_created
+          AND (a.created_at < p_after_created OR a.id > p_after_id)
+        ORDER BY a.created_at DESC, a.id ASC
+        LIMIT p_limit;
+    END IF;
+END$$
+DELIMITER ;
+
+-- Export completo o incremental del catálogo (GET /artworks/export).
+-- Un solo SELECT que la app lee con un cursor sin buffer; el orden
+-- (updated_at, id) usa ix_artworks__updated y permite reanudar.
+DROP PROCEDURE IF EXISTS sp_artworks_export;
+DELIMITER $$
+CREATE PROCEDURE sp_artworks_export(
+    IN p_updated_since TIMESTAMP,       -- NULL = todo el catálogo (inclusive)
+    IN p_owner_id BIGINT UNSIGNED,      -- NULL = cualquier propietario actual
+    IN p_available TINYINT              -- NULL = disponibles y vendidas
+)
+BEGIN
+    SELECT a.id,
+           a.image_name AS name,
+           a.image_name,
+           a.url,
+           a.has_derivatives,
+           a.price,
+           a.is_available,
+           a.acquisition_type,
+           a.original_owner_id,
+           uo.full_name AS original_owner_full_name,
+           a.current_owner_id,
+           uc.full_name AS current_owner_full_name,
+           a.created_at,
+           a.updated_at
+    FROM artworks a
+             JOIN users uo ON uo.id = a.original_owner_id
+             JOIN users uc ON uc.id = a.current_owner_id
+    WHERE a.updated_at >= COALESCE(p_updated_since, TIMESTAMP '1970-01-01 00:00:01')
+      AND (p_owner_id IS NULL OR a.current_owner_id = p_owner_id)
+      AND (p_available IS NULL OR a.is_available = p_available)
+    ORDER BY a.updated_at, a.id;
+END$$
+DELIMITER ;
+
 -- Mis obras (propietario actual)
 DROP PROCEDURE IF EXISTS sp_artworks_mine;
 DELIMITER $$
@@ -292,6 +552,7 @@ BEGIN
            a.image_name AS name,
            a.image_name,
            a.url,
+           a.has_derivatives,
            a.price,
            a.is_available,
            a.acquisition_type,
@@ -338,6 +599,91 @@ BEGIN
 END$$
 DELIMITER ;
 
+-- ------------------------------------------------
+-- PUBLICACIÓN EN LOTE (un INSERT multi-fila, una transacción)
+-- p_items: arreglo JSON, p. ej. '[{"name": "Mar", "price": 10.5, "url": "Fotos_Publicadas/..."}]'
+-- Las url que ya están publicadas se omiten (con STORAGE_NAMING=content la
+-- key es el hash de la imagen). Devuelve id y url de las obras insertadas.
+-- ------------------------------------------------
+DROP PROCEDURE IF EXISTS sp_artwork_publish_batch;
+DELIMITER $$
+CREATE PROCEDURE sp_artwork_publish_batch(IN p_user_id BIGINT UNSIGNED, IN p_items JSON)
+BEGIN
+    DECLARE v_count INT;
+    DECLARE v_invalid INT;
+    DECLARE v_inserted INT;
+    DECLARE v_first_id BIGINT UNSIGNED;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+        BEGIN
+            ROLLBACK;
+            RESIGNAL;
+        END;
+
+    IF p_user_id IS NULL OR p_user_id = 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'userId requerido';
+    END IF;
+
+    SELECT COUNT(*),
+           COALESCE(SUM(jt.name IS NULL OR TRIM(jt.name) = ''
+                        OR jt.price IS NULL OR jt.price < 0
+                        OR jt.url IS NULL OR TRIM(jt.url) = ''), 0)
+    INTO v_count, v_invalid
+    FROM JSON_TABLE(p_items, '$[*]' COLUMNS (
+        name  VARCHAR(255)   PATH '$.name',
+        price DECIMAL(12, 2) PATH '$.price',
+        url   VARCHAR(500)   PATH '$.url'
+        )) AS jt;
+
+    IF v_count = 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'El lote está vacío';
+    END IF;
+    IF v_invalid > 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'name, price o url inválido en el lote';
+    END IF;
+
+    START TRANSACTION;
+
+    INSERT INTO artworks
+    (image_name, original_owner_id, current_owner_id, acquisition_type, url, is_available, price)
+    SELECT TRIM(jt.name), p_user_id, p_user_id, 'uploaded', TRIM(jt.url), 1, jt.price
+    FROM JSON_TABLE(p_items, '$[*]' COLUMNS (
+        name  VARCHAR(255)   PATH '$.name',
+        price DECIMAL(12, 2) PATH '$.price',
+        url   VARCHAR(500)   PATH '$.url'
+        )) AS jt
+    WHERE NOT EXISTS (SELECT 1 FROM artworks a WHERE a.url = TRIM(jt.url));
+
+    -- LAST_INSERT_ID() es el id de la primera fila del INSERT; las obras que
+    -- ya existían con esas url tienen ids menores
+    SET v_inserted = ROW_COUNT();
+    SET v_first_id = LAST_INSERT_ID();
+
+    COMMIT;
+
+    SELECT a.id, a.url
+    FROM artworks a
+    WHERE v_inserted > 0
+      AND a.id >= v_first_id
+      AND a.original_owner_id = p_user_id
+      AND a.url IN (SELECT TRIM(jt.url)
+                    FROM JSON_TABLE(p_items, '$[*]' COLUMNS (url VARCHAR(500) PATH '$.url')) AS jt);
+END$$
+DELIMITER ;
+
+-- Marca las obras cuyas miniaturas ya se generaron
+-- p_urls: arreglo JSON de keys, p. ej. '["Fotos_Publicadas/a.jpg"]'
+DROP PROCEDURE IF EXISTS sp_artworks_mark_derivatives;
+DELIMITER $$
+CREATE PROCEDURE sp_artworks_mark_derivatives(IN p_urls JSON)
+BEGIN
+    UPDATE artworks
+    SET has_derivatives = 1
+    WHERE has_derivatives = 0
+      AND url IN (SELECT TRIM(jt.url)
+                  FROM JSON_TABLE(p_urls, '$[*]' COLUMNS (url VARCHAR(500) PATH '$')) AS jt);
+END$$
+DELIMITER ;
+
 -- ------------------------------------------------
 -- COMPRA (transacción completa)
 -- ------------------------------------------------
@@ -348,6 +694,7 @@ CREATE PROCEDURE sp_purchase(IN p_buyer_id BIGINT UNSIGNED, IN p_artwork_id BIGI
 BEGIN
     DECLARE v_price DECIMAL(12, 2);
     DECLARE v_owner BIGINT UNSIGNED;
+    DECLARE v_locked DECIMAL(12, 2);
 
     START TRANSACTION;
 
@@ -381,8 +728,9 @@ BEGIN
         ROLLBACK; SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Vendedor no existe';
     END IF;
 
-    SELECT balance FROM users WHERE id = p_buyer_id FOR UPDATE;
-    SELECT balance FROM users WHERE id = v_owner FOR UPDATE;
+    -- En orden de id (como sp_purchase_cart) y con INTO: sin result sets extra
+    SELECT balance INTO v_locked FROM users WHERE id = LEAST(p_buyer_id, v_owner) FOR UPDATE;
+    SELECT balance INTO v_locked FROM users WHERE id = GREATEST(p_buyer_id, v_owner) FOR UPDATE;
 
     IF (SELECT balance FROM users WHERE id = p_buyer_id) < v_price THEN
         ROLLBACK; SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente';
@@ -406,6 +754,157 @@ BEGIN
            (v_owner, 'sale', 'Venta realizada',
             CONCAT('Has vendido la obra #', p_artwork_id, ' por Q', FORMAT(v_price, 2)));
     COMMIT;
+
+    -- Vendedor, para avisar en vivo a ambas partes
+    SELECT v_owner AS seller_id;
+END$$
+DELIMITER ;
+
+-- ------------------------------------------------
+-- COMPRA DE CARRITO (varias obras, una transacción)
+-- p_artwork_ids: arreglo JSON de ids, p. ej. '[3, 8, 15]'
+-- Locks siempre en el mismo orden: obras por id y luego usuarios por id
+-- (igual que sp_purchase), así dos compras no pueden bloquearse entre sí.
+-- ------------------------------------------------
+DROP PROCEDURE IF EXISTS sp_purchase_cart;
+DELIMITER $$
+CREATE PROCEDURE sp_purchase_cart(IN p_buyer_id BIGINT UNSIGNED, IN p_artwork_ids JSON)
+BEGIN
+    DECLARE v_id BIGINT UNSIGNED;
+    DECLARE v_price DECIMAL(12, 2);
+    DECLARE v_owner BIGINT UNSIGNED;
+    DECLARE v_original BIGINT UNSIGNED;
+    DECLARE v_available TINYINT;
+    DECLARE v_locked DECIMAL(12, 2);
+    DECLARE v_balance DECIMAL(12, 2);
+    DECLARE v_total DECIMAL(12, 2);
+    DECLARE v_count INT;
+    DECLARE v_error VARCHAR(255);
+    DECLARE v_done TINYINT DEFAULT 0;
+    DECLARE cur_cart CURSOR FOR SELECT artwork_id FROM tmp_cart ORDER BY artwork_id;
+    DECLARE cur_users CURSOR FOR SELECT user_id FROM tmp_cart_users ORDER BY user_id;
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET v_done = 1;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+        BEGIN
+            ROLLBACK;
+            RESIGNAL;
+        END;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_cart;
+    DROP TEMPORARY TABLE IF EXISTS tmp_cart_users;
+    CREATE TEMPORARY TABLE tmp_cart
+    (
+        artwork_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,
+        price      DECIMAL(12, 2),
+        owner_id   BIGINT UNSIGNED
+    ) ENGINE = InnoDB;
+    CREATE TEMPORARY TABLE tmp_cart_users
+    (
+        user_id BIGINT UNSIGNED NOT NULL PRIMARY KEY
+    ) ENGINE = InnoDB;
+
+    INSERT IGNORE INTO tmp_cart (artwork_id)
+    SELECT jt.id
+    FROM JSON_TABLE(p_artwork_ids, '$[*]' COLUMNS (id BIGINT UNSIGNED PATH '$')) AS jt
+    WHERE jt.id IS NOT NULL;
+
+    SELECT COUNT(*) INTO v_count FROM tmp_cart;
+    IF v_count = 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'El carrito está vacío';
+    END IF;
+
+    START TRANSACTION;
+
+    -- 1) Lock y validación de cada obra, en orden de id
+    OPEN cur_cart;
+    cart_loop:
+    LOOP
+        FETCH cur_cart INTO v_id;
+        IF v_done THEN LEAVE cart_loop; END IF;
+
+        SET v_price = NULL;
+        SELECT price, current_owner_id, original_owner_id, is_available
+        INTO v_price, v_owner, v_original, v_available
+        FROM artworks
+        WHERE id = v_id
+            FOR UPDATE;
+
+        IF v_price IS NULL THEN
+            SET v_error = CONCAT('La obra #', v_id, ' no existe');
+            SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_error;
+        END IF;
+        IF v_available = 0 THEN
+            SET v_error = CONCAT('La obra #', v_id, ' no está disponible');
+            SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_error;
+        END IF;
+        IF v_owner = p_buyer_id OR v_original = p_buyer_id THEN
+            SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'No puedes comprar tu propia obra';
+        END IF;
+
+        UPDATE tmp_cart SET price = v_price, owner_id = v_owner WHERE artwork_id = v_id;
+    END LOOP;
+    CLOSE cur_cart;
+
+    -- 2) Lock de comprador y vendedores, en orden de id
+    INSERT IGNORE INTO tmp_cart_users (user_id) SELECT owner_id FROM tmp_cart;
+    INSERT IGNORE INTO tmp_cart_users (user_id) VALUES (p_buyer_id);
+
+    SET v_done = 0;
+    OPEN cur_users;
+    users_loop:
+    LOOP
+        FETCH cur_users INTO v_id;
+        IF v_done THEN LEAVE users_loop; END IF;
+
+        SET v_locked = NULL;
+        SELECT balance INTO v_locked FROM users WHERE id = v_id FOR UPDATE;
+        IF v_locked IS NULL THEN
+            SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Comprador o vendedor no existe';
+        END IF;
+        IF v_id = p_buyer_id THEN SET v_balance = v_locked; END IF;
+    END LOOP;
+    CLOSE cur_users;
+
+    -- 3) Un solo chequeo de saldo para todo el carrito
+    SELECT SUM(price) INTO v_total FROM tmp_cart;
+    IF v_balance < v_total THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente';
+    END IF;
+
+    -- 4) Movimientos de saldo: comprador una vez, cada vendedor con su suma
+    UPDATE users SET balance = balance - v_total WHERE id = p_buyer_id;
+    UPDATE users u
+        JOIN (SELECT owner_id, SUM(price) AS amount FROM tmp_cart GROUP BY owner_id) s
+        ON s.owner_id = u.id
+    SET u.balance = u.balance + s.amount;
+
+    -- 5) Transferir propiedad
+    UPDATE artworks a
+        JOIN tmp_cart c ON c.artwork_id = a.id
+    SET a.current_owner_id = p_buyer_id,
+        a.acquisition_type = 'purchased',
+        a.is_available     = 0;
+
+    -- 6) Notificaciones: una para el comprador y una por vendedor
+    INSERT INTO notifications (user_id, type, title, body)
+    VALUES (p_buyer_id, 'purchase', 'Compra exitosa',
+            CONCAT('Has comprado ', v_count, IF(v_count = 1, ' obra', ' obras'),
+                   ' por Q', FORMAT(v_total, 2)));
+    INSERT INTO notifications (user_id, type, title, body)
+    SELECT owner_id, 'sale', 'Venta realizada',
+           CONCAT('Has vendido ', COUNT(*), IF(COUNT(*) = 1, ' obra', ' obras'),
+                  ' por Q', FORMAT(SUM(price), 2))
+    FROM tmp_cart
+    GROUP BY owner_id;
+
+    COMMIT;
+
+    SELECT artwork_id, owner_id AS seller_id, price
+    FROM tmp_cart
+    ORDER BY artwork_id;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_cart;
+    DROP TEMPORARY TABLE IF EXISTS tmp_cart_users;
 END$$
 DELIMITER ;
 
@@ -435,3 +934,39 @@ BEGIN
   VALUES (p_user_id, p_type, TRIM(p_title), TRIM(p_body));
 END$$
 DELIMITER ;
+
+-- ------------------------------------------------
+-- UPLOADS DIRECTOS: un token, un finalize
+-- sp_upload_claim reserva la key del token (claimed = 1) o indica que ya
+-- se usó (claimed = 0); la PRIMARY KEY lo resuelve entre workers. Los
+-- tokens vencen en horas, así que se purgan las reservas de más de un día.
+-- ------------------------------------------------
+DROP PROCEDURE IF EXISTS sp_upload_claim;
+DELIMITER $$
+CREATE PROCEDURE sp_upload_claim(IN p_key VARCHAR(255), IN p_user_id BIGINT UNSIGNED)
+BEGIN
+    DECLARE v_claimed INT DEFAULT 0;
+
+    IF p_key IS NULL OR TRIM(p_key) = '' THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'key requerida';
+    END IF;
+
+    INSERT IGNORE INTO upload_claims (upload_key, user_id)
+    VALUES (p_key, p_user_id);
+    SET v_claimed = ROW_COUNT();
+
+    DELETE FROM upload_claims
+    WHERE claimed_at < NOW() - INTERVAL 1 DAY
+    LIMIT 100;
+
+    SELECT v_claimed AS claimed;
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS sp_upload_claimed;
+DELIMITER $$
+CREATE PROCEDURE sp_upload_claimed(IN p_key VARCHAR(255))
+BEGIN
+    SELECT EXISTS(SELECT 1 FROM upload_claims WHERE upload_key = p_key) AS claimed;
+END$$
+DELIMITER ;
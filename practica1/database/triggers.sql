@@ -14,6 +14,9 @@ DROP TRIGGER IF EXISTS trg_users_before_upd;
 DROP TRIGGER IF EXISTS trg_artworks_before_ins;
 DROP TRIGGER IF EXISTS trg_artworks_before_upd;
 DROP TRIGGER IF EXISTS trg_notifications_before_ins;
+DROP TRIGGER IF EXISTS trg_notifications_after_ins;
+DROP TRIGGER IF EXISTS trg_notifications_after_upd;
+DROP TRIGGER IF EXISTS trg_notifications_after_del;
 
 -- ======================================
 -- USERS: normaliza y valida
@@ -122,6 +125,50 @@ BEGIN
     IF NEW.is_read IS NULL THEN SET NEW.is_read = 0; END IF;
 END$$
 
+-- ======================================
+-- NOTIFICATIONS: contador de no leídas
+-- (evita COUNT(*) sobre el historial en cada consulta)
+-- ======================================
+CREATE TRIGGER trg_notifications_after_ins
+    AFTER INSERT
+    ON notifications
+    FOR EACH ROW
+BEGIN
+    IF NEW.is_read = 0 THEN
+        INSERT INTO notification_counters (user_id, unread)
+        VALUES (NEW.user_id, 1)
+        ON DUPLICATE KEY UPDATE unread = unread + 1;
+    END IF;
+END$$
+
+CREATE TRIGGER trg_notifications_after_upd
+    AFTER UPDATE
+    ON notifications
+    FOR EACH ROW
+BEGIN
+    IF OLD.is_read = 0 AND NEW.is_read <> 0 THEN
+        UPDATE notification_counters
+        SET unread = GREATEST(unread, 1) - 1
+        WHERE user_id = OLD.user_id;
+    ELSEIF OLD.is_read <> 0 AND NEW.is_read = 0 THEN
+        INSERT INTO notification_counters (user_id, unread)
+        VALUES (NEW.user_id, 1)
+        ON DUPLICATE KEY UPDATE unread = unread + 1;
+    END IF;
+END$$
+
+CREATE TRIGGER trg_notifications_after_del
+    AFTER DELETE
+    ON notifications
+    FOR EACH ROW
+BEGIN
+    IF OLD.is_read = 0 THEN
+        UPDATE notification_counters
+        SET unread = GREATEST(unread, 1) - 1
+        WHERE user_id = OLD.user_id;
+    END IF;
+END$$
+
 DELIMITER ;
 
 -- ======================================
@@ -153,6 +200,7 @@ CREATE PROCEDURE sp_purchase(IN p_buyer_id BIGINT UNSIGNED, IN p_artwork_id BIGI
 BEGIN
     DECLARE v_price DECIMAL(12, 2);
     DECLARE v_owner BIGINT UNSIGNED;
+    DECLARE v_locked DECIMAL(12, 2);
     DECLARE v_name VARCHAR(255);
 
     START TRANSACTION;
@@ -179,8 +227,9 @@ BEGIN
     END IF;
 
     -- Lock de buyer y seller
-    SELECT balance FROM users WHERE id = p_buyer_id FOR UPDATE;
-    SELECT balance FROM users WHERE id = v_owner FOR UPDATE;
+    -- En orden de id (como sp_purchase_cart) y con INTO: sin result sets extra
+    SELECT balance INTO v_locked FROM users WHERE id = LEAST(p_buyer_id, v_owner) FOR UPDATE;
+    SELECT balance INTO v_locked FROM users WHERE id = GREATEST(p_buyer_id, v_owner) FOR UPDATE;
 
     IF (SELECT balance FROM users WHERE id = p_buyer_id) < v_price THEN
         ROLLBACK; SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente';
@@ -204,6 +253,9 @@ BEGIN
            (v_owner, 'sale', 'Venta realizada',
             CONCAT('Has vendido la obra "', v_name, '" por Q', FORMAT(v_price, 2)));
     COMMIT;
+
+    -- Vendedor, para avisar en vivo a ambas partes
+    SELECT v_owner AS seller_id;
 END$$
 DELIMITER ;
 
@@ -224,6 +276,7 @@ BEGIN
     a.image_name AS name,
     a.image_name,
     a.url,
+    a.has_derivatives,
     a.price,
     a.is_available,
     u.id AS seller_id,
@@ -251,6 +304,7 @@ BEGIN
     a.image_name AS name,
     a.image_name,
     a.url,
+    a.has_derivatives,
     a.price,
     a.is_available,
     a.acquisition_type,
@@ -282,6 +336,7 @@ BEGIN
     a.image_name AS name,
     a.image_name,
     a.url,
+    a.has_derivatives,
     a.price,
     a.is_available,
     a.acquisition_type,
@@ -3,25 +3,47 @@ import { notificationService } from '../service/notifications';
 import eventBus, { NOTIFICATION_EVENTS } from '../utils/eventBus';
 import './NotificationBell.css';
 
+// Cantidad de notificaciones que se muestran en el dropdown
+const PAGE_SIZE = 50;
+
 export default function NotificationBell() {
     const [notifications, setNotifications] = useState([]);
     const [unreadCount, setUnreadCount] = useState(0);
     const [isOpen, setIsOpen] = useState(false);
     const [loading, setLoading] = useState(false);
     const dropdownRef = useRef(null);
+    // Mayor id recibido; el polling solo pide las posteriores
+    const lastIdRef = useRef(null);
 
     useEffect(() => {
         loadNotifications();
-        
-        // Cargar notificaciones cada 30 segundos
-        const interval = setInterval(loadNotifications, 30000);
-        
+
+        // Notificaciones en vivo; si el backend no tiene stream se vuelve al polling
+        let interval = null;
+        const stream = notificationService.subscribe(getUserId(), {
+            onNotification: (notification) => {
+                lastIdRef.current = Math.max(lastIdRef.current ?? 0, notification.id);
+                setNotifications(prev => prev.some(notif => notif.id === notification.id)
+                    ? prev
+                    : [notification, ...prev].slice(0, PAGE_SIZE));
+                if (!notification.is_read) {
+                    setUnreadCount(prev => prev + 1);
+                }
+            },
+            onClosed: () => {
+                if (!interval) {
+                    interval = setInterval(loadNotifications, 30000);
+                }
+            }
+        });
+
         // Escuchar eventos de actualización de notificaciones
         const unsubscribeRefresh = eventBus.on(NOTIFICATION_EVENTS.REFRESH, loadNotifications);
         const unsubscribeNew = eventBus.on(NOTIFICATION_EVENTS.NEW_NOTIFICATION, loadNotifications);
-        
-        // Limpiar intervalo y eventos al desmontar
+
+        // Cerrar stream, intervalo y eventos al desmontar
         return () => {
+            stream?.close();
             clearInterval(interval);
             unsubscribeRefresh();
             unsubscribeNew();
@@ -40,18 +62,36 @@ export default function NotificationBell() {
         return () => document.removeEventListener('mousedown', handleClickOutside);
     }, []);
 
+    const getUserId = () => {
+        const userData = localStorage.getItem('user');
+        return userData ? JSON.parse(userData).id : null;
+    };
+
     const loadNotifications = async () => {
         try {
             const userData = localStorage.getItem('user');
             if (!userData) return;
 
             const user = JSON.parse(userData);
-            const result = await notificationService.getUserNotifications(user.id);
-
-            if (result.success) {
-                setNotifications(result.data);
-                const unread = result.data.filter(notif => !notif.is_read).length;
-                setUnreadCount(unread);
+            const [result, unread] = await Promise.all([
+                lastIdRef.current === null
+                    ? notificationService.getUserNotifications(user.id, { limit: PAGE_SIZE })
+                    : notificationService.getUserNotifications(user.id, { sinceId: lastIdRef.current, limit: PAGE_SIZE }),
+                notificationService.getUnreadCount(user.id)
+            ]);
+
+            if (result.success && result.data.length > 0) {
+                lastIdRef.current = Math.max(lastIdRef.current ?? 0, ...result.data.map(notif => notif.id));
+                setNotifications(prev => {
+                    const known = new Set(prev.map(notif => notif.id));
+                    const merged = [...result.data.filter(notif => !known.has(notif.id)), ...prev];
+                    return merged
+                        .sort((a, b) => b.id - a.id)
+                        .slice(0, PAGE_SIZE);
+                });
+            }
+            if (unread.success) {
+                setUnreadCount(unread.count);
             }
         } catch (error) {
             console.error('Error cargando notificaciones:', error);
@@ -1,10 +1,16 @@
 const API_BASE =  import.meta.env.VITE_BACKEND_HOST;
 
 export const notificationService = {
-    // Obtener todas las notificaciones del usuario
-    async getUserNotifications(userId) {
+    // Obtener notificaciones del usuario
+    // limit: solo las más recientes; sinceId: solo las posteriores a ese id
+    async getUserNotifications(userId, { sinceId = null, limit = null } = {}) {
         try {
-            const response = await fetch(`${API_BASE}/users/${userId}/notifications`);
+            const params = new URLSearchParams();
+            if (sinceId !== null) params.set('since_id', sinceId);
+            if (limit !== null) params.set('limit', limit);
+            const query = params.toString() ? `?${params}` : '';
+
+            const response = await fetch(`${API_BASE}/users/${userId}/notifications${query}`);
             
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
@@ -62,32 +68,51 @@ export const notificationService = {
         }
     },
 
-    // Contar notificaciones no leídas
+    // Suscribirse al stream SSE de notificaciones nuevas
+    // EventSource reconecta solo y reanuda con Last-Event-ID
+    subscribe(userId, { onNotification, onClosed }) {
+        if (!userId || typeof EventSource === 'undefined') {
+            onClosed?.();
+            return null;
+        }
+
+        const source = new EventSource(`${API_BASE}/users/${userId}/notifications/stream`);
+        source.addEventListener('notification', (event) => {
+            try {
+                onNotification(JSON.parse(event.data));
+            } catch (error) {
+                console.error('Notificación inválida en el stream:', error);
+            }
+        });
+        source.onerror = () => {
+            // CLOSED: el servidor rechazó el stream y no se reintentará
+            if (source.readyState === EventSource.CLOSED) {
+                onClosed?.();
+            }
+        };
+        return source;
+    },
+
+    // Contar notificaciones no leídas (contador mantenido en el backend)
     async getUnreadCount(userId) {
         try {
-            const result = await this.getUserNotifications(userId);
-            
-            if (result.success) {
-                const unreadCount = result.data.filter(notification => !notification.is_read).length;
-                return {
-                    success: true,
-                    count: unreadCount,
-                    data: result.data
-                };
+            const response = await fetch(`${API_BASE}/users/${userId}/notifications/unread-count`);
+
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
             }
-            
+
+            const result = await response.json();
             return {
-                success: false,
-                count: 0,
-                data: []
+                success: true,
+                count: result.unread
             };
-            
+
         } catch (error) {
             console.error('Error al contar notificaciones no leídas:', error);
             return {
                 success: false,
-                count: 0,
-                data: []
+                count: 0
             };
         }
     }